@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - audio-extractie
+# Decodeert audio met ffmpeg naar 16 kHz mono PCM, los van de transcriptie,
+# zodat het decoderen van de volgende bestanden kan overlappen met de
+# inferentie van het huidige bestand.
+
+import re
+import time
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Whisper verwacht 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def ffmpeg_command(path, sr=SAMPLE_RATE):
+    """
+    Bouwt het ffmpeg commando dat de audio als 16-bit PCM naar stdout schrijft.
+    """
+    return ["ffmpeg", "-nostdin", "-threads", "0", "-i", path, "-vn", "-f", "s16le", "-ac", "1",
+            "-acodec", "pcm_s16le", "-ar", str(sr), "-"]
+
+
+def load_audio(path, sr=SAMPLE_RATE):
+    """
+    Decodeert een audio- of videobestand naar een float32 numpy array
+    (mono, sr Hz, waarden tussen -1 en 1), net als whisper.load_audio.
+    """
+    import numpy as np
+
+    try:
+        out = subprocess.run(ffmpeg_command(path, sr), capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg is niet geïnstalleerd of niet beschikbaar in PATH")
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise RuntimeError(f"Kon audio niet decoderen: {error[-1] if error else e}")
+
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def probe_duration(path):
+    """
+    Duur van een audio- of videobestand in seconden, zonder het te decoderen.
+    Gebruikt ffprobe als dat er is, anders de kop die ffmpeg -i toont.
+    Geeft None als de duur niet te bepalen is.
+    """
+    try:
+        out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                              "-of", "default=noprint_wrappers=1:nokey=1", path],
+                             capture_output=True, text=True)
+        if out.returncode == 0:
+            return float(out.stdout.strip())
+    except (FileNotFoundError, ValueError):
+        pass
+
+    try:
+        out = subprocess.run(["ffmpeg", "-nostdin", "-hide_banner", "-i", path],
+                             capture_output=True, text=True, errors="replace")
+    except FileNotFoundError:
+        return None
+    match = _DURATION.search(out.stderr)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def probe_durations(paths, workers=4):
+    """
+    Bepaalt de duur van alle bestanden (parallel); geeft pad -> seconden of None.
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        return dict(zip(paths, executor.map(probe_duration, paths)))
+
+
+class AudioPrefetcher:
+    """
+    Decodeert de audio van de volgende bestanden op de achtergrond terwijl
+    het huidige bestand wordt getranscribeerd.
+
+    - depth: maximaal aantal bestanden dat vooruit wordt gedecodeerd
+      (begrenst het geheugengebruik)
+    - max_ffmpeg: maximaal aantal gelijktijdige ffmpeg processen
+
+    Itereren geeft per bestand (pad, audio, fout, decodeertijd) terug, in de
+    oorspronkelijke volgorde. Bij een fout is audio None.
+    """
+
+    def __init__(self, video_paths, depth=2, max_ffmpeg=1, loader=load_audio):
+        self.video_paths = list(video_paths)
+        self.depth = max(1, depth)
+        self.loader = loader
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_ffmpeg), thread_name_prefix="ffmpeg")
+        self.futures = {}
+        self.next_submit = 0
+        self.position = 0  # Index van het volgende bestand dat de iterator teruggeeft
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def _decode(self, video_path):
+        start_time = time.time()
+        try:
+            audio = self.loader(video_path)
+            return video_path, audio, None, time.time() - start_time
+        except Exception as e:
+            return video_path, None, e, time.time() - start_time
+
+    def _fill(self, current):
+        # Houd maximaal 'depth' bestanden vooruit in de buffer
+        with self.lock:
+            while (not self.closed and self.next_submit < len(self.video_paths)
+                   and self.next_submit <= current + self.depth):
+                index = self.next_submit
+                self.futures[index] = self.executor.submit(self._decode, self.video_paths[index])
+                self.next_submit += 1
+
+    def start(self):
+        """
+        Begint alvast met decoderen, bijvoorbeeld terwijl het model nog laadt.
+        """
+        self._fill(0)
+
+    def __iter__(self):
+        try:
+            for index in range(len(self.video_paths)):
+                if self.closed:
+                    break
+                self._fill(index)
+                future = self.futures.pop(index)
+                result = future.result()
+                self.position = index + 1
+                yield result
+        finally:
+            self.close()
+
+    def next_ready(self, timeout=None):
+        """
+        Wacht maximaal timeout seconden tot het volgende bestand gedecodeerd
+        is. Geeft True als het klaar is (of als er geen volgend bestand is).
+        """
+        self._fill(self.position)
+        with self.lock:
+            future = self.futures.get(self.position)
+        if future is None:
+            return True
+        wait([future], timeout=timeout)
+        return future.done()
+
+    def close(self):
+        """
+        Stopt met vooruit decoderen; nog niet gestarte taken worden geannuleerd.
+        """
+        with self.lock:
+            self.closed = True
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+        self.executor.shutdown(wait=False)
+
+
+class PCMStream:
+    """
+    Leest audio in stukken rechtstreeks uit een ffmpeg pipe, zonder het hele
+    bestand in het geheugen te laden. Te gebruiken als context manager.
+    """
+
+    def __init__(self, path, sr=SAMPLE_RATE):
+        self.path = path
+        self.sr = sr
+        self.process = None
+        self.samples_read = 0
+
+    def __enter__(self):
+        try:
+            self.process = subprocess.Popen(ffmpeg_command(self.path, self.sr),
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise RuntimeError("FFmpeg is niet geïnstalleerd of niet beschikbaar in PATH")
+        return self
+
+    def read(self, n_samples):
+        """
+        Leest maximaal n_samples samples als float32 array; een kortere (of
+        lege) array betekent dat het einde van het bestand is bereikt.
+        """
+        import numpy as np
+
+        wanted = n_samples * 2  # 16-bit samples
+        chunks = []
+        while wanted > 0:
+            data = self.process.stdout.read(wanted)
+            if not data:
+                break
+            chunks.append(data)
+            wanted -= len(data)
+
+        raw = b"".join(chunks)
+        raw = raw[:len(raw) - len(raw) % 2]
+        self.samples_read += len(raw) // 2
+        if not raw and self.samples_read == 0:
+            # ffmpeg kon het bestand niet decoderen
+            returncode = self.process.wait()
+            if returncode != 0:
+                raise RuntimeError(f"Kon audio niet decoderen (ffmpeg exitcode {returncode})")
+        return np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.stdout.close()
+            self.process.wait()
+        return False
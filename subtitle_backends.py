@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - inferentie-backends
+# Verbergt welke implementatie het model uitvoert. Elke backend laadt een
+# model en geeft transcriptieresultaten in hetzelfde formaat als
+# openai-whisper terug ({"text", "segments", "language"}), zodat de rest van
+# de pijplijn (cache, VAD, reiniging, writer) niet hoeft te weten welke
+# backend gebruikt is.
+
+import os
+import sys
+import types
+import threading
+
+DEFAULT_BACKEND = "openai-whisper"
+
+# Clips tot deze lengte passen in één venster van het model en kunnen samen
+# in één batch worden gedecodeerd
+BATCH_MAX_SECONDS = 30.0
+
+# Drempels van whisper.transcribe voor de temperatuur-fallback en stilte
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+# Voortgangs-callback van de transcriptie die in deze thread loopt
+_progress = threading.local()
+
+
+class _ProgressBar:
+    """
+    Vervangt de tqdm-balk van whisper.transcribe: geeft de voortgang (0-1)
+    aan de callback door in plaats van hem te tekenen.
+    """
+
+    def __init__(self, callback, total):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, n=1):
+        self.done += n
+        if self.total:
+            self.callback(min(1.0, self.done / self.total))
+
+
+def _install_progress_hook():
+    """
+    whisper.transcribe heeft geen voortgangs-callback, alleen een tqdm-balk
+    over de mel-frames. Die balk wordt eenmalig vervangen; zonder callback
+    in de huidige thread blijft hij werken zoals voorheen.
+    """
+    import whisper
+
+    module = sys.modules["whisper.transcribe"]
+    if getattr(module.tqdm, "subtitle_hook", False):
+        return
+    original = module.tqdm
+
+    def progress_bar(*args, **kwargs):
+        callback = getattr(_progress, "callback", None)
+        if callback is None:
+            return original.tqdm(*args, **kwargs)
+        return _ProgressBar(callback, kwargs.get("total"))
+
+    module.tqdm = types.SimpleNamespace(tqdm=progress_bar, subtitle_hook=True)
+
+
+def package_version(name):
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return "onbekend"
+
+
+class WhisperBackend:
+    """
+    De oorspronkelijke backend: openai-whisper in PyTorch.
+    """
+
+    name = "openai-whisper"
+
+    def __init__(self, model_dir=None, threads=None):
+        self.model_dir = model_dir  # None = standaard Whisper downloadmap
+        self.threads = threads
+
+    def version(self):
+        return package_version("openai-whisper")
+
+    def precision_for(self, device):
+        # Whisper gebruikt FP16 alleen op de GPU
+        return "fp16" if device == "cuda" else "fp32"
+
+    def load(self, model_size, device, precision):
+        import whisper
+
+        return whisper.load_model(model_size, device=device, download_root=self.model_dir)
+
+    def transcribe(self, model, audio, language, initial_prompt=None, device="cpu", progress=None):
+        """
+        progress: optionele callback die de voortgang (0-1) krijgt telkens
+        als een venster van 30 seconden klaar is.
+        """
+        if progress is not None:
+            _install_progress_hook()
+        _progress.callback = progress
+        try:
+            return model.transcribe(
+                audio,
+                language=language,
+                task="transcribe",
+                verbose=False,
+                initial_prompt=initial_prompt,
+                fp16=(device == "cuda")  # Gebruik FP16 alleen op GPU
+            )
+        finally:
+            _progress.callback = None
+
+    def _mel_batch(self, model, audios):
+        """
+        Mel-spectrogrammen van clips van hooguit één venster, zoals
+        whisper.transcribe ze maakt: stilte erachter, daarna alleen de inhoud,
+        opgevuld tot één venster. Geeft de batch en het aantal frames inhoud
+        per clip terug.
+        """
+        import torch
+        from whisper.audio import N_FRAMES, N_SAMPLES, log_mel_spectrogram, pad_or_trim
+
+        mels = []
+        content_frames = []
+        for audio in audios:
+            mel = log_mel_spectrogram(torch.from_numpy(audio), model.dims.n_mels, padding=N_SAMPLES)
+            frames = mel.shape[-1] - N_FRAMES
+            content_frames.append(frames)
+            mels.append(pad_or_trim(mel[:, :frames], N_FRAMES))
+        return torch.stack(mels).to(model.device), content_frames
+
+    def detect_language(self, model, windows, device="cpu"):
+        """
+        Taalkansen per venster (elk hooguit 30 seconden audio), als lijst van
+        dictionaries taalcode -> kans. Alle vensters gaan in één keer door
+        de encoder.
+        """
+        import torch
+
+        if not model.is_multilingual:
+            return [{"en": 1.0} for _ in windows]
+        mel_batch, _ = self._mel_batch(model, windows)
+        dtype = torch.float16 if device == "cuda" else torch.float32
+        _, probs = model.detect_language(mel_batch.to(dtype))
+        return probs
+
+    def transcribe_batch(self, model, audios, language, device="cpu"):
+        """
+        Decodeert korte clips (elk hooguit BATCH_MAX_SECONDS) samen: de
+        mel-spectrogrammen gaan als één batch door de encoder en decoder.
+        Met language None bepaalt whisper.decode de taal per clip uit
+        dezelfde encoder-uitvoer. Geeft per clip een resultaat in hetzelfde
+        formaat als transcribe(), of None als de clip toch los
+        getranscribeerd moet worden (de greedy decodering valt onder de
+        kwaliteitsdrempels, of de clip heeft meer dan één venster nodig).
+        """
+        import whisper
+        from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+        from whisper.tokenizer import get_tokenizer
+
+        mel_batch, content_frames = self._mel_batch(model, audios)
+
+        options = whisper.DecodingOptions(language=language, task="transcribe", temperature=0.0,
+                                          fp16=(device == "cuda"))
+        decoded = whisper.decode(model, mel_batch, options)
+        # De timestamp- en teksttokens zijn voor alle talen gelijk
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                  language=language, task="transcribe")
+        time_precision = 2 * HOP_LENGTH / SAMPLE_RATE  # Seconden per timestamp-token
+
+        results = []
+        for frames, decoding in zip(content_frames, decoded):
+            clip_language = language or decoding.language
+            silent = (decoding.no_speech_prob > NO_SPEECH_THRESHOLD
+                      and decoding.avg_logprob < LOGPROB_THRESHOLD)
+            if silent:
+                results.append({"text": "", "segments": [], "language": clip_language})
+                continue
+            if (decoding.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                    or decoding.avg_logprob < LOGPROB_THRESHOLD):
+                results.append(None)
+                continue
+
+            segments = self._segments_from_tokens(decoding, tokenizer, frames * HOP_LENGTH / SAMPLE_RATE,
+                                                  time_precision)
+            results.append(None if segments is None else {
+                "text": "".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "language": clip_language,
+            })
+        return results
+
+    def _segments_from_tokens(self, decoding, tokenizer, duration, time_precision):
+        """
+        Splitst de tokens van één venster op de timestamp-tokens in segmenten,
+        zoals whisper.transcribe dat doet. Geeft None als het venster niet
+        tot het einde van de clip komt.
+        """
+        tokens = list(decoding.tokens)
+        timestamp_begin = tokenizer.timestamp_begin
+        is_timestamp = [token >= timestamp_begin for token in tokens]
+        single_timestamp_ending = is_timestamp[-2:] == [False, True]
+        consecutive = [index + 1 for index in range(len(tokens) - 1) if is_timestamp[index] and is_timestamp[index + 1]]
+
+        def new_segment(start, end, segment_tokens):
+            text_tokens = [token for token in segment_tokens if token < tokenizer.eot]
+            return {
+                "seek": 0,
+                "start": start,
+                "end": end,
+                "text": tokenizer.decode(text_tokens),
+                "tokens": segment_tokens,
+                "temperature": decoding.temperature,
+                "avg_logprob": decoding.avg_logprob,
+                "compression_ratio": decoding.compression_ratio,
+                "no_speech_prob": decoding.no_speech_prob,
+            }
+
+        segments = []
+        if consecutive:
+            if not single_timestamp_ending:
+                # whisper.transcribe zou vanaf de laatste timestamp verder decoderen
+                return None
+            last_slice = 0
+            for current_slice in consecutive + [len(tokens)]:
+                sliced = tokens[last_slice:current_slice]
+                segments.append(new_segment((sliced[0] - timestamp_begin) * time_precision,
+                                            (sliced[-1] - timestamp_begin) * time_precision, sliced))
+                last_slice = current_slice
+        else:
+            end = duration
+            timestamps = [token for token in tokens if token >= timestamp_begin]
+            if timestamps and timestamps[-1] != timestamp_begin:
+                end = (timestamps[-1] - timestamp_begin) * time_precision
+            segments.append(new_segment(0.0, end, tokens))
+
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+            if segment["start"] == segment["end"] or not segment["text"].strip():
+                segment["text"] = ""
+                segment["tokens"] = []
+        return segments
+
+
+class FasterWhisperBackend:
+    """
+    faster-whisper (CTranslate2) met int8-kwantisatie op de CPU. Zoekt eerst
+    naar lokaal opgeslagen, geconverteerde gewichten in model_dir/<grootte>;
+    anders worden ze (eenmalig) in model_dir gedownload.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_dir=None, threads=None):
+        self.model_dir = model_dir
+        self.threads = threads
+
+    def version(self):
+        return package_version("faster-whisper")
+
+    def precision_for(self, device):
+        return "float16" if device == "cuda" else "int8"
+
+    def load(self, model_size, device, precision):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("faster-whisper is niet geïnstalleerd (pip install faster-whisper)")
+
+        model_path = model_size
+        if self.model_dir:
+            local_path = os.path.join(self.model_dir, model_size)
+            if os.path.isfile(os.path.join(local_path, "model.bin")):
+                model_path = local_path
+
+        return WhisperModel(model_path, device=device, compute_type=precision,
+                            cpu_threads=self.threads or 0, download_root=self.model_dir)
+
+    def detect_language(self, model, windows, device="cpu"):
+        probs = []
+        for window in windows:
+            _, _, all_probs = model.detect_language(window)
+            probs.append(dict(all_probs))
+        return probs
+
+    def transcribe(self, model, audio, language, initial_prompt=None, device="cpu", progress=None):
+        # Zelfde decodering als openai-whisper: greedy met temperatuur-fallback,
+        # geen eigen VAD (die zit al in de pijplijn)
+        segments, info = model.transcribe(
+            audio,
+            language=language,
+            task="transcribe",
+            initial_prompt=initial_prompt,
+            beam_size=1,
+            vad_filter=False,
+        )
+
+        result_segments = []
+        for index, segment in enumerate(segments):
+            # De segmenten worden pas tijdens het itereren gedecodeerd
+            if progress is not None and info.duration:
+                progress(min(1.0, segment.end / info.duration))
+            result_segments.append({
+                "id": index,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+            "language": info.language,
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def get_backend(name=None, model_dir=None, threads=None):
+    """
+    Maakt de backend met de gegeven naam (standaard openai-whisper).
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Onbekende backend: {name} (kies uit {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_dir=model_dir, threads=threads)
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - benchmarks
+# Meet offline de doorvoer van de volledige pijplijn (per modelgrootte, op de
+# CPU) en van de ondertitelreiniging. De testmedia worden lokaal en
+# deterministisch gegenereerd (stilte, tonen en spraakachtige ruis), zodat
+# metingen op verschillende machines en momenten vergelijkbaar zijn. De
+# resultaten gaan naar een JSON-bestand en kunnen met een opgeslagen
+# baseline worden vergeleken.
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+
+SAMPLE_RATE = 16000
+
+# Testmedia: (naam, soort, lengte in seconden)
+TESTMEDIA = [
+    ("stilte", "stilte", 10),
+    ("tonen", "tonen", 10),
+    ("spraak_kort", "spraak", 20),
+    ("spraak_lang", "spraak", 90),
+]
+
+# Metingen die met de baseline worden vergeleken: 1 = hoger is beter, -1 = lager is beter
+VERGELIJKING = {
+    "pipeline": {"audio_seconds_per_sec": 1, "rtf": -1},
+    "clean_cue": {"cues_per_sec": 1},
+    "clean_srt": {"cues_per_sec": 1},
+    "clean_srt_file": {"cues_per_sec": 1},
+}
+
+
+def synthetic_audio(soort, seconds, seed=0):
+    """
+    Genereert deterministische 16 kHz mono audio als float32 array.
+    "spraak" is ruis en harmonischen met een lettergreepritme en pauzes,
+    zodat spraakdetectie en het model iets te doen hebben zonder TTS.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * SAMPLE_RATE)
+    t = np.arange(samples) / SAMPLE_RATE
+
+    if soort == "stilte":
+        return np.zeros(samples, dtype=np.float32)
+
+    if soort == "tonen":
+        # Elke seconde een andere toon, met een korte pauze ertussen
+        audio = np.zeros(samples, dtype=np.float32)
+        for second in range(int(seconds)):
+            start, end = second * SAMPLE_RATE, second * SAMPLE_RATE + int(0.8 * SAMPLE_RATE)
+            frequency = 220.0 * 2 ** (rng.integers(0, 24) / 12)
+            audio[start:end] = 0.3 * np.sin(2 * np.pi * frequency * t[start:end])
+        return audio
+
+    if soort != "spraak":
+        raise ValueError(f"Onbekende soort testaudio: {soort}")
+
+    # Uitingen van 1-4 seconden met pauzes van 0,3-1,5 seconden
+    envelope = np.zeros(samples, dtype=np.float32)
+    position = int(0.5 * SAMPLE_RATE)
+    while position < samples:
+        utterance = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        syllable_rate = rng.uniform(3.0, 6.0)
+        span = slice(position, min(samples, position + utterance))
+        local = t[span] - t[position]
+        envelope[span] = np.clip(np.sin(np.pi * syllable_rate * local), 0, None) ** 2
+        position += utterance + int(rng.uniform(0.3, 1.5) * SAMPLE_RATE)
+
+    # Grondtoon die langzaam varieert, met enkele harmonischen en ruis
+    pitch = 140.0 + 40.0 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 6))
+    noise = rng.standard_normal(samples)
+    audio = envelope * (0.25 * voice + 0.05 * noise) + 0.002 * rng.standard_normal(samples)
+    return audio.astype(np.float32)
+
+
+def write_wav(path, audio):
+    import wave
+    import numpy as np
+
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(pcm.tobytes())
+
+
+def generate_media(directory, seed=0):
+    """
+    Schrijft de testmedia als WAV-bestanden naar directory en geeft de
+    paden met de totale audioduur terug.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    total = 0.0
+    for index, (name, soort, seconds) in enumerate(TESTMEDIA):
+        path = os.path.join(directory, f"{name}.wav")
+        write_wav(path, synthetic_audio(soort, seconds, seed + index))
+        paths.append(path)
+        total += seconds
+    return paths, total
+
+
+def environment():
+    """
+    Beschrijving van de machine en de pakketversies, voor bij de resultaten.
+    """
+    from subtitle_backends import package_version
+
+    return {
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": package_version("numpy"),
+        "torch": package_version("torch"),
+        "openai-whisper": package_version("openai-whisper"),
+    }
+
+
+def bench_pipeline(media_paths, audio_seconds, model_size, settings, repeat=1, log=None):
+    """
+    Verwerkt alle testmedia met de engine op de CPU en geeft de doorvoer en
+    de tijd per stap van de snelste herhaling terug. Het model wordt vooraf
+    geladen en apart gemeten.
+    """
+    from subtitle_engine import SubtitleEngine
+
+    output_dir = tempfile.mkdtemp(prefix="whisper-bench-")
+    try:
+        engine = SubtitleEngine(model_size=model_size, device="cpu", output_dir=output_dir,
+                                log=log or (lambda message: None), **settings)
+        load_start = time.perf_counter()
+        engine.load_model()
+        model_load = time.perf_counter() - load_start
+
+        best = None
+        for _ in range(max(1, repeat)):
+            start_time = time.perf_counter()
+            file_results = list(engine.process(media_paths))
+            wall = time.perf_counter() - start_time
+            if best is None or wall < best[0]:
+                best = (wall, file_results)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    wall, file_results = best
+    stage_seconds = {}
+    cues = 0
+    for file_result in file_results:
+        metrics = file_result.get("metrics") or {}
+        for name, seconds in metrics.get("timings", {}).items():
+            stage_seconds[name] = round(stage_seconds.get(name, 0.0) + seconds, 4)
+        cues += metrics.get("cues") or 0
+
+    return {
+        "benchmark": "pipeline",
+        "model": model_size,
+        "device": "cpu",
+        "settings": settings,
+        "files": len(file_results),
+        "errors": sum(1 for file_result in file_results if file_result["status"] == "error"),
+        "audio_seconds": audio_seconds,
+        "model_load_seconds": round(model_load, 3),
+        "wall_seconds": round(wall, 3),
+        "audio_seconds_per_sec": round(audio_seconds / wall, 3),
+        "rtf": round(wall / audio_seconds, 4),
+        "stage_seconds": stage_seconds,
+        "cues": cues,
+    }
+
+
+def bench_clean_file(count, repeat=3, seed=0):
+    """
+    Meet het reinigen van een groot SRT-bestand op schijf (lezen, reinigen
+    en atomair terugschrijven), telkens op een verse kopie.
+    """
+    from subtitle_clean import synthetic_cues, clean_srt_path
+    from subtitle_writer import srt_cue
+
+    directory = tempfile.mkdtemp(prefix="whisper-bench-")
+    try:
+        source = os.path.join(directory, "bron.nl.srt")
+        with open(source, "w", encoding="utf-8") as file:
+            for number, cue in enumerate(synthetic_cues(count, seed), 1):
+                file.write(srt_cue(number, number * 2.0, number * 2.0 + 1.5, cue))
+        size = os.path.getsize(source)
+
+        target = os.path.join(directory, "doel.nl.srt")
+        best = None
+        for _ in range(max(1, repeat)):
+            shutil.copyfile(source, target)
+            start_time = time.perf_counter()
+            clean_srt_path(target, "nl")
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "benchmark": "clean_srt_file",
+        "cues": count,
+        "bytes": size,
+        "seconds": round(best, 4),
+        "cues_per_sec": round(count / best) if best else None,
+        "mb_per_sec": round(size / best / 1e6, 2) if best else None,
+    }
+
+
+def bench_clean(count, repeat=3):
+    """
+    Reiniging per cue, voor een SRT in het geheugen en voor een SRT-bestand.
+    """
+    from subtitle_clean import benchmark
+
+    results = []
+    for result in benchmark(count, repeat):
+        result["benchmark"] = f"clean_{result['benchmark']}"
+        results.append(result)
+    results.append(bench_clean_file(count, repeat))
+    return results
+
+
+def result_key(result):
+    if result["benchmark"] == "pipeline":
+        return f"pipeline/{result['model']}/{result['device']}"
+    return result["benchmark"]
+
+
+def compare(results, baseline, tolerance=0.10):
+    """
+    Vergelijkt de resultaten met een eerder opgeslagen run. Een meting die
+    meer dan tolerance (fractie) slechter is dan de baseline is een regressie.
+    Geeft per vergeleken meting een dictionary terug.
+    """
+    baseline_results = {result_key(result): result for result in baseline.get("results", [])}
+    comparisons = []
+    for result in results:
+        key = result_key(result)
+        previous = baseline_results.get(key)
+        if previous is None:
+            continue
+        for metric, direction in VERGELIJKING.get(result["benchmark"], {}).items():
+            current, before = result.get(metric), previous.get(metric)
+            if not current or not before:
+                continue
+            change = (current - before) / before
+            if result.get("settings") != previous.get("settings"):
+                status = "andere instellingen"
+            elif change * direction < -tolerance:
+                status = "regressie"
+            elif change * direction > tolerance:
+                status = "verbetering"
+            else:
+                status = "gelijk"
+            comparisons.append({
+                "key": key,
+                "metric": metric,
+                "baseline": before,
+                "current": current,
+                "change": round(change, 4),
+                "status": status,
+            })
+    return comparisons
+
+
+def write_document(path, document):
+    from subtitle_writer import atomic_write
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write(path, json.dumps(document, indent=2, ensure_ascii=False) + "\n")
+
+
+def build_arg_parser():
+    from subtitle_engine import MODEL_GROOTTES
+
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks van de transcriptiepijplijn en de ondertitelreiniging.")
+    parser.add_argument("-m", "--models", default="tiny",
+                        help=f"komma-gescheiden modelgroottes ({', '.join(MODEL_GROOTTES)}; standaard: tiny)")
+    parser.add_argument("--media-dir", default=None,
+                        help="map voor de gegenereerde testmedia (standaard: tijdelijke map)")
+    parser.add_argument("--seed", type=int, default=0, help="seed voor de testmedia en testcues (standaard: 0)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="herhalingen van de pijplijn, de snelste telt (standaard: 1)")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="torch intra-op threads (standaard: automatisch)")
+    parser.add_argument("--vad", action="store_true", help="pijplijn met spraakdetectie meten")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="korte clips in batches transcriberen (standaard: 1, geen batches)")
+    parser.add_argument("--cues", type=int, default=20000,
+                        help="aantal cues voor de reinigingsbenchmarks (standaard: 20000)")
+    parser.add_argument("--clean-repeat", type=int, default=3,
+                        help="herhalingen van de reinigingsbenchmarks, de snelste telt (standaard: 3)")
+    parser.add_argument("--skip-pipeline", action="store_true", help="pijplijn niet meten")
+    parser.add_argument("--skip-clean", action="store_true", help="reiniging niet meten")
+    parser.add_argument("-o", "--output", default=None, help="resultaten als JSON naar dit bestand schrijven")
+    parser.add_argument("--baseline", default=None, help="resultaten vergelijken met deze eerder opgeslagen run")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="de baseline na afloop door deze resultaten vervangen")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="toegestane verslechtering t.o.v. de baseline als fractie (standaard: 0.10)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="logregels van de engine tonen")
+    return parser
+
+
+def main(argv=None):
+    from subtitle_engine import MODEL_GROOTTES, emit, log_to_stderr
+
+    args = build_arg_parser().parse_args(argv)
+    models = [model for model in args.models.replace(" ", "").split(",") if model]
+    unknown = [model for model in models if model not in MODEL_GROOTTES]
+    if unknown:
+        log_to_stderr(f"FOUT: Onbekende modelgrootte: {', '.join(unknown)}")
+        return 2
+
+    baseline = None
+    if args.baseline and os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    elif args.baseline and not args.update_baseline:
+        log_to_stderr(f"FOUT: Baseline niet gevonden: {args.baseline}")
+        return 2
+
+    results = []
+    if not args.skip_pipeline:
+        media_dir = args.media_dir or tempfile.mkdtemp(prefix="whisper-bench-media-")
+        try:
+            media_paths, audio_seconds = generate_media(media_dir, args.seed)
+            settings = {
+                "taal": "nl",
+                "threads": args.threads,
+                "vad": args.vad,
+                "batch_size": args.batch_size,
+            }
+            for model_size in models:
+                log_to_stderr(f"Pijplijn meten met model {model_size}...")
+                result = bench_pipeline(media_paths, audio_seconds, model_size, settings, args.repeat,
+                                        log=log_to_stderr if args.verbose else None)
+                results.append(result)
+                emit("result", **result)
+        finally:
+            if not args.media_dir:
+                shutil.rmtree(media_dir, ignore_errors=True)
+
+    if not args.skip_clean:
+        log_to_stderr(f"Reiniging meten met {args.cues} cues...")
+        for result in bench_clean(args.cues, args.clean_repeat):
+            results.append(result)
+            emit("result", **result)
+
+    document = {
+        "created": round(time.time(), 3),
+        "environment": environment(),
+        "results": results,
+    }
+
+    regressions = 0
+    if baseline is not None:
+        document["baseline"] = os.path.abspath(args.baseline)
+        document["comparison"] = compare(results, baseline, args.tolerance)
+        for comparison in document["comparison"]:
+            regressions += comparison["status"] == "regressie"
+            emit("comparison", **comparison)
+
+    if args.output:
+        write_document(args.output, document)
+    if args.baseline and args.update_baseline:
+        write_document(args.baseline, document)
+        log_to_stderr(f"Baseline bijgewerkt: {args.baseline}")
+
+    if regressions:
+        log_to_stderr(f"{regressions} regressie(s) ten opzichte van de baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
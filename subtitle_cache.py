@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - transcriptiecache
+# Bewaart de ruwe transcriptieresultaten (segmenten en woordtijden) op schijf,
+# geadresseerd op de inhoud van het bestand, het model, de taal en de
+# decodeeropties. Bij een cache-hit hoeven alleen de writer en de reiniging
+# opnieuw te draaien.
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+# Verhoog dit als het formaat van de opgeslagen resultaten verandert
+CACHE_VERSION = 1
+
+# Grootte van de blokken die voor de vingerafdruk worden gelezen
+FINGERPRINT_BLOCK = 1024 * 1024
+
+_fingerprint_memo = {}
+_fingerprint_lock = threading.Lock()
+
+
+def default_cache_root():
+    """
+    Basismap voor cachebestanden van deze applicatie.
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "whisper-subtitle-generator")
+
+
+def default_cache_dir():
+    return os.path.join(default_cache_root(), "transcripties")
+
+
+def parse_size(value):
+    """
+    Zet een grootte als '500M', '20G' of '1048576' om naar bytes.
+    """
+    value = str(value).strip().upper()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if value and value[-1] == "B":
+        value = value[:-1]
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def file_fingerprint(path):
+    """
+    Snelle vingerafdruk van een bestand: SHA-256 over de grootte en blokken
+    aan het begin, in het midden en aan het einde. Hetzelfde bestand onder
+    een andere naam of in een andere map geeft dezelfde vingerafdruk.
+    Het resultaat wordt per (pad, grootte, mtime) onthouden.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        if memo_key in _fingerprint_memo:
+            return _fingerprint_memo[memo_key]
+
+    digest = hashlib.sha256()
+    digest.update(str(stat.st_size).encode())
+    with open(path, "rb") as file:
+        if stat.st_size <= 3 * FINGERPRINT_BLOCK:
+            digest.update(file.read())
+        else:
+            for offset in (0, stat.st_size // 2 - FINGERPRINT_BLOCK // 2, stat.st_size - FINGERPRINT_BLOCK):
+                file.seek(offset)
+                digest.update(file.read(FINGERPRINT_BLOCK))
+    fingerprint = digest.hexdigest()
+
+    with _fingerprint_lock:
+        _fingerprint_memo[memo_key] = fingerprint
+    return fingerprint
+
+
+def cache_key(fingerprint, model_id, taal, options):
+    """
+    Sleutel van een cache-entry: audio-vingerafdruk + model + taal + decodeeropties.
+    """
+    payload = json.dumps({
+        "version": CACHE_VERSION,
+        "fingerprint": fingerprint,
+        "model": model_id,
+        "taal": taal,
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Cache van transcriptieresultaten in een map op schijf, één gzip JSON-bestand
+    per entry. Wordt de cache groter dan max_bytes, dan worden de minst
+    recent gebruikte entries verwijderd (LRU op basis van mtime).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._total_bytes = None  # Wordt bij de eerste put() berekend
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """
+        Geeft het opgeslagen Whisper resultaat terug, of None bij een miss.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        # Markeer als recent gebruikt voor de LRU-opruiming
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("result")
+
+    def put(self, key, result, **meta):
+        """
+        Slaat een Whisper resultaat op. Extra metadata (bestand, model, taal)
+        wordt meegeschreven voor 'list'.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = dict(meta, key=key, created=time.time(), result={
+            "text": result.get("text", ""),
+            "language": result.get("language"),
+            "segments": result.get("segments", []),
+        })
+
+        # Eerst naar een tijdelijk bestand, dan hernoemen: nooit een half geschreven entry
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            json.dump(entry, file, ensure_ascii=False, default=float)
+        try:
+            old_size = os.path.getsize(path)  # Een bestaande entry wordt overschreven
+        except OSError:
+            old_size = 0
+        os.replace(temp_path, path)
+
+        if self.max_bytes:
+            with self.lock:
+                if self._total_bytes is None:
+                    self._total_bytes = sum(size for _, size, _ in self._scan())
+                else:
+                    self._total_bytes += os.path.getsize(path) - old_size
+                over_limit = self._total_bytes > self.max_bytes
+            if over_limit:
+                self.prune(self.max_bytes)
+
+    def _scan(self):
+        """
+        Geeft (pad, grootte, mtime) van alle entries.
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if not filename.endswith(".json.gz"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def entries(self):
+        """
+        Geeft de metadata van alle entries, meest recent gebruikt eerst.
+        """
+        items = []
+        for path, size, mtime in sorted(self._scan(), key=lambda item: item[2], reverse=True):
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as file:
+                    entry = json.load(file)
+            except (OSError, ValueError):
+                continue
+            entry.pop("result", None)
+            entry["size"] = size
+            entry["last_used"] = mtime
+            items.append(entry)
+        return items
+
+    def stats(self):
+        entries = self._scan()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def prune(self, max_bytes=None, max_age=None):
+        """
+        Verwijdert entries ouder dan max_age seconden en daarna de minst recent
+        gebruikte entries tot de cache kleiner is dan max_bytes. Geeft het
+        aantal verwijderde entries en bytes terug.
+        """
+        with self.lock:
+            entries = sorted(self._scan(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            removed = removed_bytes = 0
+
+            for path, size, mtime in entries:
+                too_old = max_age is not None and now - mtime > max_age
+                too_big = max_bytes is not None and total > max_bytes
+                if not (too_old or too_big):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                removed_bytes += size
+
+            self._total_bytes = total
+            return removed, removed_bytes
+
+    def clear(self):
+        return self.prune(max_bytes=0)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Beheer de transcriptiecache van de Whisper Subtitle Generator.")
+    parser.add_argument("--cache-dir", default=None,
+                        help=f"cachemap (standaard: {default_cache_dir()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="aantal entries en totale grootte tonen")
+    list_parser = commands.add_parser("list", help="entries tonen, meest recent gebruikt eerst")
+    list_parser.add_argument("--json", action="store_true", help="als JSON-regels tonen")
+
+    prune_parser = commands.add_parser("prune", help="oude of minst recent gebruikte entries verwijderen")
+    prune_parser.add_argument("--max-size", default=None, help="maximale cachegrootte, bijv. 500M of 20G")
+    prune_parser.add_argument("--max-age", type=float, default=None, help="maximale leeftijd in dagen")
+
+    commands.add_parser("clear", help="de hele cache leegmaken")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    cache = TranscriptionCache(args.cache_dir)
+
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"Cachemap: {cache.cache_dir}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Grootte: {format_size(stats['bytes'])}")
+
+    elif args.command == "list":
+        for entry in cache.entries():
+            if args.json:
+                print(json.dumps(entry, ensure_ascii=False))
+                continue
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"{entry['key'][:12]}  {last_used}  {format_size(entry['size']):>10}  "
+                  f"{entry.get('model', '?')}  {entry.get('taal', '?')}  {entry.get('video', '')}")
+
+    elif args.command == "prune":
+        if args.max_size is None and args.max_age is None:
+            print("Geef --max-size en/of --max-age op", file=sys.stderr)
+            return 2
+        max_bytes = parse_size(args.max_size) if args.max_size is not None else None
+        max_age = args.max_age * 86400 if args.max_age is not None else None
+        removed, removed_bytes = cache.prune(max_bytes, max_age)
+        print(f"{removed} entries verwijderd ({format_size(removed_bytes)})")
+
+    elif args.command == "clear":
+        removed, removed_bytes = cache.clear()
+        print(f"{removed} entries verwijderd ({format_size(removed_bytes)})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - hardwarecapaciteiten en opstarttijd
+# Bepaalt welke onderdelen beschikbaar zijn (PyTorch, CUDA en de GPU,
+# openai-whisper, faster-whisper, FFmpeg) en bewaart het resultaat in de
+# gebruikerscache. Het probeert in een apart proces, zodat het importeren van
+# torch en het initialiseren van CUDA niet in het hoofdproces (of de UI
+# thread) gebeurt; volgende starts lezen alleen het JSON-bestand. Daarnaast
+# kan het per module tonen hoeveel importtijd de opstart kost.
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import subprocess
+
+from subtitle_cache import default_cache_root
+
+# Verhoog dit als de opgeslagen capaciteiten van vorm veranderen
+CAPACITEIT_VERSIE = 1
+
+GELDIGHEID_SECONDEN = 7 * 86400  # Daarna wordt opnieuw geprobeerd, ook als de omgeving gelijk lijkt
+PROBE_TIMEOUT = 120  # Maximale duur van het probe-proces in seconden
+
+# Pakketten waarvan een andere installatie de capaciteiten verandert
+PAKKETTEN = ["torch", "whisper", "faster_whisper", "ctranslate2"]
+
+# Modules voor het importtijdrapport
+IMPORT_MODULES = ["subtitle_engine", "numpy", "torch", "whisper", "faster_whisper", "tkinter"]
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+
+def default_capabilities_path():
+    return os.path.join(default_cache_root(), "capabilities.json")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def environment_signature():
+    """
+    Vingerafdruk van de omgeving zonder iets zwaars te importeren: de
+    Python-interpreter, de locatie en wijzigingstijd van de pakketten, het
+    ffmpeg-programma, CUDA_VISIBLE_DEVICES en de versie van de NVIDIA driver.
+    """
+    from importlib.util import find_spec
+
+    packages = {}
+    for name in PAKKETTEN:
+        try:
+            spec = find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        origin = spec.origin if spec is not None else None
+        packages[name] = [origin, _mtime(origin)]
+
+    ffmpeg = shutil.which("ffmpeg")
+    driver = None
+    try:
+        with open("/proc/driver/nvidia/version", encoding="utf-8", errors="replace") as file:
+            driver = file.readline().strip()
+    except OSError:
+        pass
+
+    payload = json.dumps({
+        "version": CAPACITEIT_VERSIE,
+        "python": [sys.executable, sys.version],
+        "packages": packages,
+        "ffmpeg": [ffmpeg, _mtime(ffmpeg)],
+        "cuda_visible_devices": os.environ.get("CUDA_VISIBLE_DEVICES"),
+        "driver": driver,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _probe(import_torch=True):
+    """
+    Het eigenlijke probeerwerk; draait in het probe-proces. Zonder
+    import_torch wordt torch alleen opgezocht (versie, geen CUDA), zodat de
+    aanroepende thread niet op de import en de CUDA-initialisatie wacht.
+    """
+    from importlib.util import find_spec
+    from subtitle_backends import package_version
+
+    capabilities = {
+        "torch": None,
+        "cuda": False,
+        "gpus": [],
+        "whisper": None,
+        "faster_whisper": None,
+        "ffmpeg": None,
+        "ffmpeg_version": None,
+        "errors": {},
+    }
+
+    if not import_torch:
+        if find_spec("torch") is not None:
+            capabilities["torch"] = package_version("torch")
+    else:
+        try:
+            import torch
+
+            capabilities["torch"] = torch.__version__
+            if torch.cuda.is_available():
+                capabilities["cuda"] = True
+                capabilities["gpus"] = [torch.cuda.get_device_name(index)
+                                        for index in range(torch.cuda.device_count())]
+        except Exception as e:
+            capabilities["errors"]["torch"] = str(e)
+
+    # Alleen kijken of de pakketten er zijn; importeren gebeurt pas bij het laden van het model
+    if find_spec("whisper") is not None:
+        capabilities["whisper"] = package_version("openai-whisper")
+    if find_spec("faster_whisper") is not None:
+        capabilities["faster_whisper"] = package_version("faster-whisper")
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        try:
+            out = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True, errors="replace", timeout=30)
+            if out.returncode == 0:
+                capabilities["ffmpeg"] = ffmpeg
+                capabilities["ffmpeg_version"] = (out.stdout.splitlines() or [""])[0]
+        except (OSError, subprocess.TimeoutExpired) as e:
+            capabilities["errors"]["ffmpeg"] = str(e)
+    return capabilities
+
+
+def probe_capabilities(timeout=PROBE_TIMEOUT):
+    """
+    Bepaalt de capaciteiten in een apart proces en geeft ze als dictionary
+    terug. Mislukt het proces, dan staat de fout onder "errors" en komt de
+    rest uit een lichte controle zonder torch te importeren: deze functie
+    kan ook vanuit de GUI worden aangeroepen, en CUDA geldt dan als niet
+    beschikbaar.
+    """
+    try:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "probe"],
+                             capture_output=True, text=True, errors="replace", timeout=timeout,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    except (OSError, ValueError, IndexError, subprocess.TimeoutExpired) as e:
+        # Zonder probe-proces toch een bruikbaar antwoord, maar zonder torch te importeren
+        capabilities = _probe(import_torch=False)
+        capabilities["errors"]["probe"] = str(e)
+        return capabilities
+
+
+def get_capabilities(refresh=False, path=None):
+    """
+    De capaciteiten van deze machine, uit het geheugen, uit het cachebestand
+    (als de omgeving niet veranderd is en het niet te oud is) of vers
+    geprobeerd. Gelijktijdige aanroepen wachten op één probe.
+    """
+    global _capabilities
+
+    path = path or default_capabilities_path()
+    with _capabilities_lock:
+        if _capabilities is not None and not refresh:
+            return _capabilities
+
+        signature = environment_signature()
+        if not refresh:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    entry = json.load(file)
+                if entry.get("signature") == signature and time.time() - entry.get("probed", 0) < GELDIGHEID_SECONDEN:
+                    _capabilities = dict(entry["capabilities"], cached=True)
+                    return _capabilities
+            except (OSError, ValueError, KeyError):
+                pass
+
+        start_time = time.time()
+        capabilities = probe_capabilities()
+        capabilities["probe_seconds"] = round(time.time() - start_time, 3)
+        # Een mislukte probe niet een week bewaren; de volgende start probeert opnieuw
+        if "probe" not in capabilities["errors"]:
+            try:
+                from subtitle_writer import atomic_write
+
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                atomic_write(path, json.dumps({"signature": signature, "probed": time.time(),
+                                               "capabilities": capabilities}, ensure_ascii=False, indent=2))
+            except OSError:
+                pass
+        _capabilities = dict(capabilities, cached=False)
+        return _capabilities
+
+
+def probe_in_background(callback=None, refresh=False):
+    """
+    Haalt de capaciteiten op in een achtergrondthread en roept daarna
+    callback(capabilities) aan. Geeft de thread terug.
+    """
+    def run():
+        capabilities = get_capabilities(refresh=refresh)
+        if callback is not None:
+            callback(capabilities)
+
+    thread = threading.Thread(target=run, name="capabilities", daemon=True)
+    thread.start()
+    return thread
+
+
+def import_times(module, top=10):
+    """
+    Importtijd van een module in een vers Python-proces (python -X
+    importtime). Geeft het totaal en de modules met de meeste eigen
+    importtijd terug, in seconden; None als de module niet geïnstalleerd is.
+    """
+    from importlib.util import find_spec
+
+    try:
+        if find_spec(module) is None:
+            return None
+    except (ImportError, ValueError):
+        return None
+
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, errors="replace",
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    entries = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Kopregel
+        entries.append((parts[2].strip(), own / 1e6, cumulative / 1e6))
+
+    total = next((cumulative for name, _, cumulative in reversed(entries) if name == module), None)
+    return {
+        "module": module,
+        "ok": out.returncode == 0,
+        "total": round(total, 4) if total is not None else None,
+        "top": [{"module": name, "self": round(own, 4), "cumulative": round(cumulative, 4)}
+                for name, own, cumulative in sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]],
+    }
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Toon de hardwarecapaciteiten en de importtijden van de "
+                                                 "Whisper Subtitle Generator.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = commands.add_parser("show", help="capaciteiten tonen (uit de cache als die actueel is)")
+    show_parser.add_argument("--refresh", action="store_true", help="opnieuw proberen en de cache bijwerken")
+    show_parser.add_argument("--json", action="store_true", help="als JSON tonen")
+
+    imports_parser = commands.add_parser("imports", help="importtijd per module tonen, elk in een vers proces")
+    imports_parser.add_argument("modules", nargs="*", default=None,
+                                help=f"modules (standaard: {', '.join(IMPORT_MODULES)})")
+    imports_parser.add_argument("--top", type=int, default=5,
+                                help="aantal modules met de meeste eigen importtijd per module (standaard: 5)")
+    imports_parser.add_argument("--json", action="store_true", help="als JSON-regels tonen")
+
+    commands.add_parser("probe", help=argparse.SUPPRESS)  # Intern: het probe-proces
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == "probe":
+        print(json.dumps(_probe(), ensure_ascii=False))
+
+    elif args.command == "show":
+        capabilities = get_capabilities(refresh=args.refresh)
+        if args.json:
+            print(json.dumps(capabilities, ensure_ascii=False))
+            return 0
+        origin = "cache" if capabilities.get("cached") else f"geprobeerd in {capabilities.get('probe_seconds', 0):.2f} s"
+        print(f"Capaciteiten ({origin}, {default_capabilities_path()}):")
+        print(f"  PyTorch:        {capabilities['torch'] or 'niet beschikbaar'}")
+        print(f"  CUDA:           {', '.join(capabilities['gpus']) if capabilities['cuda'] else 'niet beschikbaar'}")
+        print(f"  openai-whisper: {capabilities['whisper'] or 'niet geïnstalleerd'}")
+        print(f"  faster-whisper: {capabilities['faster_whisper'] or 'niet geïnstalleerd'}")
+        print(f"  FFmpeg:         {capabilities['ffmpeg_version'] or 'niet gevonden'}")
+        for name, error in capabilities.get("errors", {}).items():
+            print(f"  Fout ({name}): {error}")
+
+    elif args.command == "imports":
+        for module in args.modules or IMPORT_MODULES:
+            report = import_times(module, args.top)
+            if args.json:
+                print(json.dumps(report or {"module": module, "total": None}, ensure_ascii=False))
+                continue
+            if report is None:
+                print(f"{module}: niet geïnstalleerd")
+                continue
+            status = "" if report["ok"] else "  (import mislukt)"
+            print(f"{module}: {report['total'] or 0:.3f} s{status}")
+            for entry in report["top"]:
+                print(f"    {entry['self']:8.3f} s eigen  {entry['cumulative']:8.3f} s totaal  {entry['module']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
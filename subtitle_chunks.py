@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - parallelle transcriptie binnen één bestand
+# Eén lange opname wordt na het decoderen in stukken geknipt, bij voorkeur
+# midden in een stilte, en de stukken worden tegelijk door meerdere
+# worker-processen getranscribeerd. Daarna worden de segmenten weer op de
+# tijdlijn van het hele bestand gezet, dubbele segmenten uit overlappende
+# stukken verwijderd en opnieuw genummerd.
+
+import os
+import time
+import queue
+import multiprocessing
+
+from subtitle_audio import SAMPLE_RATE
+
+# Stukken
+STUK_SECONDEN = 300  # Gewenste lengte van een stuk
+ZOEKVENSTER = 60  # Zoek een stilte tot zoveel seconden rond het gewenste knippunt
+MIN_STILTE = 0.3  # Kortere stiltes zijn geen knippunt
+OVERLAP = 2.0  # Overlap (seconden) aan beide kanten als er midden in spraak geknipt moet worden
+PAUZE_ZOEKVENSTER = 5  # Zonder stilte: zoek het stilste frame tot zoveel seconden rond het knippunt
+
+
+def plan_chunks(audio, chunk_seconds=STUK_SECONDEN, sr=SAMPLE_RATE):
+    """
+    Deelt audio op in stukken van ongeveer chunk_seconds. Een knippunt komt
+    in het midden van de stilte die het dichtst bij het gewenste punt ligt;
+    is er binnen het zoekvenster geen stilte, dan wordt op het stilste
+    frame geknipt en overlappen de stukken. Geeft per stuk een dictionary
+    met het stuk audio ("start", "end") en het deel waarvan het de
+    segmenten levert ("own_start", "own_end"), in seconden.
+    """
+    import numpy as np
+    from subtitle_vad import FRAME_MS, detect_speech, frame_levels
+
+    duration = len(audio) / sr
+    count = max(1, int(round(duration / chunk_seconds)))
+    if count == 1:
+        return [{"start": 0.0, "end": duration, "own_start": 0.0, "own_end": duration}]
+
+    # Stiltes zijn de gaten tussen de spraakgebieden
+    regions = detect_speech(audio, sr, padding=0.0)
+    edges = [0.0] + [point for region in regions for point in region] + [duration]
+    silences = [(start, end) for start, end in zip(edges[0::2], edges[1::2]) if end - start >= MIN_STILTE]
+    levels = None
+    search = min(ZOEKVENSTER, chunk_seconds / 4)
+
+    cuts = []  # (tijd, midden in spraak)
+    for index in range(1, count):
+        target = index * duration / count
+        candidates = [(start + end) / 2 for start, end in silences if abs((start + end) / 2 - target) <= search]
+        if candidates:
+            cuts.append((min(candidates, key=lambda middle: abs(middle - target)), False))
+            continue
+        # Geen stilte in de buurt: het stilste frame rond het gewenste punt
+        if levels is None:
+            levels = frame_levels(audio, sr)
+        frame_seconds = FRAME_MS / 1000
+        first = max(0, int((target - PAUZE_ZOEKVENSTER) / frame_seconds))
+        last = max(first + 1, min(len(levels), int((target + PAUZE_ZOEKVENSTER) / frame_seconds)))
+        cuts.append(((first + int(np.argmin(levels[first:last]))) * frame_seconds, True))
+
+    chunks = []
+    bounds = [(0.0, False)] + cuts + [(duration, False)]
+    for (own_start, hard_start), (own_end, hard_end) in zip(bounds, bounds[1:]):
+        if own_end <= own_start:
+            continue
+        chunks.append({
+            "start": max(0.0, own_start - OVERLAP) if hard_start else own_start,
+            "end": min(duration, own_end + OVERLAP) if hard_end else own_end,
+            "own_start": own_start,
+            "own_end": own_end,
+        })
+    return chunks
+
+
+def _same_text(first, second):
+    first = " ".join(first.lower().split())
+    second = " ".join(second.lower().split())
+    return bool(first) and (first == second or first in second or second in first)
+
+
+def stitch(results, chunks):
+    """
+    Voegt de resultaten van de stukken samen tot één resultaat op de
+    tijdlijn van het hele bestand. Een segment hoort bij het stuk waarin
+    zijn midden valt; een segment dat een vorig segment overlapt en
+    dezelfde tekst heeft (uit de overlap van twee stukken) vervalt.
+    """
+    segments = []
+    segment_languages = []  # Taal van het stuk waar elk segment uit komt
+    seconds = {}
+    for number, (chunk, result) in enumerate(zip(chunks, results)):
+        last_chunk = number == len(chunks) - 1
+        chunk_language = result.get("language")
+        for segment in result.get("segments", []):
+            segment = dict(segment)
+            segment["start"] += chunk["start"]
+            segment["end"] += chunk["start"]
+            if segment.get("words"):
+                segment["words"] = [dict(word, start=word["start"] + chunk["start"], end=word["end"] + chunk["start"])
+                                    for word in segment["words"]]
+
+            middle = (segment["start"] + segment["end"]) / 2
+            if middle < chunk["own_start"] or (middle >= chunk["own_end"] and not last_chunk):
+                continue
+            if segments and segment["start"] < segments[-1]["end"]:
+                if _same_text(segment["text"], segments[-1]["text"]):
+                    continue
+                segment["start"] = min(segments[-1]["end"], segment["end"])
+
+            segment["id"] = len(segments)
+            segments.append(segment)
+            segment_languages.append(chunk_language)
+
+        for language, value in (result.get("languages") or {chunk_language: chunk["end"] - chunk["start"]}).items():
+            if language:
+                seconds[language] = seconds.get(language, 0.0) + value
+
+    if len(seconds) > 1:
+        # Stukken in verschillende talen: elk segment houdt de taal van zijn stuk
+        for segment, language in zip(segments, segment_languages):
+            if language:
+                segment.setdefault("language", language)
+
+    stitched = {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": max(seconds, key=seconds.get) if seconds else None,
+    }
+    if len(seconds) > 1:
+        stitched["languages"] = {language: round(value, 1) for language, value in seconds.items()}
+    return stitched
+
+
+def merge_vad_stats(results, duration):
+    """
+    Telt de VAD-statistieken van de stukken op; door de overlap zijn de
+    aantallen bij benadering.
+    """
+    stats = [result["vad"] for result in results if "vad" in result]
+    if not stats:
+        return None
+    chunk_duration = sum(item["duration"] for item in stats)
+    scale = duration / chunk_duration if chunk_duration else 1.0
+    skipped = sum(item["skipped"] for item in stats) * scale
+    return {
+        "duration": round(duration, 2),
+        "speech": round(max(0.0, duration - skipped), 2),
+        "skipped": round(skipped, 2),
+        "skipped_percent": round(100 * skipped / duration, 1) if duration else 0.0,
+        "regions": sum(item["regions"] for item in stats),
+    }
+
+
+def _chunk_worker(worker_id, settings, threads, task_queue, result_queue):
+    """
+    Hoofdlus van een worker-proces: laadt het model één keer en
+    transcribeert stukken audio tot er een stop-signaal (None) komt.
+    """
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    from subtitle_engine import SubtitleEngine
+
+    current = {"index": None}
+
+    def log(message):
+        result_queue.put(("log", worker_id, current["index"], message))
+
+    engine = SubtitleEngine(threads=threads, log=log, **settings)
+    engine.current_video = "stuk"
+    engine.file_progress = lambda _, seconds, duration=None: result_queue.put(
+        ("progress", worker_id, current["index"], seconds))
+
+    try:
+        engine.load_model()
+    except Exception as e:
+        result_queue.put(("failed", worker_id, None, str(e)))
+        return
+    result_queue.put(("ready", worker_id, None, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, audio, language = task
+        current["index"] = index
+        result_queue.put(("start", worker_id, index, None))
+        if isinstance(audio, tuple):
+            # Verwijzing naar de PCM-store: zelf mappen in plaats van een kopie
+            from subtitle_pcmstore import map_reference
+
+            audio = map_reference(*audio)
+        try:
+            result_queue.put(("result", worker_id, index, engine.run_model(audio, language=language)))
+        except Exception as e:
+            result_queue.put(("error", worker_id, index, str(e)))
+        current["index"] = None
+
+
+class ChunkPool:
+    """
+    Worker-processen die stukken van één bestand tegelijk transcriberen.
+    Blijft tussen bestanden bestaan, zodat elk proces het model maar één
+    keer laadt; close() stopt de processen.
+    """
+
+    def __init__(self, settings, workers, threads=None, log=None):
+        self.settings = dict(settings)
+        self.workers = max(1, workers)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.log = log or (lambda message: None)
+        self.processes = []
+        self.context = multiprocessing.get_context("spawn")
+        self.task_queue = None
+        self.result_queue = None
+
+    def start(self):
+        self.log(f"{self.workers} processen starten voor parallelle transcriptie "
+                 f"(elk {self.threads} thread(s))")
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        for worker_id in range(self.workers):
+            process = self.context.Process(
+                target=_chunk_worker,
+                args=(worker_id, self.settings, self.threads, self.task_queue, self.result_queue),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def transcribe(self, audio, chunks, language=None, progress=None):
+        """
+        Transcribeert de stukken uit plan_chunks() en geeft de resultaten in
+        dezelfde volgorde terug. progress krijgt het aantal verwerkte
+        seconden van alle stukken samen.
+        """
+        from subtitle_pcmstore import shared_reference
+
+        if not self.processes:
+            self.start()
+
+        # Audio uit de PCM-store mappen de workers zelf; alleen andere audio
+        # gaat gepickled door de wachtrij
+        reference = shared_reference(audio)
+        for index, chunk in enumerate(chunks):
+            start, end = int(chunk["start"] * SAMPLE_RATE), int(chunk["end"] * SAMPLE_RATE)
+            if reference is not None:
+                piece = (reference, start, end)
+            else:
+                piece = audio[start:end]
+            self.task_queue.put((index, piece, language))
+
+        results = [None] * len(chunks)
+        done = [0.0] * len(chunks)
+        in_flight = {}  # worker_id -> index van het stuk dat die worker verwerkt
+        remaining = len(chunks)
+        while remaining:
+            try:
+                kind, worker_id, index, payload = self.result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers(in_flight, len(chunks))
+                continue
+
+            if kind == "log":
+                prefix = f"[stuk {index + 1}/{len(chunks)}] " if index is not None else f"[worker {worker_id}] "
+                self.log(prefix + payload)
+            elif kind == "failed":
+                self.close()
+                raise RuntimeError(f"Worker kon het model niet laden: {payload}")
+            elif kind == "start":
+                in_flight[worker_id] = index
+            elif kind == "progress":
+                done[index] = payload
+                if progress is not None:
+                    progress(sum(done))
+            elif kind == "error":
+                # De overige stukken worden nog afgemaakt zodat de wachtrij leeg is
+                results[index] = RuntimeError(f"Stuk {index + 1}: {payload}")
+                in_flight.pop(worker_id, None)
+                remaining -= 1
+            elif kind == "result":
+                results[index] = payload
+                in_flight.pop(worker_id, None)
+                chunk = chunks[index]
+                done[index] = chunk["end"] - chunk["start"]
+                if progress is not None:
+                    progress(sum(done))
+                remaining -= 1
+
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def _check_workers(self, in_flight, total):
+        """
+        Detecteert workers die onverwacht zijn gestopt (bijv. door de OOM
+        killer). Het stuk dat zo'n worker verwerkte komt nooit meer terug;
+        het bestand mislukt dan en de pool wordt gestopt, zodat het volgende
+        bestand met verse processen begint. Ook een worker die stopt voordat
+        zijn "start" binnen is, laat een stuk achter dat niemand afmaakt.
+        """
+        for worker_id, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            index = in_flight.get(worker_id)
+            exitcode = process.exitcode
+            self.close()
+            if index is not None:
+                raise RuntimeError(f"Stuk {index + 1}/{total}: worker-proces gestopt met exitcode {exitcode}")
+            raise RuntimeError(f"Worker-proces voor parallelle transcriptie gestopt met exitcode {exitcode}")
+
+    def close(self):
+        if not self.processes:
+            return
+        for _ in self.processes:
+            self.task_queue.put(None)
+        deadline = time.time() + 5
+        for process in self.processes:
+            process.join(timeout=max(0, deadline - time.time()))
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+        self.processes = []
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - ondertitelreiniging
+# Verwijdert tekst voor slechthorenden (geluidseffecten, sprekernamen, regels
+# in hoofdletters). Alle patronen worden één keer per taal gecompileerd tot
+# één reguliere expressie, zodat elke cue in één doorgang wordt gereinigd.
+# De reiniging werkt op de segmenten in het geheugen, vóór het wegschrijven,
+# en kan ook los op bestaande SRT-bestanden worden gedraaid.
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import functools
+
+# Haakjesparen die met inhoud en al worden verwijderd: [tekst], (tekst), {tekst}
+HAAKJES = ["[]", "()", "{}"]
+
+# Markeringen rond geluidseffecten: *lacht*, #muziek#
+EFFECT_TEKENS = ["*", "#"]
+
+# Standaardregels; per taal kunnen regels worden aangepast
+STANDAARD_REGELS = {
+    "haakjes": HAAKJES,
+    "effecten": EFFECT_TEKENS,
+    "sprekers": True,  # "JOHN: Hallo" wordt "Hallo"
+    "hoofdletterregels": True,  # Regels volledig in hoofdletters verwijderen
+}
+
+# Schriften zonder hoofdletters: de hoofdletterregels zouden daar elke regel
+# als "volledig in hoofdletters" zien en alle tekst verwijderen
+_ZONDER_HOOFDLETTERS = {"sprekers": False, "hoofdletterregels": False}
+
+TAAL_REGELS = {
+    "zh": dict(_ZONDER_HOOFDLETTERS, haakjes=HAAKJES + ["（）", "【】", "［］"]),
+    "ja": dict(_ZONDER_HOOFDLETTERS, haakjes=HAAKJES + ["（）", "【】", "［］"]),
+    "ko": dict(_ZONDER_HOOFDLETTERS, haakjes=HAAKJES + ["（）"]),
+    "ar": _ZONDER_HOOFDLETTERS,
+    "hi": _ZONDER_HOOFDLETTERS,
+}
+
+_SRT_BLOK = re.compile(r"\n[ \t]*\n")
+
+
+def regels_voor(taal):
+    """
+    Geeft de reinigingsregels voor een ISO-taalcode.
+    """
+    return dict(STANDAARD_REGELS, **TAAL_REGELS.get(taal, {}))
+
+
+class SubtitleCleaner:
+    """
+    Gecompileerde reiniger voor één set regels. Haakjes, geluidseffecten en
+    sprekernamen worden door één reguliere expressie in één doorgang
+    verwijderd; daarna volgen het filter op hoofdletterregels en het
+    samenvoegen van witruimte.
+    """
+
+    def __init__(self, regels=None):
+        self.regels = dict(STANDAARD_REGELS, **(regels or {}))
+
+        # Eén alternatief per haakjespaar of effectteken; niet over regelgrenzen heen
+        groups = []
+        for pair in self.regels["haakjes"]:
+            open_char, close_char = re.escape(pair[0]), re.escape(pair[1])
+            groups.append(f"{open_char}[^{close_char}\\n]*{close_char}")
+        for char in self.regels["effecten"]:
+            char = re.escape(char)
+            groups.append(f"{char}[^{char}\\n]*{char}")
+
+        alternatives = list(groups)
+        triggers = [pair[0] for pair in self.regels["haakjes"]] + list(self.regels["effecten"])
+        if self.regels["sprekers"]:
+            # Sprekernaam in hoofdletters voor een dubbele punt; een effect
+            # tussen naam en dubbele punt ("JOHN (lacht): ...") hoort erbij
+            inner = "|".join(groups + [r"[A-Z\s]"])
+            alternatives.append(f"[A-Z]{{2,}}(?:{inner})*:")
+            triggers.append(":")
+
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        # De meeste cues bevatten geen enkel beginteken; die slaan de expressie over
+        self.trigger = re.compile("[" + "".join(re.escape(char) for char in triggers) + "]") if triggers else None
+        self.hoofdletterregels = self.regels["hoofdletterregels"]
+
+    def clean_text(self, text):
+        """
+        Reinigt de tekst van één cue; geeft een lege string terug als er
+        niets overblijft.
+        """
+        if self.pattern is not None and self.trigger.search(text):
+            text = self.pattern.sub("", text)
+
+        if self.hoofdletterregels:
+            # isupper(): minstens één letter en geen kleine letters
+            if "\n" in text:
+                text = "\n".join(line for line in text.split("\n") if not line.isupper())
+            elif text.isupper():
+                return ""
+
+        # Dubbele witruimte en witruimte aan begin/eind verwijderen
+        return " ".join(text.split())
+
+    def clean_segments(self, segments):
+        """
+        Geeft een nieuwe lijst segmenten met gereinigde tekst; segmenten
+        waarvan niets overblijft vallen weg. De oorspronkelijke segmenten
+        (bijvoorbeeld in de cache) blijven ongewijzigd.
+        """
+        cleaned = []
+        for segment in segments:
+            text = self.clean_text(segment["text"])
+            if text:
+                cleaned.append(dict(segment, text=text))
+        return cleaned
+
+    def clean_srt(self, content):
+        """
+        Reinigt de inhoud van een SRT-bestand. Cues zonder tekst worden
+        verwijderd en de overgebleven cues opnieuw doorgenummerd; blokken in
+        een onverwacht formaat blijven ongewijzigd. Geeft (inhoud, aantal
+        cues, aantal verwijderde cues) terug.
+        """
+        blocks = []
+        number = removed = 0
+        for block in _SRT_BLOK.split(content.replace("\r\n", "\n").strip()):
+            lines = block.split("\n")
+            if len(lines) >= 2 and lines[0].strip().isdigit() and "-->" in lines[1]:
+                text = self.clean_text("\n".join(lines[2:]))
+                if not text:
+                    removed += 1
+                    continue
+                number += 1
+                blocks.append(f"{number}\n{lines[1].strip()}\n{text}\n\n")
+            elif block.strip():
+                blocks.append(block + "\n\n")
+        return "".join(blocks), number, removed
+
+
+@functools.lru_cache(maxsize=None)
+def get_cleaner(taal=None):
+    """
+    Gedeelde, gecompileerde reiniger per taal.
+    """
+    return SubtitleCleaner(regels_voor(taal))
+
+
+def taal_uit_bestandsnaam(srt_path):
+    """
+    Haalt de taalcode uit een bestandsnaam als <naam>.<taal>.srt, of None.
+    """
+    stem = os.path.splitext(os.path.basename(srt_path))[0]
+    suffix = os.path.splitext(stem)[1][1:]
+    return suffix.lower() if 2 <= len(suffix) <= 3 and suffix.isalpha() else None
+
+
+def clean_srt_path(srt_path, taal=None):
+    """
+    Reinigt een bestaand SRT-bestand op schijf. Het bestand wordt alleen
+    herschreven als er iets verandert. Geeft (aantal cues, aantal
+    verwijderde cues, gewijzigd) terug.
+    """
+    cleaner = get_cleaner(taal or taal_uit_bestandsnaam(srt_path))
+    with open(srt_path, "r", encoding="utf-8-sig") as file:
+        content = file.read()
+
+    cleaned, cues, removed = cleaner.clean_srt(content)
+    changed = cleaned != content
+    if changed:
+        from subtitle_writer import atomic_write
+        atomic_write(srt_path, cleaned)
+    return cues, removed, changed
+
+
+def find_srt_files(inputs, recursive=False):
+    srt_paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for dirpath, dirnames, filenames in os.walk(item):
+                    dirnames.sort()
+                    srt_paths.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                                     if name.lower().endswith(".srt"))
+            else:
+                srt_paths.extend(os.path.join(item, name) for name in sorted(os.listdir(item))
+                                 if name.lower().endswith(".srt"))
+        else:
+            srt_paths.append(item)
+    return srt_paths
+
+
+def _clean_job(job):
+    srt_path, taal = job
+    try:
+        return (srt_path,) + clean_srt_path(srt_path, taal) + (None,)
+    except Exception as e:
+        return srt_path, 0, 0, False, str(e)
+
+
+# Referentie: de oorspronkelijke reiniging, alleen nog gebruikt door de benchmark
+
+def legacy_clean_text(text):
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'\(.*?\)', '', text)
+    text = re.sub(r'\{.*?\}', '', text)
+    text = re.sub(r'\*.*?\*', '', text)
+    text = re.sub(r'#.*?#', '', text)
+    text = re.sub(r'[A-Z]{2,}[A-Z\s]*:', '', text)
+    lines = text.split('\n')
+    cleaned_lines = []
+    for line in lines:
+        if not (line.strip() and line.strip().upper() == line.strip() and any(c.isalpha() for c in line)):
+            cleaned_lines.append(line)
+    text = '\n'.join(cleaned_lines)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_clean_srt(lines):
+    cleaned_lines = []
+    i = 0
+    while i < len(lines):
+        if lines[i].strip().isdigit():
+            cleaned_lines.append(lines[i])
+            i += 1
+            if i < len(lines) and '-->' in lines[i]:
+                cleaned_lines.append(lines[i])
+                i += 1
+                subtitle_lines = []
+                while i < len(lines) and lines[i].strip() != '':
+                    subtitle_lines.append(lines[i])
+                    i += 1
+                cleaned_subtitle = legacy_clean_text('\n'.join(subtitle_lines))
+                if cleaned_subtitle.strip():
+                    cleaned_lines.append(cleaned_subtitle + '\n')
+                else:
+                    cleaned_lines.pop()
+                    cleaned_lines.pop()
+                if i < len(lines):
+                    cleaned_lines.append(lines[i])
+                    i += 1
+        else:
+            cleaned_lines.append(lines[i])
+            i += 1
+    return cleaned_lines
+
+
+def synthetic_cues(count, seed=0):
+    """
+    Deterministische testcues met een realistische mix van gewone tekst,
+    geluidseffecten, sprekernamen en regels in hoofdletters.
+    """
+    rng = random.Random(seed)
+    words = ("ik", "je", "het", "de", "een", "niet", "dat", "wat", "is", "was", "hier", "daar",
+             "nu", "goed", "weet", "zeg", "morgen", "Amsterdam", "echt", "waarom", "samen")
+    extras = ("[MUZIEK]", "(lacht)", "{deur gaat open}", "*zucht*", "#applaus#", "JOHN:", "ANNA (fluistert):",
+              "[Gelach]", "(ZUCHT)", "MARIA:")
+
+    cues = []
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.choice((1, 1, 2))):
+            line = " ".join(rng.choice(words) for _ in range(rng.randint(3, 9)))
+            roll = rng.random()
+            if roll < 0.25:
+                line = f"{rng.choice(extras)} {line}"
+            elif roll < 0.35:
+                line = f"{line} {rng.choice(extras)}"
+            elif roll < 0.42:
+                line = line.upper()
+            lines.append(line[0].upper() + line[1:])
+        cues.append("\n".join(lines))
+    return cues
+
+
+def _rate(function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best if best else float("inf")
+
+
+def benchmark(count=20000, repeat=3, seed=0):
+    """
+    Vergelijkt de doorvoer (cues per seconde) van de oorspronkelijke en de
+    gecompileerde reiniging, per cue en voor een heel SRT-bestand in het
+    geheugen. Geeft een lijst resultaat-dictionaries terug.
+    """
+    from subtitle_writer import srt_cue
+
+    cues = synthetic_cues(count, seed)
+    cleaner = get_cleaner("nl")
+    agree = sum(1 for cue in cues if legacy_clean_text(cue) == cleaner.clean_text(cue))
+
+    legacy_rate = _rate(legacy_clean_text, cues, repeat)
+    new_rate = _rate(cleaner.clean_text, cues, repeat)
+    results = [{
+        "benchmark": "cue",
+        "cues": count,
+        "legacy_cues_per_sec": round(legacy_rate),
+        "cues_per_sec": round(new_rate),
+        "speedup": round(new_rate / legacy_rate, 2),
+        "identical": agree,
+    }]
+
+    content = "".join(srt_cue(number, number * 2.0, number * 2.0 + 1.5, cue) for number, cue in enumerate(cues, 1))
+    lines = content.splitlines(keepends=True)
+
+    legacy_rate = _rate(legacy_clean_srt, [lines], repeat) * count
+    new_rate = _rate(cleaner.clean_srt, [content], repeat) * count
+    results.append({
+        "benchmark": "srt",
+        "cues": count,
+        "legacy_cues_per_sec": round(legacy_rate),
+        "cues_per_sec": round(new_rate),
+        "speedup": round(new_rate / legacy_rate, 2),
+    })
+    return results
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Reinig bestaande ondertitelbestanden of meet de snelheid van de reiniging.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    clean_parser = commands.add_parser("clean", help="bestaande SRT-bestanden reinigen")
+    clean_parser.add_argument("inputs", nargs="+", help="SRT-bestanden of mappen")
+    clean_parser.add_argument("-r", "--recursive", action="store_true", help="mappen recursief doorzoeken")
+    clean_parser.add_argument("-l", "--taal", default=None,
+                              help="ISO-taalcode voor de regels (standaard: uit <naam>.<taal>.srt)")
+    clean_parser.add_argument("-j", "--jobs", type=int, default=1,
+                              help="aantal processen (standaard: 1)")
+
+    bench_parser = commands.add_parser("bench", help="doorvoer vergelijken met de oorspronkelijke reiniging")
+    bench_parser.add_argument("--cues", type=int, default=20000, help="aantal testcues (standaard: 20000)")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="aantal herhalingen, beste telt (standaard: 3)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == "bench":
+        for result in benchmark(args.cues, args.repeat):
+            print(json.dumps(result), flush=True)
+        return 0
+
+    jobs = [(srt_path, args.taal) for srt_path in find_srt_files(args.inputs, args.recursive)]
+    if args.jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=args.jobs)
+        results = executor.map(_clean_job, jobs, chunksize=64)
+    else:
+        executor = None
+        results = map(_clean_job, jobs)
+
+    failed = changed_files = removed_cues = 0
+    for srt_path, cues, removed, changed, error in results:
+        if error:
+            failed += 1
+            print(f"FOUT {srt_path}: {error}", file=sys.stderr)
+            continue
+        changed_files += changed
+        removed_cues += removed
+    if executor is not None:
+        executor.shutdown()
+
+    print(f"{len(jobs)} bestand(en) gecontroleerd, {changed_files} gewijzigd, "
+          f"{removed_cues} cue(s) verwijderd, {failed} fout(en)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - ontdubbeling
+# Herkent media die al eerder (of eerder in dezelfde batch) is verwerkt: eerst
+# op de snelle vingerafdruk van het bestand (dezelfde bytes onder een andere
+# naam), daarna op een akoestische vingerafdruk van de gedecodeerde audio
+# (dezelfde opname in een andere container of opnieuw gecodeerd). Voor een
+# duplicaat worden de bestaande ondertitels gekopieerd of hard gelinkt in
+# plaats van het bestand opnieuw te transcriberen.
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+from subtitle_audio import SAMPLE_RATE
+
+# Akoestische vingerafdruk (naar Haitsma & Kalker): per frame 32 bits die
+# aangeven of het energieverschil tussen twee naburige frequentiebanden
+# stijgt of daalt ten opzichte van het vorige frame. Die bits blijven bij
+# hercoderen grotendeels gelijk; van verschillende opnames verschilt de helft.
+VINGERAFDRUK_RATE = 8000  # De audio wordt eerst naar 8 kHz teruggebracht
+FRAME = 1024  # Samples per frame (128 ms bij 8 kHz)
+HOP = 256  # Stap tussen frames (32 ms)
+BANDEN = 33  # 33 banden geven 32 bits per frame
+LAAGSTE_FREQ = 300
+HOOGSTE_FREQ = 3000
+FRAMES_PER_BLOK = 4096  # Aantal frames dat tegelijk door de FFT gaat
+
+# Vergelijken
+DUPLICAAT_BER = 0.25  # Maximale fractie verschillende bits voor een duplicaat
+DUUR_MARGE = 2.0  # Maximaal verschil in duur (seconden) van twee duplicaten
+MAX_VERSCHUIVING = 2.0  # Maximale verschuiving van het begin (seconden)
+HERGEBRUIK_VERSCHUIVING = 0.1  # Maximale verschuiving waarbij de ondertitels ongewijzigd bruikbaar zijn
+UITLIJN_FRAMES = 2000  # Frames waarop de verschuiving wordt bepaald
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    video TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    file_hash TEXT,
+    duration REAL,
+    fingerprint BLOB,
+    taal TEXT,
+    outputs TEXT,
+    cues INTEGER,
+    compute_seconds REAL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    saved_seconds REAL NOT NULL DEFAULT 0,
+    updated REAL,
+    PRIMARY KEY (video, settings)
+);
+CREATE INDEX IF NOT EXISTS media_hash ON media (settings, file_hash);
+CREATE INDEX IF NOT EXISTS media_duration ON media (settings, duration);
+"""
+
+
+def default_dedup_path():
+    from subtitle_cache import default_cache_root
+
+    return os.path.join(default_cache_root(), "dedup.sqlite")
+
+
+def audio_fingerprint(audio, sr=SAMPLE_RATE):
+    """
+    Akoestische vingerafdruk van audio (float32, mono) als uint32-array met
+    één waarde per frame.
+    """
+    import numpy as np
+
+    # Terug naar 8 kHz door steeds factor samples te middelen; boven de
+    # 3 kHz wordt niet gekeken
+    factor = max(1, sr // VINGERAFDRUK_RATE)
+    audio = np.asarray(audio, dtype=np.float32)
+    audio = audio[:len(audio) // factor * factor].reshape(-1, factor).mean(axis=1)
+    rate = sr // factor
+
+    n_frames = (len(audio) - FRAME) // HOP + 1
+    if n_frames < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    freqs = np.fft.rfftfreq(FRAME, 1 / rate)
+    edges = np.geomspace(LAAGSTE_FREQ, HOOGSTE_FREQ, BANDEN + 1)
+    band_of_bin = np.searchsorted(edges, freqs, side="right") - 1
+    # Matrix die het vermogen per FFT-bin optelt tot het vermogen per band
+    bands = np.zeros((len(freqs), BANDEN), dtype=np.float32)
+    valid = (band_of_bin >= 0) & (band_of_bin < BANDEN)
+    bands[np.flatnonzero(valid), band_of_bin[valid]] = 1.0
+    window = np.hanning(FRAME).astype(np.float32)
+
+    # In blokken, zodat een opname van uren niet in één keer geframed wordt
+    energies = np.empty((n_frames, BANDEN), dtype=np.float64)
+    for first in range(0, n_frames, FRAMES_PER_BLOK):
+        count = min(FRAMES_PER_BLOK, n_frames - first)
+        starts = (first + np.arange(count)) * HOP
+        frames = audio[starts[:, None] + np.arange(FRAME)] * window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        energies[first:first + count] = power @ bands
+
+    diff = energies[:, :-1] - energies[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    return np.packbits(bits, axis=1).view(">u4").ravel().astype(np.uint32)
+
+
+def bit_error_rate(first, second, shift=0):
+    """
+    Fractie verschillende bits tussen twee vingerafdrukken, waarbij second
+    shift frames verschoven is; 1.0 als ze niet overlappen.
+    """
+    import numpy as np
+
+    if shift >= 0:
+        a, b = first[shift:], second
+    else:
+        a, b = first, second[-shift:]
+    length = min(len(a), len(b))
+    if length == 0:
+        return 1.0
+    a, b = a[:length], b[:length]
+    # Frames die in beide afdrukken nul zijn (digitale stilte) tellen niet
+    # mee; anders lijken twee grotendeels stille bestanden op elkaar
+    active = (a | b) != 0
+    if not active.any():
+        return 0.0
+    xor = np.bitwise_xor(a[active], b[active])
+    return float(np.unpackbits(xor.view(np.uint8)).sum()) / (32 * int(active.sum()))
+
+
+def compare_fingerprints(first, second):
+    """
+    Beste bit error rate over de toegestane verschuivingen. De verschuiving
+    wordt op het begin bepaald en daarna over de hele lengte gecontroleerd.
+    """
+    max_shift = int(MAX_VERSCHUIVING * VINGERAFDRUK_RATE / HOP)
+    head_a, head_b = first[:UITLIJN_FRAMES + max_shift], second[:UITLIJN_FRAMES + max_shift]
+    shift = min(range(-max_shift, max_shift + 1), key=lambda s: bit_error_rate(head_a, head_b, s))
+    return bit_error_rate(first, second, shift), shift * HOP / VINGERAFDRUK_RATE
+
+
+def _pack(fingerprint):
+    return None if fingerprint is None else fingerprint.astype("<u4").tobytes()
+
+
+def _unpack(blob):
+    import numpy as np
+
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def link_outputs(outputs, base_path, formats, mode="copy"):
+    """
+    Zet de uitvoer van het origineel (formaat -> pad) onder base_path.<formaat>.
+    mode "hardlink" maakt een harde link en valt terug op kopiëren als dat
+    niet kan (bijv. op een ander bestandssysteem). Elk bestand komt in één
+    keer op zijn plaats. Geeft de nieuwe paden en de gebruikte methode terug.
+    """
+    paths = {}
+    method = mode
+    for fmt in formats:
+        source = outputs[fmt]
+        target = f"{base_path}.{fmt}"
+        paths[fmt] = target
+        if os.path.exists(target) and os.path.samefile(source, target):
+            continue
+
+        directory = os.path.dirname(os.path.abspath(target))
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+        os.close(fd)
+        try:
+            linked = False
+            if mode == "hardlink":
+                os.remove(temp_path)
+                try:
+                    os.link(source, temp_path)
+                    linked = True
+                except OSError:
+                    method = "copy"
+            if not linked:
+                shutil.copy2(source, temp_path)
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+    return paths, method
+
+
+def savings(duplicates):
+    """
+    Totalen van een lijst "duplicate"-dictionaries uit de resultaten: aantal
+    bestanden, niet getranscribeerde audio en bespaarde rekentijd (seconden).
+    """
+    return {
+        "files": len(duplicates),
+        "audio_seconds": round(sum(item.get("audio_seconds") or 0.0 for item in duplicates), 1),
+        "saved_seconds": round(sum(item.get("saved_seconds") or 0.0 for item in duplicates), 1),
+    }
+
+
+def savings_message(duplicates):
+    totals = savings(duplicates)
+    return (f"Ontdubbeling: {totals['files']} bestand(en) overgenomen in plaats van getranscribeerd, "
+            f"{totals['audio_seconds']:.0f} seconden audio, "
+            f"ongeveer {totals['saved_seconds']:.0f} seconden rekentijd bespaard")
+
+
+class DedupIndex:
+    """
+    Index van verwerkte media in een SQLite-database: per bestand en
+    instellingen de vingerafdrukken, de duur en de geschreven uitvoer.
+    Kan door meerdere threads en processen tegelijk gebruikt worden.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_dedup_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _candidate(self, row, formats):
+        """
+        Zet een rij om naar een match, als alle gevraagde uitvoer nog bestaat.
+        """
+        video, taal, outputs, cues, duration, compute_seconds = row
+        outputs = json.loads(outputs or "{}")
+        if not all(fmt in outputs and os.path.isfile(outputs[fmt]) for fmt in formats):
+            return None
+        return {
+            "video": video,
+            "taal": taal,
+            "outputs": outputs,
+            "cues": cues,
+            "duration": duration,
+            "compute_seconds": compute_seconds,
+        }
+
+    def find_file(self, file_hash, settings, formats, exclude=None):
+        """
+        Zoekt een eerder verwerkt bestand met dezelfde bestandsvingerafdruk.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT video, taal, outputs, cues, duration, compute_seconds FROM media "
+                "WHERE settings = ? AND file_hash = ? AND video != ? ORDER BY updated DESC",
+                (json.dumps(settings, sort_keys=True), file_hash, os.path.abspath(exclude or ""))).fetchall()
+        for row in rows:
+            match = self._candidate(row, formats)
+            if match is not None:
+                match["match"] = "file"
+                return match
+        return None
+
+    def find_audio(self, fingerprint, duration, settings, formats, exclude=None):
+        """
+        Zoekt een eerder verwerkt bestand met (vrijwel) dezelfde audio: ongeveer
+        even lang en een bit error rate onder DUPLICAAT_BER. Een opname die
+        meer dan HERGEBRUIK_VERSCHUIVING verschoven is (bijv. een hercodering
+        met een paar seconden extra aan het begin) telt niet: de tijdcodes van
+        de overgenomen ondertitels zouden dan niet kloppen.
+        """
+        if fingerprint is None or len(fingerprint) == 0:
+            return None
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT video, taal, outputs, cues, duration, compute_seconds, fingerprint FROM media "
+                "WHERE settings = ? AND fingerprint IS NOT NULL AND duration BETWEEN ? AND ? AND video != ? "
+                "ORDER BY ABS(duration - ?)",
+                (json.dumps(settings, sort_keys=True), duration - DUUR_MARGE, duration + DUUR_MARGE,
+                 os.path.abspath(exclude or ""), duration)).fetchall()
+
+        best = None
+        for row in rows:
+            ber, offset = compare_fingerprints(_unpack(row[6]), fingerprint)
+            if ber > DUPLICAAT_BER or (best is not None and ber >= best["ber"]):
+                continue
+            if abs(offset) > HERGEBRUIK_VERSCHUIVING:
+                continue
+            match = self._candidate(row[:6], formats)
+            if match is not None:
+                best = dict(match, match="audio", ber=round(ber, 4), offset=round(offset, 3))
+        return best
+
+    def add(self, video_path, settings, file_hash, duration, fingerprint, taal, outputs, cues,
+            compute_seconds=None):
+        """
+        Legt een verwerkt bestand vast. Een bekende rekentijd blijft staan als
+        het bestand later uit de cache opnieuw wordt geschreven.
+        """
+        with self.lock:
+            self.connection.execute(
+                """
+                INSERT INTO media (video, settings, file_hash, duration, fingerprint, taal, outputs, cues,
+                                   compute_seconds, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video, settings) DO UPDATE SET
+                    file_hash = excluded.file_hash,
+                    duration = COALESCE(excluded.duration, media.duration),
+                    fingerprint = COALESCE(excluded.fingerprint, media.fingerprint),
+                    taal = excluded.taal, outputs = excluded.outputs, cues = excluded.cues,
+                    compute_seconds = COALESCE(excluded.compute_seconds, media.compute_seconds),
+                    updated = excluded.updated
+                """,
+                (os.path.abspath(video_path), json.dumps(settings, sort_keys=True), file_hash, duration,
+                 _pack(fingerprint), taal, json.dumps(outputs), cues, compute_seconds, time.time()))
+            self.connection.commit()
+
+    def record_hit(self, source_video, settings, saved_seconds):
+        """
+        Telt een keer hergebruik van de uitvoer van source_video.
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE media SET hits = hits + 1, saved_seconds = saved_seconds + ? WHERE video = ? AND settings = ?",
+                (saved_seconds or 0.0, source_video, json.dumps(settings, sort_keys=True)))
+            self.connection.commit()
+
+    def summary(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*), COUNT(fingerprint), COALESCE(SUM(hits), 0), COALESCE(SUM(saved_seconds), 0) "
+                "FROM media").fetchone()
+
+    def rows(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT video, duration, hits, saved_seconds, updated FROM media ORDER BY hits DESC, updated DESC"
+            ).fetchall()
+
+    def forget(self, video_path=None):
+        """
+        Verwijdert één bestand (of alles) uit de index.
+        """
+        with self.lock:
+            if video_path is None:
+                self.connection.execute("DELETE FROM media")
+            else:
+                self.connection.execute("DELETE FROM media WHERE video = ?", (os.path.abspath(video_path),))
+            self.connection.commit()
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Bekijk of beheer de ontdubbelingsindex van de "
+                                                 "Whisper Subtitle Generator.")
+    parser.add_argument("--index", default=None,
+                        help=f"pad van de index (standaard: {default_dedup_path()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="aantal bestanden en bespaarde rekentijd tonen")
+    commands.add_parser("list", help="bestanden tonen, meest hergebruikte eerst")
+    forget_parser = commands.add_parser("forget", help="bestanden uit de index verwijderen")
+    forget_parser.add_argument("videos", nargs="*", help="bestanden (leeg = alles)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    index = DedupIndex(args.index)
+
+    if args.command == "summary":
+        files, fingerprints, hits, saved = index.summary()
+        print(f"bestanden            {files}")
+        print(f"met audio-afdruk     {fingerprints}")
+        print(f"keer hergebruikt     {hits}")
+        print(f"rekentijd bespaard   {saved:.0f} s")
+    elif args.command == "list":
+        for video, duration, hits, saved, updated in index.rows():
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated)) if updated else "-"
+            length = f"{duration:.0f} s" if duration else "-"
+            print(f"{when}  {length:>8}  hergebruikt: {hits}  bespaard: {saved:.0f} s  {video}")
+    elif args.command == "forget":
+        if args.videos:
+            for video in args.videos:
+                index.forget(video)
+        else:
+            index.forget()
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - headless verwerkingsengine
+# Bevat de volledige transcriptiepijplijn zonder Tkinter, zodat deze ook op
+# machines zonder beeldscherm (render nodes, cron, queue workers) kan draaien.
+# De GUI gebruikt dezelfde engine.
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import contextlib
+
+# Bestandstypen die worden opgepikt wanneer een map wordt opgegeven
+VIDEO_EXTENSIES = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+MODEL_GROOTTES = ["tiny", "base", "small", "medium", "large"]
+
+# Taal naar ISO-code mapping
+TAAL_MAPPING = {
+    "Nederlands": "nl",
+    "Engels": "en",
+    "Duits": "de",
+    "Frans": "fr",
+    "Spaans": "es",
+    "Italiaans": "it",
+    "Portugees": "pt",
+    "Russisch": "ru",
+    "Chinees": "zh",
+    "Japans": "ja",
+    "Koreaans": "ko",
+    "Arabisch": "ar",
+    "Hindi": "hi",
+    "Turks": "tr",
+    "Pools": "pl",
+    "Zweeds": "sv",
+    "Deens": "da",
+    "Noors": "no",
+    "Fins": "fi",
+    "Automatisch detecteren": "auto"
+}
+
+# Omgekeerde mapping voor weergave
+ISO_NAAR_TAAL = {v: k for k, v in TAAL_MAPPING.items()}
+
+# Taal automatisch detecteren in plaats van een vaste taal
+AUTO_TAAL = "auto"
+DETECTIE_VENSTERS = 3  # Aantal spraakvensters van 30 seconden voor de taaldetectie
+DETECTIE_BATCH = 8  # Vensters per encoder-batch bij detectie per segment
+DETECTIE_SCAN = 300  # Seconden audio per VAD-stap bij het zoeken naar spraak voor de taaldetectie
+DETECTIE_DREMPEL = 0.5  # Minimale kans om een venster aan een andere taal toe te wijzen
+ONBEKENDE_TAAL = "und"  # Naam in de uitvoer als er geen spraak is gevonden
+
+
+class ModelLoadError(RuntimeError):
+    """
+    Het model kon niet geladen worden; dit breekt de hele batch af in plaats
+    van alleen het huidige bestand.
+    """
+
+
+def log_to_stderr(message):
+    """
+    Standaard logfunctie voor headless gebruik: schrijft naar stderr zodat
+    stdout vrij blijft voor de resultaten.
+    """
+    timestamp = time.strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+
+def clean_subtitle_text(text, taal=None):
+    """
+    Reinigt een stuk ondertiteltekst door tekst voor slechthorenden te verwijderen
+    (zie subtitle_clean voor de regels per taal)
+    """
+    from subtitle_clean import get_cleaner
+
+    return get_cleaner(taal).clean_text(text)
+
+
+def clean_srt_file(srt_path, log=log_to_stderr, taal=None):
+    """
+    Verwijdert tekst voor slechthorenden uit een bestaand SRT-bestand:
+    - Tekst tussen haakjes [tekst], (tekst), {tekst}
+    - Tekst in hoofdletters (als het een heel woord is)
+    - Tekst voor dubbele punt als het in hoofdletters is (PERSOON: tekst)
+    - Geluidseffecten zoals *lacht*, #muziek#, etc.
+    Zonder taal wordt de taal uit de bestandsnaam (<naam>.<taal>.srt) gehaald.
+    """
+    from subtitle_clean import clean_srt_path
+
+    try:
+        log(f"Opschonen van ondertitelbestand: {os.path.basename(srt_path)}")
+        cues, removed, _ = clean_srt_path(srt_path, taal)
+        log(f"Ondertitelbestand succesvol opgeschoond ({removed} van {cues + removed} cues verwijderd)")
+        return True
+
+    except Exception as e:
+        log(f"Fout bij opschonen van ondertitelbestand: {str(e)}")
+        return False
+
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Zet een lijst van bestanden, mappen en glob-patronen om naar een
+    lijst van unieke videobestanden (in opgegeven volgorde).
+    """
+    video_paths = []
+    seen = set()
+
+    def add(path):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            video_paths.append(path)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for dirpath, dirnames, filenames in os.walk(item):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        if filename.lower().endswith(VIDEO_EXTENSIES):
+                            add(os.path.join(dirpath, filename))
+            else:
+                for filename in sorted(os.listdir(item)):
+                    path = os.path.join(item, filename)
+                    if os.path.isfile(path) and filename.lower().endswith(VIDEO_EXTENSIES):
+                        add(path)
+        elif glob.has_magic(item):
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path):
+                    add(path)
+        else:
+            # Gewoon bestand; bestaat het niet, dan meldt process_file dat per bestand
+            add(item)
+
+    return video_paths
+
+
+class SubtitleEngine:
+    """
+    Transcriptiepijplijn zonder GUI-afhankelijkheden. Laadt het Whisper model
+    eenmalig en genereert ondertitels voor een lijst bestanden.
+    """
+
+    def __init__(self, model_size="small", taal="nl", device="auto",
+                 clean_subtitles=True, output_dir=None, threads=None,
+                 prefetch=2, max_ffmpeg=1, stream=False, stream_window=600,
+                 stream_overlap=15, cache_dir=None, cache_max_bytes=None,
+                 manifest_path=None, force=False, vad=False, vad_skip_music=False, formats=None,
+                 backend=None, model_dir=None, batch_size=1, batch_wait=2.0, taal_per_segment=False,
+                 dedup_path=None, dedup_link="copy", chunk_workers=0, chunk_seconds=300,
+                 pcm_dir=None, pcm_max_bytes=None, profile_dir=None, profile_sample=1.0, profile_torch=False,
+                 progress=None, progress_interval=1.0, log=None):
+        self.model_size = model_size
+        self.taal = taal
+        self.device = device  # "auto", "cuda" of "cpu"
+        self.clean_subtitles = clean_subtitles
+        self.output_dir = output_dir  # None = naast de video opslaan
+        self.threads = threads  # Aantal torch intra-op threads (None = torch standaard)
+        self.prefetch = prefetch  # Aantal bestanden dat vooruit wordt gedecodeerd (0 = uit)
+        self.max_ffmpeg = max_ffmpeg  # Maximaal aantal gelijktijdige ffmpeg processen
+        self.stream = stream  # Lange opnames in vensters verwerken met begrensd geheugen
+        self.stream_window = stream_window  # Lengte van een venster in seconden
+        self.stream_overlap = stream_overlap  # Overlap tussen vensters in seconden
+        self.manifest_path = manifest_path  # Job manifest (None = uit)
+        self.force = force  # Ook bestanden verwerken die volgens het manifest al klaar zijn
+        self.vad = vad  # Stilte overslaan met spraakdetectie vóór de transcriptie
+        self.vad_skip_music = vad_skip_music  # Ook aanhoudende muziek overslaan
+        self.formats = list(formats or ["srt"])  # Uitvoerformaten, het eerste is het hoofdbestand
+        self.model_dir = model_dir  # Map met lokaal opgeslagen modelgewichten (None = standaard)
+        self.batch_size = batch_size  # Aantal korte clips per batch (1 = geen batches)
+        self.batch_wait = batch_wait  # Maximale wachttijd (seconden) op de volgende clip voor een batch
+        self.taal_per_segment = taal_per_segment  # Met taal "auto": de taal per venster bepalen
+        self.dedup_path = dedup_path  # Ontdubbelingsindex (None = uit)
+        self.dedup_link = dedup_link  # Uitvoer van duplicaten: "copy" of "hardlink"
+        self.chunk_workers = chunk_workers  # Processen voor één lang bestand (0 = uit, of "auto")
+        self.chunk_seconds = chunk_seconds  # Gewenste lengte van een stuk bij parallelle transcriptie
+
+        # Inferentie-backend (openai-whisper of faster-whisper)
+        from subtitle_backends import get_backend
+        self.backend = get_backend(backend, model_dir=model_dir, threads=threads)
+        self.log_callback = log or log_to_stderr
+        self.progress_callback = progress  # Krijgt de voortgang als dictionary (zie subtitle_progress)
+        self.progress_interval = progress_interval  # Minimale tijd tussen tussenstanden per bestand
+
+        # Transcriptiecache (None = uit)
+        self.cache = None
+        if cache_dir:
+            from subtitle_cache import TranscriptionCache
+            self.cache = TranscriptionCache(cache_dir, cache_max_bytes)
+        # Gedecodeerde audio op schijf (None = uit)
+        self.pcm_store = None
+        if pcm_dir:
+            from subtitle_pcmstore import PCMStore
+            self.pcm_store = PCMStore(pcm_dir, pcm_max_bytes)
+        # Profilering per stap van een steekproef van de bestanden (None = uit)
+        self.profiler = None
+        if profile_dir:
+            from subtitle_profile import Profiler
+            self.profiler = Profiler(profile_dir, profile_sample, profile_torch, log=self.log)
+        self.dedup = None  # DedupIndex, wordt bij het eerste gebruik geopend
+        self.chunk_pool = None  # ChunkPool, wordt bij het eerste lange bestand gestart
+
+        # Status variabelen
+        self.is_processing = False
+        self.stop_requested = False
+        self.model = None
+        self.resolved_device = None
+        self.timer = None  # StageTimer van het bestand dat nu verwerkt wordt
+        self.file_profile = None  # FileProfile van het bestand dat nu verwerkt wordt, als het geprofileerd wordt
+        self.decode_profiles = {}  # pad -> FileProfile met het decoderen uit de AudioPrefetcher
+        self.current_video = None  # Bestand dat nu verwerkt wordt
+        self.file_progress = None  # Callback (pad, seconden, duur) voor de voortgang binnen een bestand
+
+    def log(self, message):
+        self.log_callback(message)
+
+    def report_progress(self, seconds, duration=None):
+        """
+        Meldt tot waar (in seconden) het huidige bestand verwerkt is.
+        """
+        if self.file_progress is not None and self.current_video is not None:
+            self.file_progress(self.current_video, seconds, duration)
+
+    def stage(self, name):
+        """
+        Meet de duur van een verwerkingsstap van het huidige bestand, en
+        profileert de stap als het bestand in de steekproef zit.
+        """
+        if self.timer is None:
+            return contextlib.nullcontext()
+        if self.file_profile is not None:
+            return self.file_profile.stage(name, self.timer.stage(name))
+        return self.timer.stage(name)
+
+    def stop(self):
+        """
+        Vraagt de engine te stoppen na het huidige bestand.
+        """
+        self.stop_requested = True
+        self.is_processing = False
+
+    def resolve_device(self):
+        """
+        Bepaalt het daadwerkelijke device ("cuda" of "cpu") op basis van de
+        instelling en de beschikbare hardware.
+        """
+        from subtitle_models import select_device
+
+        device, message = select_device(self.device)
+        self.log(message)
+        return device
+
+    def load_model(self):
+        """
+        Haalt het model op bij de gedeelde ModelManager; die laadt het alleen
+        als het nog niet in het geheugen van dit proces staat.
+        """
+        if self.model is not None:
+            return self.model
+
+        try:
+            with self.stage("model_load"):
+                from subtitle_models import get_model_manager
+
+                if self.threads and self.backend.name == "openai-whisper":
+                    # Andere backends krijgen de threads zelf; torch alleen importeren als het nodig is
+                    import torch
+
+                    torch.set_num_threads(self.threads)
+                    self.log(f"Torch gebruikt {self.threads} thread(s)")
+
+                self.resolved_device = self.resolve_device()
+                self.model = get_model_manager().get(self.model_size, self.resolved_device, log=self.log,
+                                                     backend=self.backend)
+        except Exception as e:
+            raise ModelLoadError(str(e)) from e
+        return self.model
+
+    def preload_model(self):
+        """
+        Laadt het model op de achtergrond, zodat het laden overlapt met het
+        decoderen en het opzoeken in de cache.
+        """
+        from subtitle_models import get_model_manager
+
+        return get_model_manager().preload(self.model_size, self.device, log=self.log, backend=self.backend)
+
+    def model_id(self):
+        """
+        Backend, versie en grootte van het model, voor de cachesleutel.
+        """
+        return f"{self.backend.name}-{self.backend.version()}:{self.model_size}"
+
+    def decode_options(self):
+        """
+        Opties die de uitkomst van de transcriptie bepalen (voor de cachesleutel).
+        """
+        options = {"task": "transcribe"}
+        if self.vad:
+            options["vad"] = {"skip_music": self.vad_skip_music}
+        if self.taal == AUTO_TAAL and self.taal_per_segment:
+            options["taal_per_segment"] = True
+        return options
+
+    def cache_key(self, video_path):
+        from subtitle_cache import cache_key, file_fingerprint
+
+        return cache_key(file_fingerprint(video_path), self.model_id(), self.taal, self.decode_options())
+
+    def is_cached(self, video_path):
+        """
+        True als er een transcriptie van dit bestand in de cache staat.
+        """
+        if self.cache is None or self.stream:
+            return False
+        try:
+            return self.cache.contains(self.cache_key(video_path))
+        except OSError:
+            return False
+
+    def output_settings(self):
+        """
+        Instellingen die de inhoud van het ondertitelbestand bepalen; verandert
+        een daarvan, dan wordt een bestand in het manifest niet meer als klaar
+        beschouwd.
+        """
+        return {
+            "model": self.model_id(),
+            "taal": self.taal,
+            "clean": self.clean_subtitles,
+            "stream": self.stream,
+            "output_dir": self.output_dir,
+            "formats": self.formats,
+            "decode": self.decode_options(),
+        }
+
+    def open_manifest(self):
+        if not self.manifest_path:
+            return None
+        from subtitle_manifest import JobManifest
+        return JobManifest(self.manifest_path)
+
+    def is_done(self, manifest, video_path):
+        """
+        True als het bestand volgens het manifest al actueel verwerkt is.
+        """
+        if manifest is None or self.force:
+            return False
+        return manifest.is_up_to_date(video_path, self.output_settings())
+
+    def skipped_result(self, video_path, manifest=None):
+        self.log(f"Overgeslagen (al verwerkt): {os.path.basename(video_path)}")
+        # Bij automatische taaldetectie staat de werkelijke naam in het manifest
+        output = manifest.output_for(video_path) if manifest is not None else None
+        return {
+            "video": video_path,
+            "output": output or self.output_path_for(video_path),
+            "taal": self.taal,
+            "status": "skipped",
+        }
+
+    def dedup_index(self):
+        if not self.dedup_path:
+            return None
+        if self.dedup is None:
+            from subtitle_dedup import DedupIndex
+            self.dedup = DedupIndex(self.dedup_path)
+        return self.dedup
+
+    def dedup_settings(self):
+        """
+        Instellingen waarin een duplicaat moet overeenkomen om de uitvoer
+        over te nemen: de uitvoerinstellingen zonder de uitvoermap.
+        """
+        settings = self.output_settings()
+        del settings["output_dir"]
+        return settings
+
+    def output_formats(self):
+        return ["srt"] if self.stream else self.formats
+
+    def batch_copies(self, video_paths):
+        """
+        Bestanden die (volgens de snelle vingerafdruk) gelijk zijn aan een
+        eerder bestand in de lijst. Die worden na het origineel verwerkt en
+        nemen dan de uitvoer over.
+        """
+        from subtitle_cache import file_fingerprint
+
+        if not self.dedup_path or self.force:
+            return set()
+        seen = set()
+        copies = set()
+        for video_path in video_paths:
+            try:
+                fingerprint = file_fingerprint(video_path)
+            except OSError:
+                continue
+            if fingerprint in seen:
+                copies.add(video_path)
+            seen.add(fingerprint)
+        return copies
+
+    def find_file_duplicate(self, video_path):
+        """
+        Zoekt een eerder verwerkt bestand met dezelfde inhoud. Met --force
+        wordt altijd opnieuw getranscribeerd.
+        """
+        from subtitle_cache import file_fingerprint
+
+        index = self.dedup_index()
+        if index is None or self.force:
+            return None
+        try:
+            return index.find_file(file_fingerprint(video_path), self.dedup_settings(), self.output_formats(),
+                                   exclude=video_path)
+        except Exception as e:
+            self.log(f"Ontdubbeling overgeslagen: {str(e)}")
+            return None
+
+    def find_audio_duplicate(self, video_path, fingerprint, duration):
+        """
+        Zoekt een eerder verwerkt bestand met dezelfde audio.
+        """
+        index = self.dedup_index()
+        if index is None or self.force:
+            return None
+        try:
+            return index.find_audio(fingerprint, duration, self.dedup_settings(), self.output_formats(),
+                                    exclude=video_path)
+        except Exception as e:
+            self.log(f"Ontdubbeling overgeslagen: {str(e)}")
+            return None
+
+    def reuse_duplicate(self, video_path, match, file_result):
+        """
+        Neemt de uitvoer van een eerder verwerkt duplicaat over (kopie of
+        harde link) in plaats van het bestand te transcriberen.
+        """
+        from subtitle_dedup import link_outputs
+
+        taal = match["taal"]
+        paths, method = link_outputs(match["outputs"], self.output_base_for(video_path, taal),
+                                     self.output_formats(), self.dedup_link)
+        file_result["taal"] = taal
+        file_result["output"] = self.output_path_for(video_path, taal)
+        if len(paths) > 1:
+            file_result["outputs"] = list(paths.values())
+        file_result["cues"] = match["cues"]
+        file_result["duplicate"] = {
+            "source": match["video"],
+            "match": match["match"],
+            "method": method,
+            "audio_seconds": match["duration"],
+            "saved_seconds": match["compute_seconds"],
+        }
+        if match["match"] == "audio":
+            file_result["duplicate"]["ber"] = match["ber"]
+            soort = f"dezelfde audio, {100 * match['ber']:.0f}% afwijkende bits"
+        else:
+            soort = "hetzelfde bestand"
+        self.log(f"{os.path.basename(video_path)} is een duplicaat van {os.path.basename(match['video'])} "
+                 f"({soort}); ondertitels {'gelinkt' if method == 'hardlink' else 'gekopieerd'}")
+        self.log(f"Ondertitels opgeslagen in: {', '.join(paths.values())}")
+        self.dedup_index().record_hit(match["video"], self.dedup_settings(), match["compute_seconds"])
+        return file_result
+
+    def remember(self, video_path, file_result, paths, fingerprint=None, duration=None):
+        """
+        Legt een verwerkt bestand vast in de ontdubbelingsindex, zodat latere
+        duplicaten de uitvoer kunnen overnemen.
+        """
+        from subtitle_cache import file_fingerprint
+
+        index = self.dedup_index()
+        if index is None:
+            return
+        try:
+            index.add(video_path, self.dedup_settings(), file_fingerprint(video_path), duration, fingerprint,
+                      file_result["taal"], paths, file_result.get("cues"), file_result.get("transcribe_time"))
+        except Exception as e:
+            self.log(f"Kon {os.path.basename(video_path)} niet in de ontdubbelingsindex opslaan: {str(e)}")
+
+    def output_base_for(self, video_path, taal=None):
+        """
+        Geeft het pad van de uitvoer zonder extensie: <naam>.<taal> in de
+        uitvoermap, of in dezelfde map als de video. taal is de gedetecteerde
+        taal als de taal automatisch bepaald wordt.
+        """
+        video_full_name = os.path.basename(video_path)
+        video_name_without_ext = os.path.splitext(video_full_name)[0]
+        output_dir = self.output_dir or os.path.dirname(os.path.abspath(video_path))
+        return os.path.join(output_dir, f"{video_name_without_ext}.{taal or self.taal}")
+
+    def output_path_for(self, video_path, taal=None):
+        """
+        Geeft het pad van het hoofdbestand, bijvoorbeeld <naam>.<taal>.srt.
+        Streaming schrijft altijd SRT.
+        """
+        fmt = "srt" if self.stream else self.formats[0]
+        return f"{self.output_base_for(video_path, taal)}.{fmt}"
+
+    def result_taal(self, result):
+        """
+        De taal van een transcriptie: de gekozen taal, of bij automatische
+        detectie de taal die in het resultaat staat.
+        """
+        if self.taal != AUTO_TAAL:
+            return self.taal
+        return result.get("language") or ONBEKENDE_TAAL
+
+    def speech_windows(self, audio, count=None, vad_done=False):
+        """
+        Deelt audio op in vensters van 30 seconden voor de taaldetectie; met
+        count alleen de eerste vensters met spraak. Geeft (begin in samples,
+        venster) paren terug. vad_done geeft aan dat de audio al uit de VAD
+        komt en dus geen stiltes meer bevat.
+        """
+        from subtitle_audio import SAMPLE_RATE
+        from subtitle_backends import BATCH_MAX_SECONDS
+
+        window = int(BATCH_MAX_SECONDS * SAMPLE_RATE)
+        if count is not None and not vad_done:
+            # Alleen spraak gebruiken. De VAD loopt in stappen van DETECTIE_SCAN
+            # seconden en stopt zodra er genoeg spraak is, zodat een lange opname
+            # niet helemaal doorzocht (en gekopieerd) wordt voor een paar vensters.
+            import numpy as np
+            from subtitle_vad import SpeechMap
+
+            wanted = count * window
+            step = int(DETECTIE_SCAN * SAMPLE_RATE)
+            pieces = []
+            found = 0
+            for start in range(0, len(audio), step):
+                speech = SpeechMap.from_audio(audio[start:start + step]).audio
+                if len(speech):
+                    pieces.append(speech[:wanted - found])
+                    found += len(pieces[-1])
+                if found >= wanted:
+                    break
+            if pieces:
+                audio = np.concatenate(pieces)
+
+        windows = [(start, audio[start:start + window]) for start in range(0, len(audio), window)]
+        if len(windows) > 1 and len(windows[-1][1]) < SAMPLE_RATE:
+            # Een staartje van minder dan een seconde zegt weinig over de taal
+            windows[-2] = (windows[-2][0], audio[windows[-2][0]:])
+            windows.pop()
+        return windows[:count] if count is not None else windows
+
+    def detect_language(self, audio, vad_done=False):
+        """
+        Bepaalt de taal uit de eerste spraakvensters (gemiddelde van de
+        kansen per venster). Geeft (taalcode, kans) terug, of (None, 0) als
+        er geen audio is. vad_done: de audio komt al uit de VAD.
+        """
+        windows = [window for _, window in self.speech_windows(audio, DETECTIE_VENSTERS, vad_done)]
+        if not windows:
+            return None, 0.0
+        with self.stage("detect"):
+            probs = self.backend.detect_language(self.load_model(), windows, device=self.resolved_device)
+
+        totals = {}
+        for window_probs in probs:
+            for language, prob in window_probs.items():
+                totals[language] = totals.get(language, 0.0) + prob / len(probs)
+        language = max(totals, key=totals.get)
+        taal_naam = ISO_NAAR_TAAL.get(language, language.upper())
+        self.log(f"Taal gedetecteerd: {taal_naam} ({language}, {totals[language]:.0%})")
+        return language, totals[language]
+
+    def language_runs(self, audio):
+        """
+        Bepaalt de taal van elk venster van 30 seconden en voegt opeenvolgende
+        vensters met dezelfde taal samen. Vensters waarvan de taal onzeker is
+        horen bij de taal ervoor. Geeft [begin, einde, taal] (in samples)
+        per stuk terug.
+        """
+        windows = self.speech_windows(audio)
+        probs = []
+        with self.stage("detect"):
+            model = self.load_model()
+            for start in range(0, len(windows), DETECTIE_BATCH):
+                batch = [window for _, window in windows[start:start + DETECTIE_BATCH]]
+                probs += self.backend.detect_language(model, batch, device=self.resolved_device)
+
+        runs = []
+        for (start, window), window_probs in zip(windows, probs):
+            language = max(window_probs, key=window_probs.get)
+            if runs and (language == runs[-1][2] or window_probs[language] < DETECTIE_DREMPEL):
+                runs[-1][1] = start + len(window)
+            else:
+                runs.append([start, start + len(window), language])
+        if len(runs) > 1:
+            self.log("Talen per segment: " + ", ".join(language for _, _, language in runs))
+        return runs
+
+    def run_model(self, audio, initial_prompt=None, offset=0.0, language=None):
+        """
+        Voert het model uit op audio (een float32 array). Met VAD
+        aan gaan alleen de spraakgebieden naar het model en worden de tijdcodes
+        daarna teruggezet; het resultaat krijgt dan een "vad" sleutel met
+        statistieken. offset is de positie van de audio in het bestand, voor
+        de voortgang. language overschrijft de gekozen taal; bij "auto" wordt
+        de taal eerst uit de spraak bepaald.
+        """
+        from subtitle_audio import SAMPLE_RATE
+
+        model = self.load_model()
+        duration = len(audio) / SAMPLE_RATE
+        language = language or self.taal
+
+        def progress(fraction):
+            self.report_progress(offset + fraction * duration)
+
+        speech_map = None
+        if self.vad:
+            from subtitle_vad import SpeechMap
+
+            with self.stage("vad"):
+                speech_map = SpeechMap.from_audio(audio, skip_music=self.vad_skip_music)
+            if speech_map.speech_duration == 0:
+                return {"text": "", "segments": [], "language": None if language == AUTO_TAAL else language,
+                        "vad": speech_map.stats()}
+            audio = speech_map.audio
+
+        runs = None
+        if language == AUTO_TAAL:
+            if self.taal_per_segment:
+                runs = self.language_runs(audio)
+                language = runs[0][2] if runs else None
+            else:
+                language, _ = self.detect_language(audio, vad_done=speech_map is not None)
+
+        with self.stage("inference"):
+            if runs is not None and len(runs) > 1:
+                result = self.transcribe_runs(model, audio, runs, initial_prompt,
+                                              progress if self.file_progress is not None else None)
+            else:
+                result = self.backend.transcribe(model, audio, language,  # Gebruik de geselecteerde taal
+                                                 initial_prompt=initial_prompt, device=self.resolved_device,
+                                                 progress=progress if self.file_progress is not None else None)
+                result["language"] = language or result.get("language")
+
+        if speech_map is not None:
+            speech_map.remap(result)
+            result["vad"] = speech_map.stats()
+        return result
+
+    def transcribe_runs(self, model, audio, runs, initial_prompt=None, progress=None):
+        """
+        Transcribeert elk stuk uit language_runs() met zijn eigen taal en voegt
+        de segmenten samen. Elk segment krijgt een "language" sleutel; de taal
+        van het resultaat is de taal met de meeste spraak.
+        """
+        from subtitle_audio import SAMPLE_RATE
+
+        segments = []
+        seconds = {}
+        for start, end, language in runs:
+            def run_progress(fraction, start=start, end=end):
+                progress((start + fraction * (end - start)) / len(audio))
+
+            result = self.backend.transcribe(model, audio[start:end], language, initial_prompt=initial_prompt,
+                                             device=self.resolved_device,
+                                             progress=run_progress if progress is not None else None)
+            for segment in result["segments"]:
+                segment["start"] += start / SAMPLE_RATE
+                segment["end"] += start / SAMPLE_RATE
+                segment["language"] = language
+                segment["id"] = len(segments)
+                segments.append(segment)
+            seconds[language] = seconds.get(language, 0.0) + (end - start) / SAMPLE_RATE
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": max(seconds, key=seconds.get),
+            "languages": {language: round(value, 1) for language, value in seconds.items()},
+        }
+
+    def load_audio(self, video_path):
+        """
+        Decodeert een bestand, via de PCM-store als die aan staat. Geeft
+        (audio, hit) terug; bij een hit is ffmpeg niet gebruikt en is de
+        audio een memory map van het opgeslagen bestand.
+        """
+        from subtitle_audio import load_audio
+
+        if self.pcm_store is None:
+            return load_audio(video_path), False
+        return self.pcm_store.load(video_path)
+
+    def decode_audio(self, video_path):
+        from subtitle_audio import SAMPLE_RATE
+
+        with self.stage("decode"):
+            audio, hit = self.load_audio(video_path)
+        if hit:
+            self.log(f"Audio van {os.path.basename(video_path)} uit de PCM-store gehaald")
+        if self.timer is not None:
+            self.timer.audio_duration = len(audio) / SAMPLE_RATE
+        self.report_progress(0.0, len(audio) / SAMPLE_RATE)
+        return audio
+
+    def transcribe(self, video_path, audio=None):
+        """
+        Voert de transcriptie uit met de geselecteerde taal en geeft het
+        Whisper resultaat terug. Als de audio al gedecodeerd is, wordt die
+        gebruikt; anders wordt het bestand hier gedecodeerd.
+        """
+        from subtitle_audio import SAMPLE_RATE
+
+        if audio is None:
+            audio = self.decode_audio(video_path)
+        if self.chunk_workers and (len(audio) >= 2 * self.chunk_seconds * SAMPLE_RATE
+                                   or not self.coordinator_needs_model()):
+            # Zonder eigen model gaan ook korte bestanden (als één stuk) naar de workers
+            return self.transcribe_chunked(audio)
+        return self.run_model(audio)
+
+    def coordinator_needs_model(self):
+        """
+        Of dit proces met --chunk-workers zelf ook een model nodig heeft, naast
+        de worker-processen: voor de taaldetectie (taal "auto") of om korte
+        clips in batches te transcriberen. Anders laadt alleen elke worker het model.
+        """
+        return self.taal == AUTO_TAAL or self.can_batch()
+
+    def chunk_settings(self):
+        """
+        Instellingen voor de worker-processen van de parallelle transcriptie:
+        alleen wat de transcriptie zelf bepaalt (geen cache, manifest of
+        uitvoer).
+        """
+        return {
+            "model_size": self.model_size,
+            "taal": self.taal,
+            "device": self.resolved_device or self.device,
+            "vad": self.vad,
+            "vad_skip_music": self.vad_skip_music,
+            "backend": self.backend.name,
+            "model_dir": self.model_dir,
+            "taal_per_segment": self.taal_per_segment,
+        }
+
+    def start_chunk_pool(self):
+        from subtitle_chunks import ChunkPool
+
+        if self.chunk_pool is None:
+            workers = self.chunk_workers
+            if workers == "auto":
+                from subtitle_models import select_device
+                from subtitle_pool import auto_worker_count
+
+                # Net als de worker pool: meerdere modellen op één GPU levert weinig op. Met de
+                # cache aan is het model hier vaak nog niet geladen en het device dus nog onbekend.
+                device = self.resolved_device or select_device(self.device)[0]
+                # Een model in dit proces telt mee in het geheugenbudget van de workers
+                reserved = 1 if self.model is not None or self.coordinator_needs_model() else 0
+                workers = auto_worker_count(self.model_size, self.threads, reserved) if device == "cpu" else 1
+            self.chunk_pool = ChunkPool(self.chunk_settings(), int(workers), self.threads, log=self.log)
+        return self.chunk_pool
+
+    def close_chunk_pool(self):
+        if self.chunk_pool is not None:
+            self.chunk_pool.close()
+            self.chunk_pool = None
+
+    def transcribe_chunked(self, audio):
+        """
+        Transcribeert een lange opname in stukken die tegelijk in aparte
+        processen draaien, geknipt in stiltes (zie subtitle_chunks). Met taal
+        "auto" wordt de taal eerst voor het hele bestand bepaald, zodat alle
+        stukken dezelfde taal krijgen; met taal per segment bepaalt elk stuk
+        zelf de talen.
+        """
+        from subtitle_audio import SAMPLE_RATE
+        from subtitle_chunks import merge_vad_stats, plan_chunks, stitch
+
+        language = self.taal
+        if self.taal == AUTO_TAAL and not self.taal_per_segment:
+            language = self.detect_language(audio)[0] or AUTO_TAAL
+
+        chunks = plan_chunks(audio, self.chunk_seconds)
+        pool = self.start_chunk_pool()
+        if pool.workers == 1 or (len(chunks) == 1 and self.coordinator_needs_model()):
+            return self.run_model(audio, language=language)
+
+        if len(chunks) > 1:
+            hard_cuts = sum(1 for chunk in chunks[1:] if chunk["start"] < chunk["own_start"])
+            self.log(f"Parallelle transcriptie: {len(chunks)} stukken over {pool.workers} processen"
+                     + (f" ({hard_cuts} knippunt(en) zonder stilte, met overlap)" if hard_cuts else ""))
+        with self.stage("inference"):
+            results = pool.transcribe(audio, chunks, language, progress=self.report_progress)
+        result = stitch(results, chunks)
+        vad_stats = merge_vad_stats(results, len(audio) / SAMPLE_RATE)
+        if vad_stats is not None:
+            result["vad"] = vad_stats
+        return result
+
+    def transcribe_streaming(self, video_path):
+        """
+        Transcribeert een (lange) opname in vensters die rechtstreeks uit een
+        ffmpeg pipe worden gelezen, en schrijft de SRT-cues direct weg zodra
+        ze klaar zijn. Het geheugengebruik blijft daardoor gelijk, ongeacht
+        de lengte van de opname.
+
+        Segmenten die in de laatste stream_overlap seconden van een venster
+        eindigen, worden nog niet weggeschreven: de audio vanaf het einde van
+        het laatst geschreven segment gaat mee naar het volgende venster, zodat
+        woorden op de venstergrens niet worden afgekapt. De tekst van de
+        laatste segmenten wordt als context (prompt) meegegeven.
+
+        Met taal "auto" wordt de taal uit het eerste venster bepaald voordat
+        het uitvoerbestand wordt aangemaakt. Geeft het aantal geschreven cues,
+        het pad van het uitvoerbestand en de taal terug.
+        """
+        import numpy as np
+        from subtitle_audio import PCMStream, SAMPLE_RATE
+        from subtitle_clean import get_cleaner
+        from subtitle_pcmstore import MappedStream
+        from subtitle_writer import format_timestamp, srt_cue
+
+        self.load_model()
+        window_samples = int(self.stream_window * SAMPLE_RATE)
+        overlap = min(self.stream_overlap, self.stream_window / 2)
+
+        buffer = np.zeros(0, dtype=np.float32)
+        buffer_start = 0.0  # Positie van het begin van de buffer in de opname (seconden)
+        prompt = None
+        cue_count = 0
+        skipped_seconds = 0.0
+        taal = self.taal
+        window_language = self.taal  # Taal per venster; "auto" = per venster (of segment) detecteren
+
+        # Staat de audio al in de PCM-store, dan worden de vensters uit de
+        # memory map gelezen in plaats van uit een ffmpeg pipe
+        stored = None
+        if self.pcm_store is not None and self.pcm_store.contains(video_path):
+            stored, _ = self.pcm_store.load(video_path)
+            self.log(f"Audio van {os.path.basename(video_path)} uit de PCM-store gehaald")
+
+        with (MappedStream(stored) if stored is not None else PCMStream(video_path)) as stream:
+            with self.stage("decode"):
+                first_audio = stream.read(window_samples)
+            if taal == AUTO_TAAL:
+                # De taal (en daarmee de bestandsnaam) volgt uit het eerste venster
+                taal = self.detect_language(first_audio)[0] or ONBEKENDE_TAAL
+                if not self.taal_per_segment and taal != ONBEKENDE_TAAL:
+                    window_language = taal
+            output_path = self.output_path_for(video_path, taal)
+
+            with open(output_path, 'w', encoding='utf-8') as srt_file:
+                finished = False
+                while not finished:
+                    # Vul de buffer aan tot een volledig venster
+                    if first_audio is not None:
+                        new_audio, first_audio = first_audio, None
+                    else:
+                        with self.stage("decode"):
+                            new_audio = stream.read(window_samples - len(buffer))
+                    finished = len(buffer) + len(new_audio) < window_samples
+                    buffer = np.concatenate([buffer, new_audio])
+                    if len(buffer) == 0:
+                        break
+
+                    buffer_end = buffer_start + len(buffer) / SAMPLE_RATE
+                    self.log(f"Venster {format_timestamp(buffer_start)} - {format_timestamp(buffer_end)} transcriberen...")
+                    result = self.run_model(buffer, initial_prompt=prompt, offset=buffer_start,
+                                            language=window_language)
+                    if "vad" in result:
+                        # Alleen het nieuwe deel van het venster meetellen, niet de overlap
+                        skipped_seconds += len(new_audio) / SAMPLE_RATE * result["vad"]["skipped_percent"] / 100
+
+                    # Schrijf de segmenten die niet meer door de venstergrens beïnvloed worden
+                    commit_until = buffer_end if finished else buffer_end - overlap
+                    committed_end = None
+                    with self.stage("write"):
+                        for segment in result["segments"]:
+                            start = buffer_start + segment["start"]
+                            end = min(buffer_start + segment["end"], buffer_end)
+                            if end > commit_until:
+                                break
+                            committed_end = end
+
+                            text = segment["text"].strip().replace("-->", "->")
+                            if self.clean_subtitles:
+                                text = get_cleaner(segment.get("language", taal)).clean_text(text)
+                            if not text:
+                                continue
+
+                            cue_count += 1
+                            srt_file.write(srt_cue(cue_count, start, end, text))
+                            prompt = segment["text"]
+                        srt_file.flush()
+
+                    if self.stop_requested and not finished:
+                        self.log("Streaming transcriptie gestopt, gedeeltelijke ondertitels bewaard")
+                        break
+
+                    # Bewaar de audio vanaf het laatst geschreven segment voor het
+                    # volgende venster; zonder geschreven segment schuift het venster
+                    # op tot aan de overlap zodat de buffer begrensd blijft.
+                    next_start = committed_end if committed_end is not None else commit_until
+                    next_start = max(next_start, buffer_end - self.stream_window / 2)
+                    keep_from = int(round((next_start - buffer_start) * SAMPLE_RATE))
+                    buffer = buffer[keep_from:].copy()
+                    buffer_start = next_start
+
+            if self.timer is not None:
+                self.timer.audio_duration = stream.samples_read / SAMPLE_RATE
+
+        if self.vad:
+            self.log(f"VAD: ongeveer {skipped_seconds:.1f} seconden zonder spraak overgeslagen")
+        return cue_count, output_path, taal
+
+    def clean_result(self, result, taal=None):
+        """
+        Geeft een kopie van het Whisper resultaat met gereinigde segmenten;
+        het resultaat zelf (zoals het in de cache staat) blijft ongewijzigd.
+        Segmenten met een eigen "language" worden met de regels van die taal
+        gereinigd.
+        """
+        from subtitle_clean import get_cleaner
+
+        taal = taal or self.taal
+        segments = result.get("segments", [])
+        if any("language" in segment for segment in segments):
+            cleaned = []
+            for segment in segments:
+                cleaned += get_cleaner(segment.get("language", taal)).clean_segments([segment])
+        else:
+            cleaned = get_cleaner(taal).clean_segments(segments)
+        self.log(f"Ondertitels opgeschoond ({len(segments) - len(cleaned)} van {len(segments)} segmenten verwijderd)")
+        return dict(result, segments=cleaned)
+
+    def write_subtitles(self, result, video_path, taal=None):
+        """
+        Schrijft het Whisper resultaat in alle uitvoerformaten. Elk bestand
+        wordt in één keer (atomair) op zijn plaats gezet. Geeft een
+        dictionary formaat -> pad en het aantal cues terug.
+        """
+        from subtitle_writer import write_outputs
+
+        self.log(f"Ondertitels genereren ({', '.join(self.formats).upper()}) voor {os.path.basename(video_path)}...")
+        with self.stage("write"):
+            return write_outputs(result, self.output_base_for(video_path, taal), self.formats)
+
+    def process_file(self, video_path, index=1, total=1, audio=None, decode_error=None, decode_time=None,
+                     result=None, timings=None):
+        """
+        Verwerkt één bestand en geeft een resultaat-dictionary terug, met de
+        tijd per stap onder "metrics". Fouten worden per bestand afgevangen
+        zodat de batch doorgaat.
+        audio, decode_error en decode_time komen van de AudioPrefetcher als die
+        gebruikt wordt; result en timings (het aandeel van dit bestand in de
+        batch) zijn gezet als het bestand al in een batch is getranscribeerd.
+        """
+        from subtitle_audio import SAMPLE_RATE
+        from subtitle_metrics import StageTimer
+
+        self.timer = StageTimer(timings)
+        self.current_video = video_path
+        if self.profiler is not None:
+            self.file_profile = self.decode_profiles.pop(video_path, None) or self.profiler.start(video_path)
+        if decode_time is not None:
+            self.timer.add("decode", decode_time)
+        if audio is not None:
+            self.timer.audio_duration = len(audio) / SAMPLE_RATE
+            self.report_progress(0.0, self.timer.audio_duration)
+        try:
+            file_result = self._process_file(video_path, index, total, audio, decode_error, result)
+        finally:
+            timer, self.timer = self.timer, None
+            file_profile, self.file_profile = self.file_profile, None
+            self.current_video = None
+        if file_profile is not None:
+            profile_path = file_profile.finish()
+            if profile_path is not None:
+                file_result["profile"] = profile_path
+        if decode_time is not None:
+            file_result["decode_time"] = round(decode_time, 3)
+        file_result["metrics"] = timer.summary(file_result.get("cues"))
+        return file_result
+
+    def _process_file(self, video_path, index, total, audio, decode_error, result):
+        from subtitle_audio import SAMPLE_RATE
+
+        video_name = os.path.basename(video_path)
+        output_path = self.output_path_for(video_path)
+        file_result = {
+            "video": video_path,
+            "output": output_path,
+            "taal": self.taal,
+            "status": "ok",
+        }
+
+        try:
+            self.log(f"Verwerking van: {video_name} ({index}/{total})")
+            if not os.path.isfile(video_path):
+                raise FileNotFoundError(f"Bestand niet gevonden: {video_path}")
+            if decode_error is not None:
+                raise decode_error
+
+            # Een kopie van een eerder verwerkt bestand neemt de uitvoer over
+            batched = result is not None
+            if not batched:
+                match = self.find_file_duplicate(video_path)
+                if match is not None:
+                    with self.stage("dedup"):
+                        return self.reuse_duplicate(video_path, match, file_result)
+
+            if self.stream:
+                # Lange opname: cues worden tijdens de transcriptie weggeschreven
+                if self.formats != ["srt"]:
+                    self.log("Streaming schrijft alleen SRT; andere uitvoerformaten worden overgeslagen")
+                self.log(f"Streaming transcriptie uitvoeren op {video_name}...")
+                transcribe_start = time.time()
+                file_result["cues"], output_path, file_result["taal"] = self.transcribe_streaming(video_path)
+                file_result["output"] = output_path
+                transcribe_time = time.time() - transcribe_start
+                self.log(f"Transcriptie voltooid in {transcribe_time:.2f} seconden")
+                self.log(f"Ondertitels opgeslagen in: {output_path}")
+                file_result["transcribe_time"] = round(transcribe_time, 3)
+                self.remember(video_path, file_result, {"srt": output_path})
+                return file_result
+
+            # Kijk eerst of deze transcriptie al in de cache staat
+            key = None
+            if self.cache is not None:
+                with self.stage("cache"):
+                    key = self.cache_key(video_path)
+                    if not batched:
+                        result = self.cache.get(key)
+                if result is not None and not batched:
+                    self.log(f"Transcriptie van {video_name} uit cache gehaald")
+            file_result["cached"] = result is not None and not batched
+
+            # Dezelfde opname in een andere container of codering herkennen aan
+            # de akoestische vingerafdruk van de gedecodeerde audio
+            fingerprint = duration = None
+            if self.dedup_path and (result is None or batched):
+                from subtitle_dedup import audio_fingerprint
+
+                if audio is None:
+                    audio = self.decode_audio(video_path)
+                duration = len(audio) / SAMPLE_RATE
+                with self.stage("dedup"):
+                    fingerprint = audio_fingerprint(audio)
+                    match = None if batched else self.find_audio_duplicate(video_path, fingerprint, duration)
+                    if match is not None:
+                        return self.reuse_duplicate(video_path, match, file_result)
+
+            if result is None or batched:
+                if batched:
+                    file_result["batched"] = True
+                    transcribe_time = sum(self.timer.timings.get(name, 0.0)
+                                          for name in ("model_load", "vad", "detect", "inference"))
+                else:
+                    # Voer transcriptie uit met de geselecteerde taal
+                    self.log(f"Transcriptie uitvoeren op {video_name}...")
+                    transcribe_start = time.time()
+                    result = self.transcribe(video_path, audio)
+                    transcribe_time = time.time() - transcribe_start
+                    self.log(f"Transcriptie voltooid in {transcribe_time:.2f} seconden")
+                file_result["transcribe_time"] = round(transcribe_time, 3)
+
+                if "vad" in result:
+                    vad_stats = result["vad"]
+                    self.log(f"VAD: {vad_stats['skipped']:.1f} van {vad_stats['duration']:.1f} seconden "
+                             f"zonder spraak overgeslagen ({vad_stats['skipped_percent']:.0f}%)")
+                    file_result["vad"] = vad_stats
+
+                if self.cache is not None:
+                    with self.stage("cache"):
+                        self.cache.put(key, result, video=os.path.abspath(video_path),
+                                       model=self.model_id(), taal=self.taal)
+
+            # Bij automatische taaldetectie bepaalt de gevonden taal de bestandsnaam
+            taal = self.result_taal(result)
+            if taal != self.taal:
+                file_result["taal"] = taal
+                file_result["output"] = self.output_path_for(video_path, taal)
+            if "languages" in result:
+                file_result["languages"] = result["languages"]
+
+            # Als opschonen is ingeschakeld, reinig de segmenten vóór het wegschrijven
+            if self.clean_subtitles:
+                with self.stage("clean"):
+                    result = self.clean_result(result, taal)
+
+            paths, file_result["cues"] = self.write_subtitles(result, video_path, taal)
+            if len(paths) > 1:
+                file_result["outputs"] = list(paths.values())
+            self.log(f"Ondertitels opgeslagen in: {', '.join(paths.values())}")
+            self.remember(video_path, file_result, paths, fingerprint, duration)
+
+        except ModelLoadError:
+            raise
+        except Exception as e:
+            self.log(f"FOUT bij verwerking van {video_name}: {str(e)}")
+            file_result["status"] = "error"
+            file_result["error"] = str(e)
+
+        return file_result
+
+    def can_batch(self):
+        return self.batch_size > 1 and not self.stream and hasattr(self.backend, "transcribe_batch")
+
+    def transcribe_batch(self, audios):
+        """
+        Transcribeert korte clips samen in één batch. Geeft per clip het
+        Whisper resultaat, of None als de clip los getranscribeerd moet worden.
+        Met taal "auto" wordt de taal per clip bepaald uit dezelfde
+        encoder-uitvoer die ook gedecodeerd wordt.
+        """
+        from subtitle_audio import SAMPLE_RATE
+        from subtitle_backends import BATCH_MAX_SECONDS
+
+        model = self.load_model()
+        language = None if self.taal == AUTO_TAAL else self.taal
+        results = [None] * len(audios)
+        speech_maps = [None] * len(audios)
+        inputs = []
+        for index, audio in enumerate(audios):
+            if self.vad:
+                from subtitle_vad import SpeechMap
+
+                with self.stage("vad"):
+                    speech_map = SpeechMap.from_audio(audio, skip_music=self.vad_skip_music)
+                if speech_map.speech_duration == 0:
+                    results[index] = {"text": "", "segments": [], "language": language, "vad": speech_map.stats()}
+                    continue
+                speech_maps[index] = speech_map
+                audio = speech_map.audio
+            if len(audio) <= BATCH_MAX_SECONDS * SAMPLE_RATE:
+                inputs.append((index, audio))
+
+        if inputs:
+            with self.stage("inference"):
+                decoded = self.backend.transcribe_batch(model, [audio for _, audio in inputs], language,
+                                                        device=self.resolved_device)
+            for (index, _), result in zip(inputs, decoded):
+                if result is not None and speech_maps[index] is not None:
+                    speech_maps[index].remap(result)
+                    result["vad"] = speech_maps[index].stats()
+                results[index] = result
+        return results
+
+    def run_batch(self, group):
+        """
+        Transcribeert een groep (pad, audio, fout, decodeertijd) uit de
+        prefetcher als één batch. Geeft de resultaten en het aandeel van elk
+        bestand in de tijd per stap terug; mislukt de batch, dan wordt elk
+        bestand los verwerkt.
+        """
+        from subtitle_metrics import StageTimer
+
+        self.log(f"Batch van {len(group)} korte bestanden transcriberen...")
+        batch_start = time.time()
+        self.timer = StageTimer()
+        try:
+            results = self.transcribe_batch([audio for _, audio, _, _ in group])
+        except ModelLoadError:
+            raise
+        except Exception as e:
+            self.log(f"FOUT bij batch-transcriptie, bestanden worden los verwerkt: {str(e)}")
+            return [None] * len(group), None
+        finally:
+            timer, self.timer = self.timer, None
+        batch_time = time.time() - batch_start
+
+        retry = results.count(None)
+        self.log(f"Batch voltooid in {batch_time:.2f} seconden"
+                 + (f", {retry} bestand(en) worden los opnieuw getranscribeerd" if retry else ""))
+        return results, {name: seconds / len(group) for name, seconds in timer.timings.items()}
+
+    def batch_groups(self, prefetcher, items):
+        """
+        Groepeert opeenvolgende korte clips tot batches van maximaal
+        batch_size. Een batch gaat eerder door als de volgende clip niet
+        binnen batch_wait seconden gedecodeerd is of niet in een batch past
+        (te lang, uit de cache, of niet te decoderen).
+        """
+        from subtitle_audio import SAMPLE_RATE
+        from subtitle_backends import BATCH_MAX_SECONDS
+
+        max_samples = BATCH_MAX_SECONDS * SAMPLE_RATE
+        batch = []
+        while True:
+            if batch and not prefetcher.next_ready(self.batch_wait):
+                yield batch
+                batch = []
+            item = next(items, None)
+            if item is None:
+                break
+
+            _, audio, error, _ = item
+            if audio is not None and error is None and len(audio) <= max_samples:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            else:
+                if batch:
+                    yield batch
+                    batch = []
+                yield [item]
+        if batch:
+            yield batch
+
+    def process(self, video_paths):
+        """
+        Generator die alle bestanden verwerkt en per bestand het resultaat
+        teruggeeft zodra het klaar is. Stopt na het huidige bestand als
+        stop() wordt aangeroepen.
+        """
+        taal_naam = ISO_NAAR_TAAL.get(self.taal, self.taal.upper())
+        self.log(f"Geselecteerde taal: {taal_naam} ({self.taal})")
+        self.log(f"Model grootte: {self.model_size}")
+
+        total_files = len(video_paths)
+        self.is_processing = True
+        self.stop_requested = False
+        prefetcher = None
+        manifest = self.open_manifest()
+        try:
+            # Bestanden die al actueel verwerkt zijn worden overgeslagen
+            settings = self.output_settings()
+            todo = [video_path for video_path in video_paths if not self.is_done(manifest, video_path)]
+            if len(todo) < total_files:
+                self.log(f"{total_files - len(todo)} bestand(en) al verwerkt, {len(todo)} te gaan")
+            todo_set = set(todo)
+            copies = self.batch_copies(todo)
+            duplicates = []
+
+            tracker = None
+            if self.progress_callback is not None:
+                # Duur van alle bestanden vooraf bepalen voor de voortgang van de batch
+                from subtitle_audio import probe_durations
+                from subtitle_progress import ProgressTracker
+
+                tracker = ProgressTracker(self.progress_callback, self.progress_interval)
+                tracker.start(probe_durations(todo))
+                self.file_progress = tracker.file_progress
+
+            batching = self.can_batch()
+            if (self.prefetch or batching) and not self.stream:
+                # Decodeer de audio van de volgende bestanden terwijl het model
+                # laadt en het huidige bestand wordt getranscribeerd
+                from subtitle_audio import AudioPrefetcher
+
+                def loader(video_path):
+                    # Bestanden die al in de cache staan of een kopie zijn van
+                    # een eerder bestand hoeven niet gedecodeerd te worden
+                    if video_path in copies or self.is_cached(video_path) or self.find_file_duplicate(video_path):
+                        return None
+                    file_profile = self.profiler.start(video_path) if self.profiler is not None else None
+                    if file_profile is None:
+                        return self.load_audio(video_path)[0]
+                    # Het decoderen in deze thread meeprofileren; process_file neemt het profiel over
+                    with file_profile.stage("decode"):
+                        audio = self.load_audio(video_path)[0]
+                    self.decode_profiles[video_path] = file_profile
+                    return audio
+
+                # Bij batches moet minstens een volledige batch vooruit gedecodeerd worden
+                depth = max(self.prefetch, self.batch_size) if batching else self.prefetch
+                prefetcher = AudioPrefetcher(todo, depth=depth,
+                                             max_ffmpeg=self.max_ffmpeg, loader=loader)
+                prefetcher.start()
+                items = iter(prefetcher)
+            else:
+                items = ((video_path, None, None, None) for video_path in todo)
+
+            if batching:
+                groups = self.batch_groups(prefetcher, items)
+            else:
+                groups = ([item] for item in items)
+
+            if self.chunk_workers and not self.coordinator_needs_model():
+                # Het model wordt alleen in de worker-processen geladen; een kopie hier
+                # zou buiten het geheugenbudget van --chunk-workers vallen
+                pass
+            elif self.cache is None and todo:
+                # Zonder cache is het model zeker nodig
+                self.load_model()
+            elif any(not self.is_cached(video_path) for video_path in todo):
+                # Er is minstens één cache-miss: model alvast op de achtergrond laden
+                self.preload_model()
+
+            next_index = 0  # Volgende positie in video_paths die nog gemeld moet worden
+            for group in groups:
+                if self.stop_requested:
+                    break
+
+                indices = []
+                for video_path, audio, _, decode_time in group:
+                    # Overgeslagen bestanden op hun plaats in de volgorde melden
+                    while video_paths[next_index] not in todo_set:
+                        yield self.skipped_result(video_paths[next_index], manifest)
+                        next_index += 1
+                    next_index += 1
+                    indices.append(next_index)
+
+                    if audio is not None:
+                        self.log(f"Audio van {os.path.basename(video_path)} gedecodeerd in {decode_time:.2f} seconden")
+                    if manifest is not None:
+                        manifest.mark_running(video_path, settings)
+
+                if len(group) > 1:
+                    results, timings = self.run_batch(group)
+                else:
+                    results, timings = [None], None
+
+                for index, (video_path, audio, error, decode_time), result in zip(indices, group, results):
+                    if tracker is not None:
+                        tracker.file_started(video_path)
+                    file_result = self.process_file(video_path, index, total_files, audio, error, decode_time,
+                                                    result=result, timings=timings if result is not None else None)
+                    if tracker is not None:
+                        tracker.file_finished(video_path, file_result["status"])
+                    if manifest is not None:
+                        manifest.record(file_result, settings)
+                    if "duplicate" in file_result:
+                        duplicates.append(file_result["duplicate"])
+                    yield file_result
+
+            if duplicates:
+                from subtitle_dedup import savings_message
+                self.log(savings_message(duplicates))
+
+            if not self.stop_requested:
+                for video_path in video_paths[next_index:]:
+                    yield self.skipped_result(video_path, manifest)
+        finally:
+            self.is_processing = False
+            self.file_progress = None
+            self.close_chunk_pool()
+            if prefetcher is not None:
+                prefetcher.close()
+            if manifest is not None:
+                manifest.close()
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Genereer ondertitels met Whisper zonder GUI. "
+                    "Resultaten worden per bestand als JSON-regel naar stdout geschreven."
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="videobestanden, mappen of glob-patronen (bijv. 'opnames/*.mkv')")
+    add_engine_arguments(parser)
+    return parser
+
+
+def add_engine_arguments(parser, workers=True):
+    """
+    Voegt de opties van de engine toe aan een parser; ook gebruikt door de
+    service (subtitle_watch), die geen worker pool kent.
+    """
+    from subtitle_backends import BACKENDS, DEFAULT_BACKEND
+
+    parser.add_argument("-m", "--model", default="small", choices=MODEL_GROOTTES,
+                        help="Whisper model grootte (standaard: small)")
+    parser.add_argument("-l", "--taal", default="nl",
+                        help="ISO-taalcode van de ondertitels, of 'auto' om de taal per bestand te detecteren "
+                             "(standaard: nl)")
+    parser.add_argument("--taal-per-segment", action="store_true",
+                        help="met --taal auto de taal per venster van 30 seconden bepalen, "
+                             "voor bestanden met meerdere talen")
+    parser.add_argument("-b", "--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS),
+                        help="inferentie-backend; faster-whisper gebruikt int8 op de CPU (standaard: openai-whisper)")
+    parser.add_argument("--model-dir", default=None,
+                        help="map met lokaal opgeslagen modelgewichten (faster-whisper: <map>/<grootte>)")
+    parser.add_argument("-d", "--device", default="auto", choices=["auto", "cuda", "cpu"],
+                        help="verwerking op GPU (cuda) of CPU (standaard: auto)")
+    parser.add_argument("--no-clean", dest="clean", action="store_false",
+                        help="tekst voor slechthorenden niet verwijderen")
+    parser.add_argument("-o", "--output-dir", default=None,
+                        help="uitvoermap (standaard: dezelfde map als de video)")
+    parser.add_argument("--formats", default="srt",
+                        help="uitvoerformaten, komma-gescheiden: srt, vtt, json, txt (standaard: srt)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="mappen recursief doorzoeken")
+    if workers:
+        parser.add_argument("-w", "--workers", default=None,
+                            help="aantal worker-processen, of 'auto' (standaard: één proces zonder pool)")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="torch intra-op threads per proces (standaard: automatisch)")
+    parser.add_argument("--prefetch", type=int, default=2,
+                        help="aantal bestanden waarvan de audio vooruit wordt gedecodeerd (0 = uit, standaard: 2)")
+    parser.add_argument("--max-ffmpeg", type=int, default=1,
+                        help="maximaal aantal gelijktijdige ffmpeg processen bij vooruit decoderen (standaard: 1)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="aantal korte clips (tot 30 seconden) dat samen in één batch wordt getranscribeerd "
+                             "(standaard: 1, geen batches)")
+    parser.add_argument("--batch-wait", type=float, default=2.0,
+                        help="maximale wachttijd in seconden op de volgende clip voordat een onvolledige batch "
+                             "wordt verwerkt (standaard: 2)")
+    parser.add_argument("--chunk-workers", default=None,
+                        help="één lang bestand in stukken knippen (in stiltes) en die tegelijk in dit aantal "
+                             "processen transcriberen, of 'auto' (standaard: uit)")
+    parser.add_argument("--chunk-seconds", type=float, default=300,
+                        help="gewenste lengte van een stuk bij --chunk-workers in seconden (standaard: 300)")
+    parser.add_argument("--stream", action="store_true",
+                        help="lange opnames in vensters verwerken met begrensd geheugen; "
+                             "cues worden tijdens de verwerking weggeschreven")
+    parser.add_argument("--stream-window", type=float, default=600,
+                        help="lengte van een streaming venster in seconden (standaard: 600)")
+    parser.add_argument("--stream-overlap", type=float, default=15,
+                        help="overlap tussen streaming vensters in seconden (standaard: 15)")
+    parser.add_argument("--vad", action="store_true",
+                        help="stille stukken overslaan met spraakdetectie vóór de transcriptie")
+    parser.add_argument("--vad-skip-music", action="store_true",
+                        help="met --vad ook lange stukken aanhoudende muziek overslaan")
+    parser.add_argument("--cache-dir", default=None,
+                        help="map van de transcriptiecache (standaard: gebruikerscache)")
+    parser.add_argument("--cache-max-size", default="20G",
+                        help="maximale grootte van de transcriptiecache, bijv. 500M of 20G (standaard: 20G)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="transcriptiecache niet gebruiken")
+    parser.add_argument("--pcm-dir", default=None,
+                        help="map van de PCM-store met gedecodeerde audio (standaard: gebruikerscache)")
+    parser.add_argument("--pcm-max-size", default="10G",
+                        help="maximale grootte van de PCM-store, bijv. 500M of 10G (standaard: 10G)")
+    parser.add_argument("--no-pcm-store", dest="pcm_store", action="store_false",
+                        help="gedecodeerde audio niet bewaren; elk bestand steeds opnieuw decoderen")
+    parser.add_argument("--manifest", default=None,
+                        help="pad van het job manifest (standaard: in de gebruikerscache)")
+    parser.add_argument("--no-manifest", dest="use_manifest", action="store_false",
+                        help="geen job manifest gebruiken; alles opnieuw verwerken")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="ook bestanden verwerken die volgens het manifest al klaar zijn")
+    parser.add_argument("--dedup-index", default=None,
+                        help="pad van de ontdubbelingsindex (standaard: in de gebruikerscache)")
+    parser.add_argument("--dedup-link", default="copy", choices=["copy", "hardlink"],
+                        help="uitvoer van een duplicaat kopiëren of hard linken (standaard: copy)")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="duplicaten niet herkennen; elk bestand transcriberen")
+    parser.add_argument("--progress", action="store_true",
+                        help="voortgang per bestand en voor de hele batch (met geschatte resterende tijd) "
+                             "als 'progress'-events op stdout schrijven")
+    parser.add_argument("--progress-interval", type=float, default=1.0,
+                        help="minimale tijd in seconden tussen twee tussenstanden van een bestand (standaard: 1)")
+    parser.add_argument("--profile", default=None, metavar="MAP",
+                        help="elke stap profileren met cProfile; per run komt er een submap met een .prof en "
+                             "collapsed stacks per bestand, samengevoegde collapsed stacks (flamegraph) en "
+                             "summary.txt met de zwaarste functies")
+    parser.add_argument("--profile-sample", type=float, default=1.0,
+                        help="met --profile: fractie van de bestanden die geprofileerd wordt (standaard: 1, alles)")
+    parser.add_argument("--profile-torch", action="store_true",
+                        help="met --profile: ook de torch profiler (CPU) rond taaldetectie en inferentie")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="aantal functies en operaties in summary.txt (standaard: 20)")
+    parser.add_argument("--metrics-jsonl", default=None,
+                        help="tijd per stap en overige metrics per bestand als JSON-regels aan dit bestand toevoegen")
+    parser.add_argument("--metrics-prom", default=None,
+                        help="totalen van deze run als Prometheus tekstbestand schrijven "
+                             "(voor de textfile collector van node_exporter)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="geen logregels naar stderr schrijven")
+
+
+def engine_settings_from_args(args):
+    """
+    Zet de argumenten van de commandoregel om naar keyword-argumenten voor
+    SubtitleEngine (zonder log en threads, zodat ze ook naar workers kunnen).
+    """
+    from subtitle_cache import default_cache_dir, parse_size
+    from subtitle_dedup import default_dedup_path
+    from subtitle_manifest import default_manifest_path
+    from subtitle_pcmstore import default_pcm_dir
+    from subtitle_writer import parse_formats
+
+    chunk_workers = 0
+    if args.chunk_workers is not None:
+        if getattr(args, "workers", None) is not None or args.stream:
+            raise ValueError("--chunk-workers gaat niet samen met --workers of --stream")
+        chunk_workers = args.chunk_workers if args.chunk_workers == "auto" else int(args.chunk_workers)
+
+    profile_dir = None
+    if args.profile:
+        # Elke run een eigen submap, zodat profielen van verschillende runs niet mengen
+        profile_dir = os.path.join(os.path.abspath(args.profile), time.strftime("%Y%m%d-%H%M%S"))
+
+    return {
+        "model_size": args.model,
+        "taal": args.taal,
+        "device": args.device,
+        "clean_subtitles": args.clean,
+        "output_dir": args.output_dir,
+        "prefetch": args.prefetch,
+        "max_ffmpeg": args.max_ffmpeg,
+        "stream": args.stream,
+        "stream_window": args.stream_window,
+        "stream_overlap": args.stream_overlap,
+        "cache_dir": (args.cache_dir or default_cache_dir()) if args.cache else None,
+        "cache_max_bytes": parse_size(args.cache_max_size) if args.cache else None,
+        "pcm_dir": (args.pcm_dir or default_pcm_dir()) if args.pcm_store else None,
+        "pcm_max_bytes": parse_size(args.pcm_max_size) if args.pcm_store else None,
+        "manifest_path": (args.manifest or default_manifest_path()) if args.use_manifest else None,
+        "force": args.force,
+        "vad": args.vad,
+        "vad_skip_music": args.vad_skip_music,
+        "formats": parse_formats(args.formats),
+        "backend": args.backend,
+        "model_dir": args.model_dir,
+        "batch_size": args.batch_size,
+        "batch_wait": args.batch_wait,
+        "taal_per_segment": args.taal_per_segment,
+        "dedup_path": (args.dedup_index or default_dedup_path()) if args.dedup else None,
+        "dedup_link": args.dedup_link,
+        "chunk_workers": chunk_workers,
+        "chunk_seconds": args.chunk_seconds,
+        "profile_dir": profile_dir,
+        "profile_sample": args.profile_sample,
+        "profile_torch": args.profile_torch,
+    }
+
+
+def emit(event, **fields):
+    """
+    Schrijft één JSON-regel naar stdout (één regel per gebeurtenis).
+    """
+    fields["event"] = event
+    print(json.dumps(fields, ensure_ascii=False), flush=True)
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    video_paths = expand_inputs(args.inputs, recursive=args.recursive)
+    if not video_paths:
+        log_to_stderr("FOUT: Geen videobestanden gevonden")
+        return 2
+
+    log = (lambda message: None) if args.quiet else log_to_stderr
+    try:
+        settings = engine_settings_from_args(args)
+    except ValueError as e:
+        log_to_stderr(f"FOUT: {str(e)}")
+        return 2
+
+    progress = None
+    if args.progress:
+        def progress(snapshot):
+            emit("progress", **snapshot)
+
+    if args.workers is not None:
+        from subtitle_pool import WorkerPool
+
+        workers = None if args.workers == "auto" else int(args.workers)
+        engine = WorkerPool(settings, workers=workers, threads_per_worker=args.threads, progress=progress,
+                            progress_interval=args.progress_interval, log=log)
+    else:
+        engine = SubtitleEngine(threads=args.threads, progress=progress, progress_interval=args.progress_interval,
+                                log=log, **settings)
+
+    recorder = None
+    if args.metrics_jsonl or args.metrics_prom:
+        from subtitle_metrics import MetricsRecorder
+
+        recorder = MetricsRecorder(args.metrics_jsonl, args.metrics_prom, labels={
+            "model": settings["model_size"],
+            "backend": settings["backend"],
+            "device": settings["device"],
+        })
+
+    failed = 0
+    duplicates = []
+    try:
+        for file_result in engine.process(video_paths):
+            if file_result["status"] == "error":
+                failed += 1
+            if "duplicate" in file_result:
+                duplicates.append(file_result["duplicate"])
+            if recorder is not None:
+                recorder.record(file_result)
+            emit("result", **file_result)
+
+        if duplicates:
+            # Wat de ontdubbeling in deze run heeft bespaard
+            from subtitle_dedup import savings
+            emit("dedup", **savings(duplicates))
+
+        if args.workers is None:
+            # Laadtijden en hergebruik van modellen in dit proces; eerst een
+            # model dat nog op de achtergrond laadt afwachten (zie wait_preloads)
+            from subtitle_models import get_model_manager
+            get_model_manager().wait_preloads()
+            emit("models", **get_model_manager().metrics())
+
+        if settings["profile_dir"]:
+            from subtitle_profile import write_report
+            report = write_report(settings["profile_dir"], args.profile_top, chunked=bool(settings["chunk_workers"]))
+            log(f"Profiel van {report['files']} bestand(en) in {report['dir']} (zie summary.txt)")
+            emit("profile", **report)
+    except KeyboardInterrupt:
+        log_to_stderr("Verwerking onderbroken")
+        return 130
+    except Exception as e:
+        log_to_stderr(f"FOUT tijdens verwerking: {str(e)}")
+        return 1
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - duurzame jobwachtrij
+# Wachtrij van te verwerken bestanden in een SQLite-database, zodat hij een
+# herstart overleeft en door meerdere consumers tegelijk gebruikt kan worden
+# (op één machine, of op meerdere machines met een gedeeld bestandssysteem).
+# Een consumer claimt een job met een lease die hij tijdens de verwerking
+# verlengt; verloopt de lease (de consumer is gecrasht), dan pakt een andere
+# consumer de job weer op. Mislukte jobs worden met een oplopende wachttijd
+# opnieuw geprobeerd.
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+
+# Toestanden van een job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Standaardinstellingen
+LEASE_SECONDEN = 300  # Zo lang is een job van een consumer zonder verlenging
+MAX_POGINGEN = 3  # Daarna blijft een job op "failed" staan
+BACKOFF_BASIS = 30  # Wachttijd (seconden) na de eerste mislukte poging, daarna steeds verdubbeld
+BACKOFF_MAX = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video TEXT NOT NULL UNIQUE,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    error TEXT,
+    result TEXT,
+    created REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, priority, created);
+"""
+
+
+def default_queue_path():
+    from subtitle_cache import default_cache_root
+
+    return os.path.join(default_cache_root(), "jobs.sqlite")
+
+
+def consumer_id():
+    """
+    Naam van deze consumer in de leases: host en proces.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASIS * 2 ** max(0, attempts - 1))
+
+
+class JobQueue:
+    """
+    Jobwachtrij in een SQLite-database. Elke bewerking is een eigen korte
+    transactie; claim() gebruikt BEGIN IMMEDIATE zodat twee consumers nooit
+    dezelfde job krijgen. Er wordt bewust geen WAL gebruikt: dat werkt niet
+    op netwerkbestandssystemen.
+    """
+
+    def __init__(self, path=None, lease_seconds=LEASE_SECONDEN, max_attempts=MAX_POGINGEN):
+        self.path = path or default_queue_path()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def enqueue(self, video_path, priority=0):
+        """
+        Zet een bestand in de wachtrij. Een bestand dat al wacht krijgt
+        hooguit een hogere prioriteit; een bestand dat al klaar of mislukt is
+        komt alleen opnieuw in de wachtrij als het sindsdien gewijzigd is.
+        Geeft True als er een job is bijgekomen.
+        """
+        video_path = os.path.abspath(video_path)
+        try:
+            stat = os.stat(video_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        now = time.time()
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute("SELECT state, size, mtime_ns FROM jobs WHERE video = ?",
+                                          (video_path,)).fetchone()
+            if row is None:
+                self.connection.execute(
+                    "INSERT INTO jobs (video, priority, state, max_attempts, size, mtime_ns, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (video_path, priority, QUEUED, self.max_attempts, size, mtime_ns, now, now))
+                added = True
+            elif row[0] in (QUEUED, RUNNING):
+                self.connection.execute("UPDATE jobs SET priority = MAX(priority, ?), updated = ? WHERE video = ?",
+                                        (priority, now, video_path))
+                added = False
+            elif (row[1], row[2]) != (size, mtime_ns):
+                self.connection.execute(
+                    "UPDATE jobs SET state = ?, priority = ?, attempts = 0, max_attempts = ?, not_before = 0, "
+                    "lease_owner = NULL, lease_until = NULL, size = ?, mtime_ns = ?, error = NULL, result = NULL, "
+                    "created = ?, updated = ? WHERE video = ?",
+                    (QUEUED, priority, self.max_attempts, size, mtime_ns, now, now, video_path))
+                added = True
+            else:
+                added = False
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, owner):
+        """
+        Geeft de volgende job (id, video) aan owner, of None als er niets
+        klaarstaat. Wachtende jobs gaan op prioriteit en daarna op volgorde
+        van binnenkomst.
+
+        Een job met een verlopen lease (de consumer is gecrasht, mogelijk door
+        het bestand zelf) telt als mislukte poging: hij komt na
+        backoff_seconds() weer in de wachtrij, of blijft op "failed" staan als
+        de pogingen op zijn.
+        """
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            expired = self.connection.execute(
+                "SELECT id, attempts, max_attempts, lease_until FROM jobs WHERE state = ? AND lease_until < ?",
+                (RUNNING, now)).fetchall()
+            for job_id, attempts, max_attempts, lease_until in expired:
+                state = QUEUED if attempts < max_attempts else FAILED
+                self.connection.execute(
+                    "UPDATE jobs SET state = ?, not_before = ?, lease_owner = NULL, lease_until = NULL, error = ?, "
+                    "updated = ? WHERE id = ?",
+                    (state, lease_until + backoff_seconds(attempts) if state == QUEUED else 0,
+                     "Lease verlopen, consumer gestopt tijdens de verwerking", now, job_id))
+
+            row = self.connection.execute(
+                "SELECT id, video FROM jobs WHERE state = ? AND not_before <= ? "
+                "ORDER BY priority DESC, created LIMIT 1",
+                (QUEUED, now)).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_until = ?, "
+                    "updated = ? WHERE id = ?",
+                    (RUNNING, owner, now + self.lease_seconds, now, row[0]))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return row
+
+    def renew(self, job_id, owner):
+        """
+        Verlengt de lease; False als de job intussen aan een ander is gegeven.
+        """
+        cursor = self.connection.execute(
+            "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND lease_owner = ? AND state = ?",
+            (time.time() + self.lease_seconds, time.time(), job_id, owner, RUNNING))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, owner, result=None):
+        self.connection.execute(
+            "UPDATE jobs SET state = ?, lease_owner = NULL, lease_until = NULL, error = NULL, result = ?, "
+            "updated = ? WHERE id = ? AND lease_owner = ?",
+            (DONE, json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(),
+             job_id, owner))
+
+    def fail(self, job_id, owner, error):
+        """
+        Markeert een poging als mislukt. Zijn er nog pogingen over, dan komt
+        de job na backoff_seconds() weer in de wachtrij. Geeft de nieuwe
+        toestand terug.
+        """
+        row = self.connection.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+                                      (job_id, owner)).fetchone()
+        if row is None:
+            return None
+        attempts, max_attempts = row
+        state = QUEUED if attempts < max_attempts else FAILED
+        self.connection.execute(
+            "UPDATE jobs SET state = ?, not_before = ?, lease_owner = NULL, lease_until = NULL, error = ?, "
+            "updated = ? WHERE id = ?",
+            (state, time.time() + backoff_seconds(attempts) if state == QUEUED else 0, error, time.time(), job_id))
+        return state
+
+    def release(self, job_id, owner):
+        """
+        Geeft een job terug zonder dat de poging meetelt (bijv. bij afsluiten).
+        """
+        self.connection.execute(
+            "UPDATE jobs SET state = ?, attempts = MAX(0, attempts - 1), lease_owner = NULL, lease_until = NULL, "
+            "updated = ? WHERE id = ? AND lease_owner = ?",
+            (QUEUED, time.time(), job_id, owner))
+
+    def next_due(self):
+        """
+        Tijdstip waarop de eerstvolgende job klaarstaat (wachttijd na een
+        mislukte poging of een verlopende lease), of None.
+        """
+        row = self.connection.execute(
+            "SELECT MIN(CASE WHEN state = ? THEN not_before ELSE lease_until END) FROM jobs WHERE state IN (?, ?)",
+            (QUEUED, QUEUED, RUNNING)).fetchone()
+        return row[0] if row else None
+
+    def retry(self, video_path=None):
+        """
+        Zet mislukte jobs (of één bestand) terug in de wachtrij.
+        """
+        query = "UPDATE jobs SET state = ?, attempts = 0, not_before = 0, error = NULL, updated = ? WHERE state = ?"
+        params = [QUEUED, time.time(), FAILED]
+        if video_path is not None:
+            query += " AND video = ?"
+            params.append(os.path.abspath(video_path))
+        return self.connection.execute(query, params).rowcount
+
+    def summary(self):
+        return dict(self.connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def rows(self, state=None):
+        query = "SELECT video, state, priority, attempts, updated, lease_owner, error FROM jobs"
+        params = ()
+        if state:
+            query += " WHERE state = ?"
+            params = (state,)
+        return self.connection.execute(query + " ORDER BY priority DESC, created", params).fetchall()
+
+    def forget(self, video_path=None):
+        if video_path is None:
+            self.connection.execute("DELETE FROM jobs WHERE state IN (?, ?)", (DONE, FAILED))
+        else:
+            self.connection.execute("DELETE FROM jobs WHERE video = ?", (os.path.abspath(video_path),))
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Bekijk of beheer de jobwachtrij van de "
+                                                 "Whisper Subtitle Generator service.")
+    parser.add_argument("--queue", default=None,
+                        help=f"pad van de wachtrij (standaard: {default_queue_path()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="aantal jobs per toestand tonen")
+    list_parser = commands.add_parser("list", help="jobs tonen")
+    list_parser.add_argument("--state", choices=[QUEUED, RUNNING, DONE, FAILED], default=None)
+    add_parser = commands.add_parser("add", help="bestanden in de wachtrij zetten")
+    add_parser.add_argument("videos", nargs="+")
+    add_parser.add_argument("-p", "--priority", type=int, default=0, help="hogere prioriteit gaat eerst")
+    retry_parser = commands.add_parser("retry", help="mislukte jobs opnieuw in de wachtrij zetten")
+    retry_parser.add_argument("videos", nargs="*", help="bestanden (leeg = alle mislukte jobs)")
+    forget_parser = commands.add_parser("forget", help="jobs verwijderen")
+    forget_parser.add_argument("videos", nargs="*", help="bestanden (leeg = alle afgeronde en mislukte jobs)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    jobs = JobQueue(args.queue)
+
+    if args.command == "summary":
+        for state, count in sorted(jobs.summary().items()):
+            print(f"{state:8} {count}")
+    elif args.command == "list":
+        for video, state, priority, attempts, updated, owner, error in jobs.rows(args.state):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated)) if updated else "-"
+            line = f"{state:8} {when}  prioriteit: {priority}  pogingen: {attempts}  {video}"
+            if owner:
+                line += f"  [{owner}]"
+            if error:
+                line += f"  ({error})"
+            print(line)
+    elif args.command == "add":
+        from subtitle_engine import expand_inputs
+
+        for video in expand_inputs(args.videos):
+            if jobs.enqueue(video, args.priority):
+                print(f"toegevoegd  {video}")
+    elif args.command == "retry":
+        count = sum(jobs.retry(video) for video in args.videos) if args.videos else jobs.retry()
+        print(f"{count} job(s) opnieuw in de wachtrij")
+    elif args.command == "forget":
+        if args.videos:
+            for video in args.videos:
+                jobs.forget(video)
+        else:
+            jobs.forget()
+    jobs.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
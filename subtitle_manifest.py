@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - job manifest
+# Houdt per bestand bij of het al verwerkt is (met welke instellingen, welke
+# versie van het bronbestand en welke uitvoer), zodat een nieuwe run alleen
+# nieuwe, gewijzigde, mislukte of onderbroken bestanden verwerkt.
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+
+# Toestanden van een bestand in het manifest
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    video TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    settings TEXT,
+    output TEXT,
+    output_checksum TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+)
+"""
+
+
+def default_manifest_path():
+    from subtitle_cache import default_cache_root
+
+    return os.path.join(default_cache_root(), "manifest.sqlite")
+
+
+def file_checksum(path):
+    """
+    SHA-256 van een (klein) uitvoerbestand.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JobManifest:
+    """
+    Manifest in een SQLite-database. Een bestand wordt als klaar beschouwd
+    als het met dezelfde instellingen is verwerkt, het bronbestand sindsdien
+    niet is gewijzigd (grootte en mtime) en de uitvoer nog ongewijzigd bestaat.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_manifest_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Meerdere processen kunnen hetzelfde manifest gebruiken
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def _row(self, video_path):
+        cursor = self.connection.execute(
+            "SELECT state, size, mtime_ns, settings, output, output_checksum FROM files WHERE video = ?",
+            (os.path.abspath(video_path),))
+        return cursor.fetchone()
+
+    def output_for(self, video_path):
+        """
+        Het uitvoerbestand dat bij de laatste verwerking is geschreven, of None.
+        """
+        row = self._row(video_path)
+        return row[4] if row is not None else None
+
+    def is_up_to_date(self, video_path, settings):
+        """
+        True als het bestand al met deze instellingen is verwerkt en zowel de
+        bron als de uitvoer sindsdien niet zijn veranderd.
+        """
+        row = self._row(video_path)
+        if row is None:
+            return False
+
+        state, size, mtime_ns, stored_settings, output, output_checksum = row
+        if state != DONE:
+            return False
+        if stored_settings != json.dumps(settings, sort_keys=True):
+            return False
+
+        try:
+            stat = os.stat(video_path)
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return False
+            return bool(output) and file_checksum(output) == output_checksum
+        except OSError:
+            return False
+
+    def _update(self, video_path, state, settings, output=None, output_checksum=None, error=None, attempt=False):
+        try:
+            stat = os.stat(video_path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+
+        self.connection.execute(
+            """
+            INSERT INTO files (video, state, size, mtime_ns, settings, output, output_checksum, error, attempts, updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(video) DO UPDATE SET
+                state = excluded.state, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                settings = excluded.settings, output = excluded.output,
+                output_checksum = excluded.output_checksum, error = excluded.error,
+                attempts = files.attempts + ?, updated = excluded.updated
+            """,
+            (os.path.abspath(video_path), state, size, mtime_ns, json.dumps(settings, sort_keys=True),
+             output, output_checksum, error, 1 if attempt else 0, time.time(), 1 if attempt else 0))
+        self.connection.commit()
+
+    def mark_running(self, video_path, settings):
+        self._update(video_path, RUNNING, settings, attempt=True)
+
+    def mark_done(self, video_path, settings, output):
+        checksum = file_checksum(output) if output and os.path.exists(output) else None
+        self._update(video_path, DONE, settings, output=output, output_checksum=checksum)
+
+    def mark_failed(self, video_path, settings, error):
+        self._update(video_path, FAILED, settings, error=error)
+
+    def record(self, file_result, settings):
+        """
+        Verwerkt een resultaat-dictionary van de engine.
+        """
+        status = file_result.get("status")
+        if status == "ok":
+            self.mark_done(file_result["video"], settings, file_result.get("output"))
+        elif status == "error":
+            self.mark_failed(file_result["video"], settings, file_result.get("error"))
+
+    def summary(self):
+        cursor = self.connection.execute("SELECT state, COUNT(*) FROM files GROUP BY state")
+        return dict(cursor.fetchall())
+
+    def rows(self, state=None):
+        query = "SELECT video, state, attempts, updated, output, error FROM files"
+        params = ()
+        if state:
+            query += " WHERE state = ?"
+            params = (state,)
+        return self.connection.execute(query + " ORDER BY updated DESC", params).fetchall()
+
+    def forget(self, video_path=None):
+        """
+        Verwijdert één bestand (of alles) uit het manifest.
+        """
+        if video_path is None:
+            self.connection.execute("DELETE FROM files")
+        else:
+            self.connection.execute("DELETE FROM files WHERE video = ?", (os.path.abspath(video_path),))
+        self.connection.commit()
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Bekijk of beheer het job manifest van de Whisper Subtitle Generator.")
+    parser.add_argument("--manifest", default=None,
+                        help=f"pad van het manifest (standaard: {default_manifest_path()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("summary", help="aantal bestanden per toestand tonen")
+    list_parser = commands.add_parser("list", help="bestanden tonen")
+    list_parser.add_argument("--state", choices=[RUNNING, DONE, FAILED], default=None)
+    forget_parser = commands.add_parser("forget", help="bestanden uit het manifest verwijderen")
+    forget_parser.add_argument("videos", nargs="*", help="bestanden (leeg = alles)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    manifest = JobManifest(args.manifest)
+
+    if args.command == "summary":
+        for state, count in sorted(manifest.summary().items()):
+            print(f"{state:8} {count}")
+    elif args.command == "list":
+        for video, state, attempts, updated, output, error in manifest.rows(args.state):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated)) if updated else "-"
+            line = f"{state:8} {when}  pogingen: {attempts}  {video}"
+            if error:
+                line += f"  ({error})"
+            print(line)
+    elif args.command == "forget":
+        if args.videos:
+            for video in args.videos:
+                manifest.forget(video)
+        else:
+            manifest.forget()
+
+    manifest.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - metrics
+# Houdt per bestand de tijd per stap bij (decoderen, model laden, VAD,
+# inferentie, reinigen, schrijven) met de audioduur, de real-time factor,
+# het piekgeheugen en het aantal cues. De metingen kunnen als JSONL worden
+# weggeschreven en als Prometheus tekstbestand (voor de textfile collector
+# van node_exporter) worden geëxporteerd.
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+# Stappen in de volgorde waarin ze in een run voorkomen
+STAPPEN = ["decode", "cache", "dedup", "model_load", "vad", "detect", "inference", "clean", "write"]
+
+
+def peak_rss_bytes():
+    """
+    Piekgeheugen (maximale resident set size) van dit proces in bytes, of None.
+    """
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux geeft kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except Exception:
+        return None
+
+
+class StageTimer:
+    """
+    Telt de tijd per stap voor één bestand op.
+    """
+
+    def __init__(self, timings=None):
+        self.timings = dict(timings or {})
+        self.audio_duration = None  # Seconden audio, als bekend
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def summary(self, cues=None):
+        """
+        Metrics van dit bestand als dictionary (voor het resultaat en de JSONL-export).
+        """
+        timings = {name: round(self.timings[name], 4)
+                   for name in sorted(self.timings, key=lambda name: STAPPEN.index(name) if name in STAPPEN else 99)}
+        metrics = {
+            "timings": timings,
+            "audio_duration": round(self.audio_duration, 3) if self.audio_duration is not None else None,
+            "rtf": None,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "cues": cues,
+        }
+        # Real-time factor: inferentietijd gedeeld door de audioduur (lager is sneller)
+        if self.audio_duration and "inference" in self.timings:
+            metrics["rtf"] = round(self.timings["inference"] / self.audio_duration, 4)
+        return metrics
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRecorder:
+    """
+    Verzamelt de metrics van alle verwerkte bestanden. Elk resultaat wordt
+    direct als JSON-regel aan jsonl_path toegevoegd; prometheus_path wordt
+    na elk resultaat atomair herschreven met de totalen van deze run.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, labels=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.labels = dict(labels or {})  # Vaste labels, bijv. model, backend en device
+        self.lock = threading.Lock()
+        self.host = socket.gethostname()
+        self.files = {}  # status -> aantal
+        self.stage_seconds = {}
+        self.audio_seconds = 0.0
+        self.cues = 0
+        self.peak_rss = 0
+        self.duplicates = 0
+        self.dedup_saved_seconds = 0.0
+        self.jsonl_file = None
+        if jsonl_path:
+            directory = os.path.dirname(os.path.abspath(jsonl_path))
+            os.makedirs(directory, exist_ok=True)
+            self.jsonl_file = open(jsonl_path, "a", encoding="utf-8")
+
+    def record(self, file_result):
+        """
+        Verwerkt een resultaat-dictionary van de engine (of de worker pool).
+        """
+        metrics = file_result.get("metrics") or {}
+        entry = dict(self.labels,
+                     ts=round(time.time(), 3),
+                     host=self.host,
+                     video=file_result.get("video"),
+                     status=file_result.get("status"),
+                     cached=file_result.get("cached", False),
+                     batched=file_result.get("batched", False),
+                     duplicate=file_result.get("duplicate"),
+                     **metrics)
+
+        with self.lock:
+            status = file_result.get("status", "unknown")
+            self.files[status] = self.files.get(status, 0) + 1
+            for name, seconds in metrics.get("timings", {}).items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.audio_seconds += metrics.get("audio_duration") or 0.0
+            self.cues += metrics.get("cues") or 0
+            self.peak_rss = max(self.peak_rss, metrics.get("peak_rss_bytes") or 0)
+            if file_result.get("duplicate"):
+                self.duplicates += 1
+                self.dedup_saved_seconds += file_result["duplicate"].get("saved_seconds") or 0.0
+
+            if self.jsonl_file is not None:
+                self.jsonl_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.jsonl_file.flush()
+            if self.prometheus_path:
+                from subtitle_writer import atomic_write
+                atomic_write(self.prometheus_path, self.prometheus_text())
+
+    def prometheus_text(self):
+        """
+        De totalen in het Prometheus tekstformaat.
+        """
+        base = ",".join(f'{key}="{_label(value)}"' for key, value in sorted(self.labels.items()))
+
+        def labels(**extra):
+            parts = [base] if base else []
+            parts += [f'{key}="{_label(value)}"' for key, value in extra.items()]
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = [
+            "# HELP whisper_subtitle_files_total Verwerkte bestanden per status.",
+            "# TYPE whisper_subtitle_files_total counter",
+        ]
+        lines += [f"whisper_subtitle_files_total{labels(status=status)} {count}"
+                  for status, count in sorted(self.files.items())]
+        lines += [
+            "# HELP whisper_subtitle_stage_seconds_total Tijd per verwerkingsstap.",
+            "# TYPE whisper_subtitle_stage_seconds_total counter",
+        ]
+        lines += [f"whisper_subtitle_stage_seconds_total{labels(stage=name)} {seconds:.6f}"
+                  for name, seconds in sorted(self.stage_seconds.items())]
+        lines += [
+            "# HELP whisper_subtitle_audio_seconds_total Verwerkte audio in seconden.",
+            "# TYPE whisper_subtitle_audio_seconds_total counter",
+            f"whisper_subtitle_audio_seconds_total{labels()} {self.audio_seconds:.3f}",
+            "# HELP whisper_subtitle_cues_total Geschreven ondertitelcues.",
+            "# TYPE whisper_subtitle_cues_total counter",
+            f"whisper_subtitle_cues_total{labels()} {self.cues}",
+            "# HELP whisper_subtitle_dedup_files_total Bestanden waarvan de uitvoer van een duplicaat is overgenomen.",
+            "# TYPE whisper_subtitle_dedup_files_total counter",
+            f"whisper_subtitle_dedup_files_total{labels()} {self.duplicates}",
+            "# HELP whisper_subtitle_dedup_saved_seconds_total Rekentijd die het origineel kostte en die de duplicaten bespaarden.",
+            "# TYPE whisper_subtitle_dedup_saved_seconds_total counter",
+            f"whisper_subtitle_dedup_saved_seconds_total{labels()} {self.dedup_saved_seconds:.3f}",
+            "# HELP whisper_subtitle_peak_rss_bytes Hoogste piekgeheugen van een verwerkingsproces.",
+            "# TYPE whisper_subtitle_peak_rss_bytes gauge",
+            f"whisper_subtitle_peak_rss_bytes{labels()} {self.peak_rss}",
+            "# HELP whisper_subtitle_last_run_timestamp_seconds Tijdstip van het laatste verwerkte bestand.",
+            "# TYPE whisper_subtitle_last_run_timestamp_seconds gauge",
+            f"whisper_subtitle_last_run_timestamp_seconds{labels()} {time.time():.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self.jsonl_file is not None:
+            self.jsonl_file.close()
+            self.jsonl_file = None
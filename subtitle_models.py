@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - model residency manager
+# Houdt geladen modellen in het geheugen zodat opeenvolgende batches in
+# hetzelfde proces het model niet steeds opnieuw hoeven te laden. Modellen
+# staan in een LRU op (backend, grootte, device, precisie), begrensd door een
+# geheugenbudget.
+
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# Geschat geheugengebruik per model in GB (zie README: Modelgroottes en prestaties)
+MODEL_GEHEUGEN_GB = {
+    "tiny": 1,
+    "base": 1,
+    "small": 2,
+    "medium": 5,
+    "large": 10,
+}
+
+# Deel van het werkgeheugen dat standaard voor modellen gebruikt mag worden
+BUDGET_FRACTIE = 0.5
+
+
+def total_memory_bytes():
+    """
+    Geeft het totale werkgeheugen in bytes, of None als dit niet te bepalen is.
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+
+    try:
+        # Windows: geen sysconf beschikbaar
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    except Exception:
+        pass
+
+    return None
+
+
+def model_memory_bytes(model_size):
+    return MODEL_GEHEUGEN_GB.get(model_size, 2) * 1024 ** 3
+
+
+def select_device(requested):
+    """
+    Bepaalt het device ("cuda" of "cpu") voor de gevraagde instelling
+    ("auto", "cuda" of "cpu") en geeft (device, logregel) terug. De
+    beschikbaarheid van CUDA komt uit de capaciteitencache, zodat hiervoor
+    geen torch geïmporteerd hoeft te worden; met "cpu" wordt niets geprobeerd.
+    """
+    from subtitle_capabilities import get_capabilities
+
+    want_gpu = requested in ("auto", "cuda")
+    has_cuda = False
+    if want_gpu:
+        has_cuda = get_capabilities()["cuda"]
+        if not has_cuda and requested == "cuda":
+            # Expliciet om de GPU gevraagd: een verouderde cache niet vertrouwen
+            has_cuda = get_capabilities(refresh=True)["cuda"]
+    device = "cuda" if has_cuda else "cpu"
+    if device == "cuda":
+        message = "Gebruik NVIDIA GPU voor verwerking"
+    elif requested == "cuda":
+        message = "GPU niet beschikbaar, terugvallen op CPU"
+    elif requested == "auto":
+        message = "Geen CUDA-compatibele GPU gedetecteerd, CPU wordt gebruikt"
+    else:
+        message = "CPU geselecteerd voor verwerking"
+    return device, message
+
+
+class ModelManager:
+    """
+    LRU-cache van geladen Whisper modellen, gesleuteld op (backend, grootte,
+    device, precisie). Past een nieuw model niet binnen het geheugenbudget, dan worden
+    de minst recent gebruikte modellen eerst vrijgegeven.
+    """
+
+    def __init__(self, memory_budget=None):
+        if memory_budget is None:
+            total = total_memory_bytes()
+            memory_budget = int(total * BUDGET_FRACTIE) if total else None
+        self.memory_budget = memory_budget  # None = onbegrensd
+        self.models = OrderedDict()  # sleutel -> model, meest recent gebruikt achteraan
+        self.lock = threading.Lock()
+        self.loading = {}  # sleutel -> threading.Lock, voorkomt dubbel laden
+        self.preloads = []  # Achtergrondthreads van preload()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "evictions": 0,
+            "load_seconds": 0.0,
+            "last_load": {},  # "backend/grootte/device/precisie" -> laadtijd in seconden
+        }
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.loading.setdefault(key, threading.Lock())
+
+    def get(self, model_size, device, precision=None, log=None, backend=None):
+        """
+        Geeft het model terug; laadt het alleen als het nog niet in het geheugen staat.
+        backend is een backend uit subtitle_backends (standaard openai-whisper).
+        """
+        from subtitle_backends import get_backend
+
+        log = log or (lambda message: None)
+        backend = backend or get_backend()
+        precision = precision or backend.precision_for(device)
+        key = (backend.name, model_size, device, precision)
+
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.stats["hits"] += 1
+                log(f"Model '{model_size}' op {device} is al geladen")
+                return self.models[key]
+
+        # Eén thread laadt, andere threads voor hetzelfde model wachten daarop
+        with self._key_lock(key):
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self.models[key]
+                self.stats["misses"] += 1
+
+            self._make_room(model_memory_bytes(model_size), log)
+
+            log(f"Model '{model_size}' ({backend.name}, {precision}) laden op {device}... (dit kan even duren)")
+            start_time = time.time()
+            model = backend.load(model_size, device, precision)
+            load_time = time.time() - start_time
+            log(f"Model geladen in {load_time:.2f} seconden")
+
+            with self.lock:
+                self.models[key] = model
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += load_time
+                self.stats["last_load"]["/".join(key)] = round(load_time, 3)
+            return model
+
+    def _make_room(self, needed, log):
+        """
+        Geeft de minst recent gebruikte modellen vrij tot er 'needed' bytes
+        binnen het budget passen.
+        """
+        if self.memory_budget is None:
+            return
+        with self.lock:
+            while self.models:
+                in_use = sum(model_memory_bytes(size) for _, size, _, _ in self.models)
+                if in_use + needed <= self.memory_budget:
+                    break
+                key, _ = self.models.popitem(last=False)
+                self.stats["evictions"] += 1
+                log(f"Model '{key[1]}' ({key[0]}) op {key[2]} vrijgegeven (geheugenbudget)")
+            self._release_memory()
+
+    def _release_memory(self):
+        import gc
+
+        gc.collect()
+        # Alleen als torch al geladen is; importeren om niets vrij te geven kost seconden
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def preload(self, model_size, device="auto", log=None, backend=None):
+        """
+        Laadt een model op de achtergrond, bijvoorbeeld bij het opstarten.
+        Geeft de thread terug.
+        """
+        log = log or (lambda message: None)
+
+        def run():
+            try:
+                resolved, _ = select_device(device)
+                self.get(model_size, resolved, log=log, backend=backend)
+            except Exception as e:
+                log(f"Model vooraf laden mislukt: {str(e)}")
+
+        thread = threading.Thread(target=run, name="model-preload", daemon=True)
+        thread.start()
+        with self.lock:
+            self.preloads = [preload for preload in self.preloads if preload.is_alive()] + [thread]
+        return thread
+
+    def wait_preloads(self, timeout=None):
+        """
+        Wacht tot lopende preload()-threads klaar zijn. Aan te roepen voor
+        het afsluiten: eindigt de interpreter terwijl een daemon-thread nog
+        in de C++-code van torch zit (import of laden), dan kan het proces
+        met een abort stoppen in plaats van met de eigen exitcode.
+        """
+        with self.lock:
+            threads = list(self.preloads)
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0, deadline - time.time()))
+
+    def preloading(self):
+        """
+        True zolang er nog een preload()-thread loopt.
+        """
+        with self.lock:
+            return any(preload.is_alive() for preload in self.preloads)
+
+    def loaded(self):
+        with self.lock:
+            return list(self.models)
+
+    def metrics(self):
+        """
+        Laadtijden en hit/miss tellers.
+        """
+        with self.lock:
+            metrics = dict(self.stats, last_load=dict(self.stats["last_load"]))
+            metrics["load_seconds"] = round(metrics["load_seconds"], 3)
+            metrics["resident"] = ["/".join(key) for key in self.models]
+            return metrics
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+            self._release_memory()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """
+    De gedeelde ModelManager van dit proces.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ModelManager()
+        return _manager
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - PCM-store
+# Bewaart de gedecodeerde audio (16 kHz mono float32) als .npy-bestand op
+# schijf, geadresseerd op de vingerafdruk van het bronbestand. Een volgende
+# run, een nieuwe poging na een fout of een run met een ander model of een
+# andere taal hoeft het bestand dan niet opnieuw met ffmpeg te decoderen.
+# De bestanden worden met mmap geopend: worker-processen lezen dezelfde
+# pagina's uit de page cache in plaats van elk een eigen kopie te krijgen.
+
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+import threading
+
+from subtitle_audio import SAMPLE_RATE, load_audio
+from subtitle_cache import default_cache_root, file_fingerprint, format_size, parse_size
+
+# Verhoog dit als het formaat van de opgeslagen audio verandert
+PCM_VERSION = 1
+
+# Bytes per sample (float32)
+SAMPLE_BYTES = 4
+
+
+def default_pcm_dir():
+    return os.path.join(default_cache_root(), "pcm")
+
+
+def pcm_key(fingerprint, sr=SAMPLE_RATE):
+    """
+    Sleutel van een entry: vingerafdruk van het bestand + samplerate + formaatversie.
+    """
+    return f"{fingerprint}-{sr}-v{PCM_VERSION}"
+
+
+def map_audio(path):
+    """
+    Opent een opgeslagen .npy-bestand als memory map. Copy-on-write: de
+    pagina's worden gedeeld met de page cache (en met andere processen) tot
+    er in geschreven wordt, en torch krijgt een schrijfbare array.
+    """
+    import numpy as np
+
+    return np.load(path, mmap_mode="c")
+
+
+def shared_reference(audio):
+    """
+    Verwijzing (bestand, offset, aantal samples) naar audio die volledig uit
+    een bestand in de store gemapt is, zodat een ander proces dezelfde audio
+    zelf kan mappen in plaats van een gepicklede kopie te ontvangen. Geeft
+    None voor gewone arrays en voor delen van een map.
+    """
+    import numpy as np
+
+    if not isinstance(audio, np.memmap) or not isinstance(audio.base, mmap.mmap) or not audio.filename:
+        return None
+    if not os.path.exists(audio.filename):
+        return None
+    return audio.filename, audio.offset, len(audio)
+
+
+def map_reference(reference, start=0, end=None):
+    """
+    Mapt de samples start:end van een verwijzing uit shared_reference().
+    """
+    import numpy as np
+
+    filename, offset, length = reference
+    audio = np.memmap(filename, dtype=np.float32, mode="c", offset=offset, shape=(length,))
+    return audio[start:end]
+
+
+class MappedStream:
+    """
+    Leest audio uit de store in stukken, met dezelfde interface als
+    subtitle_audio.PCMStream, zodat streaming transcriptie de opgeslagen
+    audio kan gebruiken zonder ffmpeg en zonder alles in het geheugen te laden.
+    """
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.samples_read = 0
+
+    def __enter__(self):
+        return self
+
+    def read(self, n_samples):
+        import numpy as np
+
+        piece = np.array(self.audio[self.samples_read:self.samples_read + n_samples], dtype=np.float32)
+        self.samples_read += len(piece)
+        return piece
+
+    def __exit__(self, exc_type, exc, tb):
+        self.audio = None
+        return False
+
+
+class PCMStore:
+    """
+    Map met gedecodeerde audio, één .npy-bestand per bronbestand. Wordt de
+    store groter dan max_bytes, dan worden de minst recent gebruikte entries
+    verwijderd (LRU op basis van mtime). Een entry die nog gemapt is blijft
+    op Linux en macOS leesbaar tot de map gesloten wordt; op Windows wordt
+    hij overgeslagen en bij een volgende opruiming alsnog verwijderd.
+    """
+
+    def __init__(self, pcm_dir=None, max_bytes=None):
+        self.pcm_dir = pcm_dir or default_pcm_dir()
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._total_bytes = None  # Wordt bij de eerste put() berekend
+
+    def _path(self, key):
+        return os.path.join(self.pcm_dir, key[:2], f"{key}.npy")
+
+    def contains(self, video_path):
+        try:
+            return os.path.exists(self._path(pcm_key(file_fingerprint(video_path))))
+        except OSError:
+            return False
+
+    def get(self, key):
+        """
+        Geeft de opgeslagen audio als memory map, of None bij een miss.
+        """
+        path = self._path(key)
+        try:
+            audio = map_audio(path)
+        except (OSError, ValueError):
+            return None
+
+        # Markeer als recent gebruikt voor de LRU-opruiming
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return audio
+
+    def put(self, key, audio):
+        """
+        Slaat audio op en geeft de opgeslagen versie als memory map terug,
+        zodat de aanroeper de array in het geheugen kan loslaten. Lukt
+        opslaan niet, dan komt de oorspronkelijke array terug.
+        """
+        import numpy as np
+
+        path = self._path(key)
+        # Eerst naar een tijdelijk bestand, dan hernoemen: nooit een half geschreven entry
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as file:
+                np.save(file, np.asarray(audio, dtype=np.float32))
+            try:
+                old_size = os.path.getsize(path)  # Een bestaande entry wordt overschreven
+            except OSError:
+                old_size = 0
+            os.replace(temp_path, path)
+        except OSError:
+            # Schijf vol, alleen-lezen of (Windows) het doel is nog gemapt
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return audio
+
+        if self.max_bytes:
+            with self.lock:
+                if self._total_bytes is None:
+                    self._total_bytes = sum(size for _, size, _ in self._scan())
+                else:
+                    self._total_bytes += os.path.getsize(path) - old_size
+                over_limit = self._total_bytes > self.max_bytes
+            if over_limit:
+                self.prune(self.max_bytes, keep=path)
+
+        try:
+            return map_audio(path)
+        except (OSError, ValueError):
+            return audio
+
+    def load(self, video_path, loader=load_audio):
+        """
+        Geeft de audio van een bestand uit de store, of decodeert het met
+        loader en slaat het resultaat op. Geeft (audio, hit) terug.
+        """
+        key = pcm_key(file_fingerprint(video_path))
+        audio = self.get(key)
+        if audio is not None:
+            return audio, True
+        return self.put(key, loader(video_path)), False
+
+    def _scan(self):
+        """
+        Geeft (pad, grootte, mtime) van alle entries.
+        """
+        entries = []
+        if not os.path.isdir(self.pcm_dir):
+            return entries
+        for dirpath, _, filenames in os.walk(self.pcm_dir):
+            for filename in filenames:
+                if not filename.endswith(".npy"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def entries(self):
+        """
+        Geeft sleutel, grootte, duur en laatste gebruik van alle entries,
+        meest recent gebruikt eerst.
+        """
+        return [{
+            "key": os.path.basename(path)[:-len(".npy")],
+            "size": size,
+            "duration": round(max(0, size - 128) / SAMPLE_BYTES / SAMPLE_RATE, 1),
+            "last_used": mtime,
+        } for path, size, mtime in sorted(self._scan(), key=lambda item: item[2], reverse=True)]
+
+    def stats(self):
+        entries = self._scan()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def prune(self, max_bytes=None, max_age=None, keep=None):
+        """
+        Verwijdert entries ouder dan max_age seconden en daarna de minst recent
+        gebruikte entries tot de store kleiner is dan max_bytes. De entry keep
+        (net opgeslagen) blijft staan. Geeft het aantal verwijderde entries en
+        bytes terug.
+        """
+        with self.lock:
+            entries = sorted(self._scan(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            removed = removed_bytes = 0
+
+            for path, size, mtime in entries:
+                if path == keep:
+                    continue
+                too_old = max_age is not None and now - mtime > max_age
+                too_big = max_bytes is not None and total > max_bytes
+                if not (too_old or too_big):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                removed_bytes += size
+
+            self._total_bytes = total
+            return removed, removed_bytes
+
+    def clear(self):
+        return self.prune(max_bytes=0)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Beheer de PCM-store (gedecodeerde audio) van de "
+                                                 "Whisper Subtitle Generator.")
+    parser.add_argument("--pcm-dir", default=None,
+                        help=f"map van de PCM-store (standaard: {default_pcm_dir()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="aantal entries en totale grootte tonen")
+    list_parser = commands.add_parser("list", help="entries tonen, meest recent gebruikt eerst")
+    list_parser.add_argument("--json", action="store_true", help="als JSON-regels tonen")
+
+    prune_parser = commands.add_parser("prune", help="oude of minst recent gebruikte entries verwijderen")
+    prune_parser.add_argument("--max-size", default=None, help="maximale grootte, bijv. 500M of 10G")
+    prune_parser.add_argument("--max-age", type=float, default=None, help="maximale leeftijd in dagen")
+
+    commands.add_parser("clear", help="de hele store leegmaken")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    store = PCMStore(args.pcm_dir)
+
+    if args.command == "stats":
+        stats = store.stats()
+        print(f"PCM-store: {store.pcm_dir}")
+        print(f"Entries: {stats['entries']}")
+        print(f"Grootte: {format_size(stats['bytes'])}")
+
+    elif args.command == "list":
+        for entry in store.entries():
+            if args.json:
+                print(json.dumps(entry, ensure_ascii=False))
+                continue
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"{entry['key'][:12]}  {last_used}  {format_size(entry['size']):>10}  "
+                  f"{entry['duration']:>8.1f} s")
+
+    elif args.command == "prune":
+        if args.max_size is None and args.max_age is None:
+            print("Geef --max-size en/of --max-age op", file=sys.stderr)
+            return 2
+        max_bytes = parse_size(args.max_size) if args.max_size is not None else None
+        max_age = args.max_age * 86400 if args.max_age is not None else None
+        removed, removed_bytes = store.prune(max_bytes, max_age)
+        print(f"{removed} entries verwijderd ({format_size(removed_bytes)})")
+
+    elif args.command == "clear":
+        removed, removed_bytes = store.clear()
+        print(f"{removed} entries verwijderd ({format_size(removed_bytes)})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
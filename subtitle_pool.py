@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - multi-process worker pool
+# Verdeelt de bestandswachtrij over meerdere processen die elk één keer het
+# model laden. Bedoeld voor CPU-machines waar één transcriptie maar een deel
+# van de cores benut.
+
+import os
+import time
+import queue
+import multiprocessing
+
+from subtitle_engine import SubtitleEngine, log_to_stderr
+from subtitle_models import model_memory_bytes, select_device, total_memory_bytes
+
+# Deel van het werkgeheugen dat de pool maximaal mag gebruiken
+GEHEUGEN_FRACTIE = 0.8
+
+
+def auto_worker_count(model_size, threads_per_worker=None, reserved_models=0):
+    """
+    Kiest het aantal workers op basis van het aantal cores en het geschatte
+    geheugengebruik van het model. reserved_models is het aantal modellen
+    dat daarnaast al in het geheugen staat (bijv. in de coördinator).
+    """
+    cores = os.cpu_count() or 1
+    workers = max(1, cores // (threads_per_worker or 1))
+
+    memory = total_memory_bytes()
+    if memory:
+        model_bytes = model_memory_bytes(model_size)
+        budget = memory * GEHEUGEN_FRACTIE - reserved_models * model_bytes
+        workers = min(workers, max(1, int(budget // model_bytes)))
+
+    return workers
+
+
+def _worker_main(worker_id, settings, threads, task_queue, result_queue, progress=False):
+    """
+    Hoofdlus van een worker-proces: laadt het model één keer en verwerkt
+    bestanden uit de gedeelde wachtrij tot er een stop-signaal (None) komt.
+    Met progress gaat ook de voortgang binnen een bestand naar de coördinator.
+    """
+    # Voorkom dat OpenMP/MKL meer threads start dan toegewezen; dit moet
+    # gebeuren voordat torch wordt geïmporteerd.
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    current = {"index": None}
+
+    def log(message):
+        result_queue.put(("log", worker_id, current["index"], message))
+
+    engine = SubtitleEngine(threads=threads, log=log, **settings)
+    if progress:
+        engine.file_progress = lambda video_path, seconds, duration=None: result_queue.put(
+            ("progress", worker_id, current["index"], (seconds, duration)))
+
+    try:
+        engine.load_model()
+    except Exception as e:
+        result_queue.put(("failed", worker_id, None, str(e)))
+        return
+
+    result_queue.put(("ready", worker_id, None, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        index, video_path, total = task
+        current["index"] = index
+        result_queue.put(("start", worker_id, index, None))
+        file_result = engine.process_file(video_path, index + 1, total)
+        file_result["worker"] = worker_id
+        result_queue.put(("result", worker_id, index, file_result))
+        current["index"] = None
+
+
+class WorkerPool:
+    """
+    Verwerkt bestanden met meerdere worker-processen. Heeft dezelfde
+    process()/stop() interface als SubtitleEngine; resultaten en logregels
+    komen in de oorspronkelijke volgorde van de bestanden terug.
+    """
+
+    def __init__(self, settings, workers=None, threads_per_worker=None, progress=None, progress_interval=1.0,
+                 log=None):
+        self.settings = dict(settings)
+        self.log_callback = log or log_to_stderr
+        self.progress_callback = progress
+        self.progress_interval = progress_interval
+        self.is_processing = False
+
+        cores = os.cpu_count() or 1
+        if workers is None:
+            # "auto" via de capaciteitencache oplossen, anders krijgt een CPU-machine met -d auto één worker
+            device, _ = select_device(self.settings.get("device", "auto"))
+            if device != "cpu":
+                # Meerdere modellen op één GPU levert weinig op en kost veel VRAM
+                workers = 1
+            else:
+                workers = auto_worker_count(self.settings.get("model_size", "small"), threads_per_worker)
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+
+    def log(self, message):
+        self.log_callback(message)
+
+    def stop(self):
+        """
+        Vraagt de pool te stoppen; bestanden die al in verwerking zijn worden
+        nog afgemaakt.
+        """
+        self.is_processing = False
+
+    def process(self, video_paths):
+        """
+        Generator die alle bestanden over de workers verdeelt en per bestand
+        het resultaat teruggeeft, in de volgorde van video_paths.
+        """
+        total_files = len(video_paths)
+
+        # Het manifest wordt alleen door de coördinator bijgewerkt
+        planner = SubtitleEngine(log=self.log, **self.settings)
+        manifest = planner.open_manifest()
+        settings = planner.output_settings()
+        results = {}  # index -> resultaat, buffer voor resultaten die te vroeg binnenkomen
+        todo = []
+        for index, video_path in enumerate(video_paths):
+            if planner.is_done(manifest, video_path):
+                results[index] = planner.skipped_result(video_path, manifest)
+            else:
+                todo.append(index)
+
+        if not todo:
+            for index in range(total_files):
+                yield results[index]
+            if manifest is not None:
+                manifest.close()
+            return
+
+        tracker = None
+        if self.progress_callback is not None:
+            from subtitle_audio import probe_durations
+            from subtitle_progress import ProgressTracker
+
+            tracker = ProgressTracker(self.progress_callback, self.progress_interval)
+            durations = probe_durations([video_paths[index] for index in todo])
+            tracker.start({video_paths[index]: durations[video_paths[index]] for index in todo})
+
+        workers = min(self.workers, len(todo)) or 1
+        self.log(f"Worker pool starten: {workers} proces(sen) met elk {self.threads_per_worker} thread(s)")
+
+        context = multiprocessing.get_context("spawn")
+        task_queue = context.Queue()
+        result_queue = context.Queue()
+
+        # Kopieën van een eerder bestand gaan als laatste de wachtrij in, zodat
+        # het origineel meestal al klaar is en ze de uitvoer kunnen overnemen
+        copies = planner.batch_copies([video_paths[index] for index in todo])
+        for index in sorted(todo, key=lambda index: video_paths[index] in copies):
+            task_queue.put((index, video_paths[index], total_files))
+        for _ in range(workers):
+            task_queue.put(None)
+
+        processes = []
+        for worker_id in range(workers):
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, self.settings, self.threads_per_worker, task_queue, result_queue,
+                      tracker is not None),
+                daemon=True,
+            )
+            process.start()
+            processes.append(process)
+
+        pending_logs = {}  # index -> logregels van bestanden die nog niet aan de beurt zijn
+        in_flight = {}  # worker_id -> index
+        finished_workers = set()
+        duplicates = []
+        next_index = 0
+        stopped = False
+        self.is_processing = True
+
+        try:
+            while next_index < total_files:
+                if not self.is_processing and not stopped:
+                    stopped = True
+                    self.log("Wachtrij leegmaken, lopende bestanden worden afgemaakt...")
+                    self._drain(task_queue, workers)
+
+                try:
+                    kind, worker_id, index, payload = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    self._check_workers(processes, in_flight, finished_workers, results, video_paths)
+                    if len(finished_workers) == workers and not stopped:
+                        # Alle workers zijn weg; resterende bestanden markeren als fout
+                        for index in range(next_index, total_files):
+                            results.setdefault(index, self._error_result(
+                                video_paths[index], "Geen werkende worker beschikbaar"))
+                else:
+                    if kind == "log":
+                        if index is None or index == next_index:
+                            self.log(f"[worker {worker_id}] {payload}")
+                        else:
+                            pending_logs.setdefault(index, []).append(f"[worker {worker_id}] {payload}")
+                    elif kind == "start":
+                        in_flight[worker_id] = index
+                        if tracker is not None:
+                            tracker.file_started(video_paths[index])
+                        if manifest is not None:
+                            manifest.mark_running(video_paths[index], settings)
+                    elif kind == "progress":
+                        if tracker is not None:
+                            tracker.file_progress(video_paths[index], *payload)
+                    elif kind == "failed":
+                        finished_workers.add(worker_id)
+                        self.log(f"[worker {worker_id}] FOUT bij laden van model: {payload}")
+                    elif kind == "result":
+                        in_flight.pop(worker_id, None)
+                        if tracker is not None:
+                            tracker.file_finished(video_paths[index], payload["status"])
+                        results[index] = payload
+                        if manifest is not None:
+                            manifest.record(payload, settings)
+                        if "duplicate" in payload:
+                            duplicates.append(payload["duplicate"])
+
+                # Geef resultaten in volgorde door, samen met de gebufferde logregels
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+                    for message in pending_logs.pop(next_index, []):
+                        self.log(message)
+
+                if (stopped and not in_flight and not any(process.is_alive() for process in processes)
+                        and result_queue.empty()):
+                    # Na een stop: wachten tot elke worker zijn stop-signaal heeft gekregen en
+                    # gestopt is (een worker kan al een taak hebben genomen waarvan het
+                    # "start"-bericht nog onderweg is), dan wat al klaar is alsnog doorgeven
+                    for index in sorted(results):
+                        for message in pending_logs.pop(index, []):
+                            self.log(message)
+                        yield results[index]
+                    break
+
+            if duplicates:
+                from subtitle_dedup import savings_message
+                self.log(savings_message(duplicates))
+        finally:
+            self.is_processing = False
+            # Workers die klaar zijn stoppen zelf; wat dan nog draait wordt beëindigd
+            deadline = time.time() + 2
+            for process in processes:
+                process.join(timeout=max(0, deadline - time.time()))
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join(timeout=5)
+            if manifest is not None:
+                manifest.close()
+
+    def _drain(self, task_queue, workers):
+        """
+        Haalt alle nog niet gestarte taken uit de wachtrij en zet er
+        stop-signalen voor de workers in.
+        """
+        while True:
+            try:
+                task_queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in range(workers):
+            task_queue.put(None)
+
+    def _check_workers(self, processes, in_flight, finished_workers, results, video_paths):
+        """
+        Detecteert workers die onverwacht zijn gestopt en markeert het bestand
+        dat zij aan het verwerken waren als mislukt.
+        """
+        for worker_id, process in enumerate(processes):
+            if process.is_alive() or worker_id in finished_workers:
+                continue
+            finished_workers.add(worker_id)
+            index = in_flight.pop(worker_id, None)
+            if index is not None:
+                self.log(f"[worker {worker_id}] Proces onverwacht gestopt (exitcode {process.exitcode})")
+                file_result = self._error_result(video_paths[index], f"Worker gestopt met exitcode {process.exitcode}")
+                file_result["worker"] = worker_id
+                results[index] = file_result
+
+    def _error_result(self, video_path, error):
+        return {"video": video_path, "status": "error", "error": error}
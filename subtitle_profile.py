@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - profilering
+# Optionele profilering van de pijplijn: per verwerkingsstap (decoderen,
+# cache, VAD, taaldetectie, inferentie, reinigen, schrijven) een cProfile,
+# en desgewenst de torch profiler op de CPU rond taaldetectie en inferentie.
+# Alleen een steekproef van de bestanden wordt geprofileerd. Per bestand
+# komt er een .prof (te openen met pstats of snakeviz) en een bestand met
+# collapsed stacks; write_report() voegt die samen tot één collapsed-stack
+# bestand voor flamegraph.pl of speedscope en een overzicht van de
+# zwaarste functies.
+
+import os
+import json
+import time
+import hashlib
+import cProfile
+import pstats
+import contextlib
+from collections import Counter
+
+# Stappen waar de torch profiler omheen komt
+TORCH_STAPPEN = ("detect", "inference")
+
+MAX_DIEPTE = 80  # Diepere stacks worden afgekapt
+MIN_MICROSECONDEN = 50  # Kortere takken worden weggelaten uit de collapsed stacks
+TOP_N = 20
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == "~":
+        label = name  # Ingebouwde functie, bijv. <built-in method time.sleep>
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    # ';' scheidt de frames en de laatste spatie de waarde
+    return label.replace(";", ",")
+
+
+def collapsed_stacks(profile, root):
+    """
+    Zet een cProfile om naar collapsed stacks ("root;f1;f2 microseconden").
+    cProfile bewaart alleen aanroeper-aangeroepene paren, geen volledige
+    stacks; de tijd van een functie wordt daarom over de aanroepers verdeeld
+    naar rato van hun aandeel in de cumulatieve tijd, zoals gprof2dot en
+    flameprof dat ook doen.
+    """
+    stats = pstats.Stats(profile).stats
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge
+
+    lines = Counter()
+
+    def walk(func, stack, on_stack, own, cumulative):
+        stack = stack + [_function_label(func)]
+        if own * 1e6 >= 1:
+            lines[";".join(stack)] += own * 1e6
+        total = stats[func][3]
+        if total <= 0 or len(stack) >= MAX_DIEPTE:
+            return
+        scale = min(1.0, cumulative / total)
+        for child, (_, _, child_own, child_cumulative) in callees.get(func, {}).items():
+            if child in on_stack or child_cumulative * scale * 1e6 < MIN_MICROSECONDEN:
+                continue
+            walk(child, stack, on_stack | {child}, child_own * scale, child_cumulative * scale)
+
+    for func, (_, _, own, cumulative, callers) in stats.items():
+        if not callers:
+            walk(func, [root], {func}, own, cumulative)
+    return {stack: int(round(value)) for stack, value in lines.items() if round(value) > 0}
+
+
+def _enable(profile):
+    """
+    Zet een cProfile aan. Vanaf Python 3.12 kan er per proces maar één
+    profiler tegelijk actief zijn; profileert een andere thread al (het
+    decoderen in de AudioPrefetcher tegenover de rest van de pijplijn), dan
+    blijft deze stap ongeprofileerd in plaats van de verwerking te laten mislukken.
+    """
+    try:
+        profile.enable()
+    except ValueError:
+        pass
+
+
+def read_collapsed(path):
+    stacks = Counter()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            stack, _, value = line.rstrip("\n").rpartition(" ")
+            if stack and value.isdigit():
+                stacks[stack] += int(value)
+    return stacks
+
+
+def write_collapsed(path, stacks):
+    with open(path, "w", encoding="utf-8") as file:
+        for stack, value in sorted(stacks.items()):
+            file.write(f"{stack} {value}\n")
+
+
+class FileProfile:
+    """
+    Profiel van één bestand: een cProfile per stap. Geneste stappen (model
+    laden tijdens de taaldetectie) tellen bij de binnenste stap, zodat de
+    tijden per stap exclusief zijn.
+    """
+
+    def __init__(self, video_path, output_dir, use_torch=False, log=None):
+        self.video_path = video_path
+        self.output_dir = output_dir
+        self.use_torch = use_torch
+        self.log = log or (lambda message: None)
+        self.profiles = {}  # stap -> cProfile.Profile
+        self.active = []  # Stack van actieve stappen
+        self.torch_stacks = Counter()
+        self.torch_ops = {}  # operatie -> {"count", "self_cpu_us", "cpu_us"}
+
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8", "replace")).hexdigest()[:8]
+        self.name = f"{stem}-{digest}"
+
+    @contextlib.contextmanager
+    def stage(self, name, inner=None):
+        """
+        Profileert een stap; inner is een andere context manager (de
+        StageTimer) die eromheen meeloopt.
+        """
+        with inner if inner is not None else contextlib.nullcontext():
+            if self.active:
+                self.profiles[self.active[-1]].disable()
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            self.active.append(name)
+            _enable(profile)
+            try:
+                if self.use_torch and name in TORCH_STAPPEN:
+                    with self.torch_profile(name):
+                        yield
+                else:
+                    yield
+            finally:
+                profile.disable()
+                self.active.pop()
+                if self.active:
+                    _enable(self.profiles[self.active[-1]])
+
+    @contextlib.contextmanager
+    def torch_profile(self, stage):
+        """
+        De torch profiler (CPU) rond een stap; de operaties en stacks worden
+        bij die van eerdere stappen van dit bestand opgeteld.
+        """
+        try:
+            from torch.profiler import ProfilerActivity, profile
+        except ImportError:
+            self.use_torch = False
+            self.log("Torch profiler niet beschikbaar, alleen cProfile wordt gebruikt")
+            yield
+            return
+
+        with profile(activities=[ProfilerActivity.CPU], with_stack=True) as prof:
+            yield
+
+        stacks_path = os.path.join(self.output_dir, f".{self.name}.{os.getpid()}.stacks.tmp")
+        try:
+            prof.export_stacks(stacks_path, "self_cpu_time_total")
+            for stack, value in read_collapsed(stacks_path).items():
+                self.torch_stacks[f"{stage};{stack}"] += value
+        except Exception as e:
+            self.log(f"Torch stacks konden niet worden geëxporteerd: {str(e)}")
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(stacks_path)
+
+        for event in prof.key_averages():
+            op = self.torch_ops.setdefault(event.key, {"count": 0, "self_cpu_us": 0.0, "cpu_us": 0.0})
+            op["count"] += event.count
+            op["self_cpu_us"] += event.self_cpu_time_total
+            op["cpu_us"] += event.cpu_time_total
+
+    def finish(self):
+        """
+        Schrijft het profiel van dit bestand weg en geeft het pad van de
+        .prof terug (None als er geen stap geprofileerd is).
+        """
+        for profile in self.profiles.values():
+            profile.disable()
+        if not self.profiles:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, self.name)
+        stacks = Counter()
+        merged = None
+        for stage, profile in self.profiles.items():
+            stacks.update(collapsed_stacks(profile, stage))
+            if merged is None:
+                merged = pstats.Stats(profile)
+            else:
+                merged.add(profile)
+        merged.dump_stats(base + ".prof")
+        write_collapsed(base + ".collapsed", stacks)
+
+        if self.torch_ops:
+            write_collapsed(base + ".torch.collapsed", self.torch_stacks)
+            with open(base + ".torch.json", "w", encoding="utf-8") as file:
+                json.dump({"video": self.video_path, "ops": self.torch_ops}, file, ensure_ascii=False)
+        return base + ".prof"
+
+
+class Profiler:
+    """
+    Kiest welke bestanden geprofileerd worden en maakt voor die bestanden
+    een FileProfile. De steekproef hangt alleen af van het pad, zodat ook
+    de processen van een worker pool dezelfde keuze maken.
+    """
+
+    def __init__(self, output_dir, sample=1.0, use_torch=False, log=None):
+        self.output_dir = output_dir
+        self.sample = sample  # Fractie van de bestanden die geprofileerd wordt
+        self.use_torch = use_torch
+        self.log = log or (lambda message: None)
+
+    def sampled(self, video_path):
+        if self.sample >= 1:
+            return True
+        digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8", "replace")).hexdigest()
+        return int(digest[:8], 16) / 0x100000000 < self.sample
+
+    def start(self, video_path):
+        """
+        Geeft een FileProfile voor dit bestand, of None als het niet in de
+        steekproef zit.
+        """
+        if not self.sampled(video_path):
+            return None
+        return FileProfile(video_path, self.output_dir, self.use_torch, self.log)
+
+
+def write_report(output_dir, top=TOP_N, chunked=False):
+    """
+    Voegt de profielen van alle bestanden in output_dir samen: profile.prof
+    (pstats), profile.collapsed en torch.collapsed (collapsed stacks voor
+    flamegraph.pl of speedscope) en summary.txt met de tijd per stap en de
+    top-N functies en torch-operaties. Geeft het overzicht als dictionary.
+    chunked geeft aan dat lange bestanden met --chunk-workers in aparte
+    processen zijn getranscribeerd; dat wordt in summary.txt vermeld.
+    """
+    names = sorted(os.listdir(output_dir)) if os.path.isdir(output_dir) else []
+    profiles = [os.path.join(output_dir, name) for name in names
+                if name.endswith(".prof") and name != "profile.prof"]
+    report = {"dir": output_dir, "files": len(profiles), "stages": {}, "top": [], "torch_top": []}
+    if not profiles:
+        return report
+
+    stacks = Counter()
+    torch_stacks = Counter()
+    torch_ops = {}
+    for name in names:
+        path = os.path.join(output_dir, name)
+        if name.endswith(".torch.collapsed") and name != "torch.collapsed":
+            torch_stacks.update(read_collapsed(path))
+        elif name.endswith(".collapsed") and name not in ("profile.collapsed", "torch.collapsed"):
+            stacks.update(read_collapsed(path))
+        elif name.endswith(".torch.json"):
+            with open(path, encoding="utf-8") as file:
+                for key, op in json.load(file)["ops"].items():
+                    total = torch_ops.setdefault(key, {"count": 0, "self_cpu_us": 0.0, "cpu_us": 0.0})
+                    for field in total:
+                        total[field] += op[field]
+
+    write_collapsed(os.path.join(output_dir, "profile.collapsed"), stacks)
+    if torch_stacks:
+        write_collapsed(os.path.join(output_dir, "torch.collapsed"), torch_stacks)
+
+    for stack, value in stacks.items():
+        stage = stack.split(";", 1)[0]
+        report["stages"][stage] = report["stages"].get(stage, 0) + value
+    report["stages"] = {stage: round(value / 1e6, 4)
+                        for stage, value in sorted(report["stages"].items(), key=lambda item: -item[1])}
+
+    stats = pstats.Stats(*profiles)
+    stats.dump_stats(os.path.join(output_dir, "profile.prof"))
+    for func, (_, calls, own, cumulative, _) in sorted(stats.stats.items(), key=lambda item: -item[1][2])[:top]:
+        report["top"].append({"function": _function_label(func), "calls": calls,
+                              "self": round(own, 4), "cumulative": round(cumulative, 4)})
+    for key, op in sorted(torch_ops.items(), key=lambda item: -item[1]["self_cpu_us"])[:top]:
+        report["torch_top"].append({"op": key, "calls": op["count"],
+                                    "self": round(op["self_cpu_us"] / 1e6, 4), "total": round(op["cpu_us"] / 1e6, 4)})
+
+    total = sum(report["stages"].values()) or 1.0
+    lines = [f"Profiel van {len(profiles)} bestand(en), {time.strftime('%Y-%m-%d %H:%M:%S')}", "",
+             "Tijd per stap (cProfile, geneste stappen tellen bij de binnenste):"]
+    lines += [f"  {stage:<12} {seconds:10.3f} s  {100 * seconds / total:5.1f}%"
+              for stage, seconds in report["stages"].items()]
+    if chunked:
+        lines += ["  Let op: met --chunk-workers draait de inferentie van lange bestanden in aparte processen",
+                  "  die cProfile niet ziet; 'inference' toont voor die bestanden alleen de wachttijd."]
+    lines += ["", f"Top {top} functies op eigen tijd:", f"  {'eigen':>10}  {'totaal':>10}  {'aanroepen':>10}  functie"]
+    lines += [f"  {entry['self']:10.3f}  {entry['cumulative']:10.3f}  {entry['calls']:>10}  {entry['function']}"
+              for entry in report["top"]]
+    if report["torch_top"]:
+        lines += ["", f"Top {top} torch-operaties op eigen CPU-tijd:",
+                  f"  {'eigen':>10}  {'totaal':>10}  {'aanroepen':>10}  operatie"]
+        lines += [f"  {entry['self']:10.3f}  {entry['total']:10.3f}  {entry['calls']:>10}  {entry['op']}"
+                  for entry in report["torch_top"]]
+    with open(os.path.join(output_dir, "summary.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    return report
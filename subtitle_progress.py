@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - voortgang
+# Houdt bij hoeveel seconden audio per bestand en over de hele batch
+# verwerkt zijn, en schat de resterende tijd op basis van de gemeten
+# snelheid. De stand gaat als dictionary naar een callback: de GUI toont
+# die in de voortgangsbalk, de CLI schrijft hem als JSON-regel.
+
+import os
+import time
+import threading
+
+
+class ProgressTracker:
+    """
+    Voortgang van een batch. Meerdere bestanden kunnen tegelijk actief zijn
+    (bij de worker pool). Tussentijdse standen worden per bestand hooguit
+    eens per interval seconden doorgegeven; begin en einde altijd.
+    """
+
+    def __init__(self, callback, interval=1.0):
+        self.callback = callback
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.durations = {}  # pad -> seconden audio (None = onbekend)
+        self.indices = {}  # pad -> positie in de batch (vanaf 1)
+        self.active = {}  # pad -> verwerkte seconden van bestanden die nog bezig zijn
+        self.last_report = {}  # pad -> tijdstip van de laatste tussenstand
+        self.finished_seconds = 0.0
+        self.files_done = 0
+        self.start_time = None
+
+    def start(self, durations):
+        """
+        Begint een batch met de (vooraf bepaalde) duur per bestand.
+        """
+        with self.lock:
+            self.durations = dict(durations)
+            self.indices = {path: index for index, path in enumerate(self.durations, 1)}
+            self.active = {}
+            self.finished_seconds = 0.0
+            self.files_done = 0
+            self.start_time = time.monotonic()
+
+    def file_started(self, path):
+        with self.lock:
+            self.active[path] = 0.0
+            self.last_report[path] = time.monotonic()
+            snapshot = self.snapshot(path, "start")
+        self.callback(snapshot)
+
+    def file_progress(self, path, seconds, duration=None):
+        """
+        seconds: tot waar het bestand verwerkt is; duration: de werkelijke
+        duur als die (na het decoderen) bekend is.
+        """
+        with self.lock:
+            if duration and not self.durations.get(path):
+                self.durations[path] = duration
+            if path not in self.active:
+                return
+            total = self.durations.get(path)
+            self.active[path] = min(seconds, total) if total else seconds
+
+            now = time.monotonic()
+            if now - self.last_report.get(path, 0.0) < self.interval:
+                return
+            self.last_report[path] = now
+            snapshot = self.snapshot(path, "running")
+        self.callback(snapshot)
+
+    def file_finished(self, path, status="ok"):
+        with self.lock:
+            seconds = self.durations.get(path) or self.active.get(path, 0.0)
+            self.active.pop(path, None)
+            self.last_report.pop(path, None)
+            self.finished_seconds += seconds
+            self.files_done += 1
+            snapshot = self.snapshot(path, "done")
+            snapshot["status"] = status
+            snapshot["file_seconds"] = round(seconds, 1)
+            snapshot["file_percent"] = 100.0
+        self.callback(snapshot)
+
+    def snapshot(self, path, state):
+        """
+        De huidige stand als dictionary; aanroepen met de lock vast.
+        """
+        elapsed = time.monotonic() - self.start_time if self.start_time is not None else 0.0
+        done = self.finished_seconds + sum(self.active.values())
+        total = sum(duration or 0.0 for duration in self.durations.values())
+        file_seconds = self.active.get(path, 0.0)
+        file_duration = self.durations.get(path)
+
+        # Gemeten snelheid over alles wat tot nu toe verwerkt is
+        rtf = elapsed / done if done > 0 else None
+        eta = max(0.0, total - done) * rtf if rtf is not None and total else None
+        return {
+            "video": path,
+            "name": os.path.basename(path),
+            "state": state,
+            "index": self.indices.get(path),
+            "total_files": len(self.durations),
+            "files_done": self.files_done,
+            "file_seconds": round(file_seconds, 1),
+            "file_duration": round(file_duration, 1) if file_duration else None,
+            "file_percent": round(min(100.0, 100.0 * file_seconds / file_duration), 1) if file_duration else None,
+            "done_seconds": round(done, 1),
+            "total_seconds": round(total, 1),
+            "percent": round(min(100.0, 100.0 * done / total), 1) if total else None,
+            "elapsed": round(elapsed, 1),
+            "rtf": round(rtf, 4) if rtf is not None else None,
+            "eta_seconds": round(eta) if eta is not None else None,
+        }
+
+
+def format_eta(seconds):
+    """
+    Resterende tijd leesbaar, bijv. '1 u 05 min' of '3 min 20 s'.
+    """
+    if seconds is None:
+        return "onbekend"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} u {minutes:02d} min"
+    if minutes:
+        return f"{minutes} min {seconds:02d} s"
+    return f"{seconds} s"
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - spraakdetectie (VAD)
+# Energie-gebaseerde voice activity detection die vóór de transcriptie stille
+# stukken (en optioneel aanhoudende muziek) uit de audio haalt. Alleen de
+# spraakgebieden gaan naar het model; de tijdcodes van de resultaten worden
+# daarna teruggezet naar de oorspronkelijke tijdlijn.
+
+import bisect
+
+from subtitle_audio import SAMPLE_RATE
+
+# Standaardinstellingen
+FRAME_MS = 30  # Lengte van een analyseframe
+MARGIN_DB = 15  # Hoeveel dB boven de ruisvloer een frame als spraak telt
+FLOOR_DB = -55  # Alles onder dit niveau is altijd stilte
+MIN_SPEECH = 0.25  # Kortere spraakgebieden worden genegeerd (seconden)
+MIN_SILENCE = 0.6  # Kortere stiltes worden niet uitgeknipt (seconden)
+PADDING = 0.25  # Marge rond elk spraakgebied (seconden)
+GAP = 0.2  # Stilte tussen samengevoegde spraakgebieden (seconden)
+
+# Muziekfilter: spraak heeft veel korte dips in het energieniveau (pauzes
+# tussen woorden), aanhoudende muziek nauwelijks
+MUSIC_MIN_LENGTH = 10.0  # Alleen langere gebieden worden op muziek gecontroleerd
+MUSIC_DIP_DB = 10  # Een dip is een frame zoveel dB onder de mediaan van het gebied
+MUSIC_MAX_DIPS = 0.03  # Minder dips dan deze fractie: waarschijnlijk muziek
+
+
+def frame_levels(audio, sr=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """
+    Geeft het energieniveau (dBFS) per frame van frame_ms milliseconden.
+    """
+    import numpy as np
+
+    frame = int(sr * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def _runs(mask):
+    """
+    Geeft (begin, einde) frame-indices van aaneengesloten True-stukken.
+    """
+    import numpy as np
+
+    padded = np.concatenate([[False], mask, [False]])
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(changes[0::2], changes[1::2]))
+
+
+def detect_speech(audio, sr=SAMPLE_RATE, frame_ms=FRAME_MS, margin_db=MARGIN_DB, floor_db=FLOOR_DB,
+                  min_speech=MIN_SPEECH, min_silence=MIN_SILENCE, padding=PADDING, skip_music=False):
+    """
+    Detecteert spraakgebieden in audio (float32, mono) en geeft een lijst
+    (begin, einde) in seconden terug.
+    """
+    import numpy as np
+
+    levels = frame_levels(audio, sr, frame_ms)
+    if len(levels) == 0:
+        return []
+
+    frame_seconds = frame_ms / 1000
+    duration = len(audio) / sr
+
+    # Drempel relatief aan de ruisvloer, maar nooit hoger dan net onder het
+    # niveau van de luidere stukken (anders verdwijnt doorlopende spraak)
+    noise_floor = np.percentile(levels, 10)
+    loud_level = np.percentile(levels, 95)
+    threshold = max(min(noise_floor + margin_db, loud_level - 10), floor_db)
+    speech = levels > threshold
+
+    # Korte stiltes binnen spraak opvullen
+    min_silence_frames = int(min_silence / frame_seconds)
+    for start, end in _runs(~speech):
+        if start > 0 and end < len(speech) and end - start < min_silence_frames:
+            speech[start:end] = True
+
+    regions = []
+    min_speech_frames = max(1, int(min_speech / frame_seconds))
+    for start, end in _runs(speech):
+        if end - start < min_speech_frames:
+            continue
+        if skip_music and (end - start) * frame_seconds >= MUSIC_MIN_LENGTH:
+            region_levels = levels[start:end]
+            dips = np.mean(region_levels < np.median(region_levels) - MUSIC_DIP_DB)
+            if dips < MUSIC_MAX_DIPS:
+                continue
+        regions.append([max(0.0, start * frame_seconds - padding),
+                        min(duration, end * frame_seconds + padding)])
+
+    # Door de marge overlappende gebieden samenvoegen
+    merged = []
+    for start, end in regions:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(float(start), float(end)) for start, end in merged]
+
+
+class SpeechMap:
+    """
+    Knipt de spraakgebieden uit de audio en plakt ze achter elkaar (met een
+    korte stilte ertussen). Houdt bij hoe tijden in de ingekorte audio
+    terugvertalen naar de oorspronkelijke tijdlijn.
+    """
+
+    def __init__(self, audio, regions, sr=SAMPLE_RATE, gap=GAP):
+        import numpy as np
+
+        self.sr = sr
+        self.duration = len(audio) / sr
+        self.regions = regions
+        self.table = []  # (begin in ingekorte audio, begin in origineel, lengte)
+
+        pieces = []
+        gap_samples = np.zeros(int(gap * sr), dtype=np.float32)
+        position = 0.0
+        for index, (start, end) in enumerate(regions):
+            if index > 0:
+                pieces.append(gap_samples)
+                position += len(gap_samples) / sr
+            piece = audio[int(start * sr):int(end * sr)]
+            pieces.append(piece)
+            self.table.append((position, start, len(piece) / sr))
+            position += len(piece) / sr
+
+        self.audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        self.starts = [compact_start for compact_start, _, _ in self.table]
+
+    @classmethod
+    def from_audio(cls, audio, sr=SAMPLE_RATE, skip_music=False):
+        return cls(audio, detect_speech(audio, sr, skip_music=skip_music), sr)
+
+    @property
+    def speech_duration(self):
+        return sum(length for _, _, length in self.table)
+
+    def to_original(self, t):
+        """
+        Vertaalt een tijd in de ingekorte audio naar de oorspronkelijke tijdlijn.
+        Tijden in een tussenstilte vallen op het einde van het vorige gebied.
+        """
+        if not self.table:
+            return t
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index < 0:
+            return self.table[0][1]
+        compact_start, original_start, length = self.table[index]
+        return original_start + min(t - compact_start, length)
+
+    def remap(self, result):
+        """
+        Zet de tijdcodes van een Whisper resultaat (segmenten en woorden) om
+        naar de oorspronkelijke tijdlijn.
+        """
+        for segment in result.get("segments", []):
+            segment["start"] = self.to_original(segment["start"])
+            segment["end"] = max(segment["start"], self.to_original(segment["end"]))
+            for word in segment.get("words", []) or []:
+                word["start"] = self.to_original(word["start"])
+                word["end"] = max(word["start"], self.to_original(word["end"]))
+        return result
+
+    def stats(self):
+        skipped = max(0.0, self.duration - self.speech_duration)
+        return {
+            "duration": round(self.duration, 2),
+            "speech": round(self.speech_duration, 2),
+            "skipped": round(skipped, 2),
+            "skipped_percent": round(100 * skipped / self.duration, 1) if self.duration else 0.0,
+            "regions": len(self.table),
+        }
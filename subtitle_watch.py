@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - service met bewaakte mappen
+# Draait als langlopend proces: bewaakt mappen op nieuwe videobestanden
+# (inotify op Linux, anders watchdog), wacht tot een bestand volledig
+# geschreven is en zet het in de duurzame jobwachtrij (subtitle_jobqueue).
+# Dezelfde service verwerkt als consumer de jobs uit die wachtrij; meerdere
+# services kunnen dezelfde wachtrij delen.
+
+import os
+import sys
+import time
+import errno
+import select
+import signal
+import struct
+import argparse
+import threading
+
+from subtitle_engine import (VIDEO_EXTENSIES, ModelLoadError, SubtitleEngine, add_engine_arguments, emit,
+                             engine_settings_from_args, expand_inputs, log_to_stderr)
+
+# Een bestand is klaar als het zo lang (seconden) niet meer veranderd is
+STABIEL_SECONDEN = 2.0
+# Maximale wachttijd van een consumer zonder melding van een nieuwe job;
+# bepaalt hoe snel jobs van andere processen of machines worden opgepakt
+WACHT_SECONDEN = 10.0
+
+# inotify (zie inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_video(path):
+    name = os.path.basename(path)
+    # Tijdelijke bestanden (rsync, atomair schrijven) beginnen met een punt
+    return not name.startswith(".") and name.lower().endswith(VIDEO_EXTENSIES)
+
+
+class InotifyBackend:
+    """
+    Bewaakt mappen met inotify via ctypes, zonder extra pakketten.
+    """
+
+    name = "inotify"
+
+    def __init__(self, touch, recursive=False):
+        import ctypes
+        import ctypes.util
+
+        self.touch = touch
+        self.recursive = recursive
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 mislukt")
+        self.directories = {}  # watch descriptor -> map
+        self.rescan = None  # Callback als de kernel events heeft moeten laten vallen
+
+    @staticmethod
+    def available():
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            import ctypes
+            import ctypes.util
+
+            return hasattr(ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6"), "inotify_init1")
+        except OSError:
+            return False
+
+    def add(self, directory):
+        import ctypes
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Kan map niet bewaken: {directory}")
+        self.directories[wd] = directory
+        if self.recursive:
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                    self.add(entry.path)
+
+    def wait(self, timeout):
+        """
+        Wacht hooguit timeout seconden op events en geeft ze door aan touch.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return
+            raise
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+            offset += EVENT_HEADER.size + length
+            name = os.fsdecode(raw_name.rstrip(b"\0"))
+
+            if mask & IN_Q_OVERFLOW:
+                if self.rescan is not None:
+                    self.rescan()
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith("."):
+                    # Nieuwe map: bewaken, en wat er al in staat meenemen
+                    self.add(path)
+                    for video_path in expand_inputs([path], recursive=True):
+                        self.touch(video_path)
+            elif is_video(path):
+                self.touch(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchdogBackend:
+    """
+    Bewaakt mappen met het watchdog-pakket (macOS, Windows).
+    """
+
+    name = "watchdog"
+
+    def __init__(self, touch, recursive=False):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            raise RuntimeError("Mappen bewaken vereist inotify (Linux) of watchdog (pip install watchdog)")
+
+        self.touch = touch
+        self.recursive = recursive
+        self.event = threading.Event()
+        self.rescan = None
+        backend = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                path = getattr(event, "dest_path", None) or event.src_path
+                if event.is_directory:
+                    return
+                if is_video(path):
+                    backend.touch(path)
+                    backend.event.set()
+
+        self.handler = Handler()
+        self.observer = Observer()
+        self.observer.start()
+
+    @staticmethod
+    def available():
+        try:
+            import watchdog  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def add(self, directory):
+        self.observer.schedule(self.handler, directory, recursive=self.recursive)
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+        self.event.clear()
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join(timeout=5)
+
+
+WATCH_BACKENDS = {
+    InotifyBackend.name: InotifyBackend,
+    WatchdogBackend.name: WatchdogBackend,
+}
+
+
+class FolderWatcher:
+    """
+    Meldt videobestanden in de bewaakte mappen zodra ze volledig geschreven
+    zijn: na het laatste event moeten grootte en mtime settle seconden gelijk
+    blijven. Draait in een eigen thread; ready(pad) wordt voor elk klaar
+    bestand aangeroepen. Bij het starten worden ook de bestanden gemeld die
+    er al stonden.
+    """
+
+    def __init__(self, directories, ready, recursive=False, settle=STABIEL_SECONDEN, backend="auto", log=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.ready = ready
+        self.recursive = recursive
+        self.settle = settle
+        self.log = log or log_to_stderr
+        self.lock = threading.Lock()
+        self.pending = {}  # pad -> (grootte, mtime_ns, tijdstip van de laatste verandering)
+        self.stop_requested = False
+        self.thread = None
+
+        if backend == "auto":
+            backend = InotifyBackend.name if InotifyBackend.available() else WatchdogBackend.name
+        self.backend = WATCH_BACKENDS[backend](self.touch, recursive=recursive)
+        self.backend.rescan = self.scan
+
+    def touch(self, path):
+        """
+        Een bestand is (mogelijk) veranderd; het wordt pas gemeld als het
+        daarna settle seconden gelijk blijft.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.pending.pop(path, None)
+            return
+        with self.lock:
+            self.pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def scan(self):
+        for video_path in expand_inputs(self.directories, recursive=self.recursive):
+            self.touch(video_path)
+
+    def check_pending(self):
+        """
+        Meldt de bestanden die lang genoeg onveranderd zijn en geeft de tijd
+        tot de volgende controle terug (None als er niets wacht).
+        """
+        now = time.monotonic()
+        due = []
+        next_check = None
+        with self.lock:
+            for path, (size, mtime_ns, changed) in list(self.pending.items()):
+                remaining = changed + self.settle - now
+                if remaining > 0:
+                    next_check = remaining if next_check is None else min(next_check, remaining)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del self.pending[path]
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                    # Nog in beweging (bijv. een schrijver die geen events geeft)
+                    self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+                    next_check = self.settle if next_check is None else min(next_check, self.settle)
+                    continue
+                del self.pending[path]
+                due.append(path)
+        for path in due:
+            self.ready(path)
+        return next_check
+
+    def run(self):
+        for directory in self.directories:
+            self.backend.add(directory)
+        self.log(f"Bewaakt met {self.backend.name}: {', '.join(self.directories)}")
+        self.scan()
+        while not self.stop_requested:
+            timeout = self.check_pending()
+            # Zonder wachtende bestanden wacht de watcher op events; de timeout
+            # is er alleen om een stopverzoek op te merken
+            self.backend.wait(1.0 if timeout is None else max(0.05, timeout))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="folder-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_requested = True
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self.backend.close()
+
+
+class WatchService:
+    """
+    Bewaakt mappen en/of verwerkt jobs uit de wachtrij met één engine. De
+    lease van de job die in verwerking is wordt op de achtergrond verlengd.
+    """
+
+    def __init__(self, settings, directories=(), queue_path=None, watch=True, consume=True, recursive=False,
+                 priority=0, settle=STABIEL_SECONDEN, idle=WACHT_SECONDEN, lease_seconds=None, max_attempts=None,
+                 backend="auto", threads=None, progress=None, progress_interval=1.0, recorder=None, log=None):
+        from subtitle_jobqueue import LEASE_SECONDEN, MAX_POGINGEN, consumer_id
+
+        self.settings = dict(settings)
+        self.directories = list(directories)
+        self.queue_path = queue_path
+        self.watch = watch
+        self.consume = consume
+        self.recursive = recursive
+        self.priority = priority
+        self.settle = settle
+        self.idle = idle
+        self.lease_seconds = lease_seconds or LEASE_SECONDEN
+        self.max_attempts = max_attempts or MAX_POGINGEN
+        self.backend = backend
+        self.threads = threads
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.recorder = recorder
+        self.log = log or log_to_stderr
+        self.owner = consumer_id()
+        self.wake = threading.Event()
+        self.stop_requested = False
+        self.engine = None
+        self.local = threading.local()  # Eén databaseverbinding per thread
+
+    def jobs(self):
+        from subtitle_jobqueue import JobQueue
+
+        if getattr(self.local, "jobs", None) is None:
+            self.local.jobs = JobQueue(self.queue_path, lease_seconds=self.lease_seconds,
+                                       max_attempts=self.max_attempts)
+        return self.local.jobs
+
+    def enqueue(self, video_path):
+        if self.jobs().enqueue(video_path, self.priority):
+            self.log(f"In de wachtrij: {os.path.basename(video_path)}")
+            emit("queued", video=os.path.abspath(video_path), priority=self.priority)
+            self.wake.set()
+
+    def stop(self, *args):
+        self.stop_requested = True
+        self.wake.set()
+        if self.engine is not None:
+            self.engine.stop()
+
+    def heartbeat(self, job_id, done):
+        """
+        Verlengt de lease elke derde van de leaseduur tot done gezet wordt.
+        """
+        while not done.wait(self.lease_seconds / 3):
+            if not self.jobs().renew(job_id, self.owner):
+                self.log("Lease van de huidige job verloren; een andere consumer kan hem overnemen")
+                return
+
+    def process_job(self, job_id, video_path):
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job_id, done), daemon=True)
+        heartbeat.start()
+        file_result = None
+        try:
+            for file_result in self.engine.process([video_path]):
+                if self.recorder is not None:
+                    self.recorder.record(file_result)
+                emit("result", job=job_id, **file_result)
+        except ModelLoadError:
+            self.jobs().release(job_id, self.owner)
+            raise
+        except Exception as e:
+            file_result = {"video": video_path, "status": "error", "error": str(e)}
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if file_result is None:
+            # Gestopt voordat het bestand aan de beurt was
+            self.jobs().release(job_id, self.owner)
+        elif file_result["status"] == "error":
+            state = self.jobs().fail(job_id, self.owner, file_result.get("error"))
+            if state == "queued":
+                self.log(f"Job voor {os.path.basename(video_path)} wordt later opnieuw geprobeerd")
+            emit("job_failed", job=job_id, video=video_path, state=state, error=file_result.get("error"))
+        else:
+            self.jobs().complete(job_id, self.owner, {key: file_result.get(key)
+                                                      for key in ("output", "taal", "status", "cues")})
+
+    def consume_jobs(self):
+        self.engine = SubtitleEngine(threads=self.threads, progress=self.progress,
+                                     progress_interval=self.progress_interval, log=self.log, **self.settings)
+        self.log(f"Consumer {self.owner} wacht op jobs")
+        while not self.stop_requested:
+            job = self.jobs().claim(self.owner)
+            if job is None:
+                # Wakker worden bij een nieuwe job van de eigen watcher, een
+                # job die na een backoff weer klaarstaat, of na idle seconden
+                timeout = self.idle
+                due = self.jobs().next_due()
+                if due is not None:
+                    timeout = min(timeout, max(0.1, due - time.time()))
+                self.wake.wait(timeout)
+                self.wake.clear()
+                continue
+            self.process_job(*job)
+
+    def run(self):
+        watcher = None
+        if self.watch and self.directories:
+            watcher = FolderWatcher(self.directories, self.enqueue, recursive=self.recursive, settle=self.settle,
+                                    backend=self.backend, log=self.log)
+            watcher.start()
+        try:
+            if self.consume:
+                self.consume_jobs()
+            else:
+                while not self.stop_requested:
+                    self.wake.wait(1.0)
+                    self.wake.clear()
+        finally:
+            if watcher is not None:
+                watcher.stop()
+            # Niet afsluiten terwijl het model nog op de achtergrond laadt (zie wait_preloads)
+            from subtitle_models import get_model_manager
+            get_model_manager().wait_preloads()
+
+
+def build_arg_parser():
+    from subtitle_jobqueue import LEASE_SECONDEN, MAX_POGINGEN
+
+    parser = argparse.ArgumentParser(
+        description="Service: bewaakt mappen op nieuwe videobestanden en verwerkt ze via een duurzame "
+                    "jobwachtrij. Gebeurtenissen worden als JSON-regels naar stdout geschreven."
+    )
+    parser.add_argument("directories", nargs="*", help="te bewaken mappen")
+    parser.add_argument("--queue", default=None,
+                        help="pad van de jobwachtrij; deel dit pad om consumers op meerdere machines te "
+                             "gebruiken (standaard: in de gebruikerscache)")
+    parser.add_argument("--role", default="both", choices=["both", "watch", "consume"],
+                        help="alleen bewaken, alleen jobs verwerken, of beide (standaard: both)")
+    parser.add_argument("-p", "--priority", type=int, default=0,
+                        help="prioriteit van bestanden uit deze mappen; hoger gaat eerst (standaard: 0)")
+    parser.add_argument("--settle", type=float, default=STABIEL_SECONDEN,
+                        help="seconden dat een bestand onveranderd moet blijven voordat het in de wachtrij komt "
+                             f"(standaard: {STABIEL_SECONDEN:g})")
+    parser.add_argument("--idle", type=float, default=WACHT_SECONDEN,
+                        help="maximale wachttijd in seconden voordat de wachtrij opnieuw wordt bekeken, voor jobs "
+                             f"van andere processen (standaard: {WACHT_SECONDEN:g})")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDEN,
+                        help=f"leaseduur van een job in seconden (standaard: {LEASE_SECONDEN})")
+    parser.add_argument("--max-attempts", type=int, default=MAX_POGINGEN,
+                        help=f"aantal pogingen per job (standaard: {MAX_POGINGEN})")
+    parser.add_argument("--watch-backend", default="auto", choices=["auto"] + list(WATCH_BACKENDS),
+                        help="manier van bewaken (standaard: inotify op Linux, anders watchdog)")
+    add_engine_arguments(parser, workers=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.role != "consume" and not args.directories:
+        log_to_stderr("FOUT: Geef minstens één map op om te bewaken")
+        return 2
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            log_to_stderr(f"FOUT: Map niet gevonden: {directory}")
+            return 2
+
+    log = (lambda message: None) if args.quiet else log_to_stderr
+    try:
+        settings = engine_settings_from_args(args)
+    except ValueError as e:
+        log_to_stderr(f"FOUT: {str(e)}")
+        return 2
+
+    progress = None
+    if args.progress:
+        def progress(snapshot):
+            emit("progress", **snapshot)
+
+    recorder = None
+    if args.metrics_jsonl or args.metrics_prom:
+        from subtitle_metrics import MetricsRecorder
+
+        recorder = MetricsRecorder(args.metrics_jsonl, args.metrics_prom, labels={
+            "model": settings["model_size"],
+            "backend": settings["backend"],
+            "device": settings["device"],
+        })
+
+    service = WatchService(settings, args.directories, queue_path=args.queue, watch=args.role != "consume",
+                           consume=args.role != "watch", recursive=args.recursive, priority=args.priority,
+                           settle=args.settle, idle=args.idle, lease_seconds=args.lease,
+                           max_attempts=args.max_attempts, backend=args.watch_backend, threads=args.threads,
+                           progress=progress, progress_interval=args.progress_interval, recorder=recorder, log=log)
+    # Netjes stoppen: het bestand dat in verwerking is wordt afgemaakt
+    signal.signal(signal.SIGINT, service.stop)
+    signal.signal(signal.SIGTERM, service.stop)
+    try:
+        service.run()
+    except ModelLoadError as e:
+        log_to_stderr(f"FOUT: {str(e)}")
+        return 1
+    except RuntimeError as e:
+        log_to_stderr(f"FOUT: {str(e)}")
+        return 2
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if settings["profile_dir"]:
+            # Profielen van alle jobs sinds de start van de service samenvoegen
+            from subtitle_profile import write_report
+            report = write_report(settings["profile_dir"], args.profile_top, chunked=bool(settings["chunk_workers"]))
+            emit("profile", **report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Whisper Subtitle Generator - uitvoer schrijven
+# Zet de segmenten één keer om naar cues en schrijft daaruit de gevraagde
+# formaten (SRT, VTT, JSON, TXT). Elk bestand wordt eerst volledig naar een
+# tijdelijk bestand in dezelfde map geschreven en dan in één keer op zijn
+# plaats gezet, zodat er nooit een half geschreven of ontbrekend bestand is.
+
+import os
+import json
+import tempfile
+
+FORMATEN = ["srt", "vtt", "json", "txt"]
+
+_UMASK = None  # Wordt bij het eerste nieuwe bestand bepaald, zie current_umask()
+
+
+def current_umask():
+    """
+    De umask van het proces, zonder hem te veranderen: os.umask() zet hem
+    procesbreed, en een bestand dat een andere thread intussen aanmaakt zou
+    dan voor iedereen schrijfbaar worden. Op Linux staat hij in
+    /proc/self/status; elders wordt een proefbestand met 0o666 aangemaakt.
+    """
+    global _UMASK
+    if _UMASK is not None:
+        return _UMASK
+    try:
+        with open("/proc/self/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("Umask:"):
+                    _UMASK = int(line.split()[1], 8)
+                    return _UMASK
+    except (OSError, ValueError):
+        pass
+
+    fd, probe_path = tempfile.mkstemp(prefix=".umask-")
+    os.close(fd)
+    os.remove(probe_path)
+    try:
+        fd = os.open(probe_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        os.close(fd)
+        _UMASK = 0o666 & ~os.stat(probe_path).st_mode & 0o777
+    except OSError:
+        _UMASK = 0o022
+    finally:
+        try:
+            os.remove(probe_path)
+        except OSError:
+            pass
+    return _UMASK
+
+
+def format_timestamp(seconds, always_include_hours=False, decimal_marker="."):
+    """
+    Tijdcode als [uu:]mm:ss.mmm, net als whisper.utils.format_timestamp.
+    """
+    milliseconds = round(max(0.0, seconds) * 1000.0)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1_000)
+    hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+    return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def parse_formats(value):
+    """
+    Zet 'srt,vtt' om naar een lijst formaten; onbekende formaten geven een ValueError.
+    """
+    formats = []
+    for name in str(value).lower().replace(" ", "").split(","):
+        if not name:
+            continue
+        if name not in FORMATEN:
+            raise ValueError(f"Onbekend uitvoerformaat: {name} (kies uit {', '.join(FORMATEN)})")
+        if name not in formats:
+            formats.append(name)
+    return formats or ["srt"]
+
+
+def render_cues(segments):
+    """
+    Zet Whisper segmenten om naar (begin, einde, tekst); lege segmenten vallen weg.
+    """
+    cues = []
+    for segment in segments:
+        text = segment["text"].strip().replace("-->", "->")
+        if text:
+            cues.append((segment["start"], segment["end"], text))
+    return cues
+
+
+def srt_cue(number, start, end, text):
+    return (f"{number}\n"
+            f"{format_timestamp(start, True, ',')} --> {format_timestamp(end, True, ',')}\n"
+            f"{text}\n\n")
+
+
+def render(cues, fmt, language=None):
+    """
+    Geeft de inhoud van één uitvoerformaat als string.
+    """
+    if fmt == "srt":
+        return "".join(srt_cue(number, start, end, text) for number, (start, end, text) in enumerate(cues, 1))
+    if fmt == "vtt":
+        return "WEBVTT\n\n" + "".join(f"{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+                                      for start, end, text in cues)
+    if fmt == "txt":
+        return "".join(f"{text}\n" for _, _, text in cues)
+    if fmt == "json":
+        return json.dumps({
+            "language": language,
+            "text": " ".join(text for _, _, text in cues),
+            "segments": [{"id": index, "start": round(start, 3), "end": round(end, 3), "text": text}
+                         for index, (start, end, text) in enumerate(cues)],
+        }, ensure_ascii=False)
+    raise ValueError(f"Onbekend uitvoerformaat: {fmt}")
+
+
+def atomic_write(path, content):
+    """
+    Schrijft content naar een tijdelijk bestand in dezelfde map en hernoemt
+    het daarna naar path. Een bestaand bestand blijft staan tot het nieuwe
+    volledig geschreven is.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        # mkstemp maakt bestanden die alleen de eigenaar mag lezen; nieuwe
+        # uitvoerbestanden krijgen de gewone rechten (volgens de umask)
+        mode = 0o666 & ~current_umask()
+
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            file.write(content)
+        if hasattr(os, "chmod"):
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def output_paths(base_path, formats):
+    """
+    Geeft per formaat het uitvoerpad: <basis>.<formaat>.
+    """
+    return {fmt: f"{base_path}.{fmt}" for fmt in formats}
+
+
+def write_outputs(result, base_path, formats=("srt",)):
+    """
+    Schrijft een Whisper resultaat in alle gevraagde formaten naast elkaar.
+    Geeft een dictionary formaat -> pad en het aantal cues terug.
+    """
+    cues = render_cues(result.get("segments", []))
+    paths = output_paths(base_path, formats)
+    for fmt, path in paths.items():
+        atomic_write(path, render(cues, fmt, result.get("language")))
+    return paths, len(cues)
@@ -4,16 +4,39 @@
 # Versie 1.2 - Met verbeterde bestandsnaamgeving
 
 import os
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Met argumenten (bijv. vanuit een scheduler) headless verwerken, zonder
+    # Tkinter te laden: zie subtitle_engine.py --help
+    from subtitle_engine import main
+    sys.exit(main())
+
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
 import time
-import subprocess
 import queue
 from tkinter.scrolledtext import ScrolledText
 
+from subtitle_capabilities import get_capabilities, probe_in_background
+from subtitle_engine import TAAL_MAPPING, ISO_NAAR_TAAL, SubtitleEngine, clean_srt_file, clean_subtitle_text
+from subtitle_cache import default_cache_dir, parse_size
+from subtitle_dedup import default_dedup_path
+from subtitle_manifest import default_manifest_path
+from subtitle_pcmstore import default_pcm_dir
+from subtitle_models import get_model_manager
+from subtitle_progress import format_eta
+
+# De worker thread roept Tk nooit zelf aan: logregels en statuswijzigingen
+# gaan via een wachtrij die de mainloop periodiek in batches leegt
+EVENT_INTERVAL_MS = 50  # Hoe vaak de mainloop de wachtrij leegt
+EVENT_BATCH = 1000  # Maximaal aantal gebeurtenissen per keer, zodat de UI reageert
+LOG_MAX_REGELS = 5000  # Oudere regels worden uit het logvenster verwijderd
+AFSLUIT_TIMEOUT = 30  # Maximale wachttijd (seconden) op het laden van het model na het sluiten van het venster
+
 class WhisperSubtitleGenerator:
-    def __init__(self, root):
+    def __init__(self, root, preload_model=True):
         self.root = root
         self.root.title("Whisper Subtitle Generator")
         self.root.geometry("900x650")
@@ -25,40 +48,30 @@ class WhisperSubtitleGenerator:
         self.taal = tk.StringVar(value="nl")  # Nederlands als standaard
         self.use_gpu = tk.BooleanVar(value=True)  # Standaard GPU gebruiken indien beschikbaar
         self.clean_subtitles = tk.BooleanVar(value=True)  # Standaard tekst voor slechthorenden verwijderen
+        self.skip_done = tk.BooleanVar(value=True)  # Standaard al verwerkte bestanden overslaan
+        self.use_vad = tk.BooleanVar(value=False)  # Stilte overslaan met spraakdetectie
         
         # Taal naar ISO-code mapping
-        self.taal_mapping = {
-            "Nederlands": "nl",
-            "Engels": "en",
-            "Duits": "de",
-            "Frans": "fr",
-            "Spaans": "es",
-            "Italiaans": "it",
-            "Portugees": "pt",
-            "Russisch": "ru",
-            "Chinees": "zh",
-            "Japans": "ja",
-            "Koreaans": "ko",
-            "Arabisch": "ar",
-            "Hindi": "hi",
-            "Turks": "tr",
-            "Pools": "pl",
-            "Zweeds": "sv",
-            "Deens": "da",
-            "Noors": "no",
-            "Fins": "fi"
-        }
+        self.taal_mapping = TAAL_MAPPING
         
         # Omgekeerde mapping voor weergave
-        self.iso_naar_taal = {v: k for k, v in self.taal_mapping.items()}
+        self.iso_naar_taal = ISO_NAAR_TAAL
         
         # Status variabelen
         self.is_processing = False
         self.task_queue = queue.Queue()
+        self.events = queue.SimpleQueue()  # Gebeurtenissen voor de UI, vanuit elke thread
+        self.engine = None
         self.current_file = tk.StringVar(value="")
+        self.progress_text = tk.StringVar(value="")  # Voortgang van bestand en batch met resterende tijd
+        
+        self.preload_default = preload_model  # Standaardmodel laden na de capaciteitencheck
+        self.closing = False
         
         # UI opbouwen
         self.create_widgets()
+        self.root.after(EVENT_INTERVAL_MS, self.drain_events)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
     def create_widgets(self):
         # Hoofdframe
@@ -126,6 +139,14 @@ class WhisperSubtitleGenerator:
         ttk.Checkbutton(model_frame, text="Tekst voor slechthorenden verwijderen", 
                        variable=self.clean_subtitles).grid(row=1, column=2, padx=15, sticky=tk.W)
         
+        # Spraakdetectie: stille stukken niet door het model laten verwerken
+        ttk.Checkbutton(model_frame, text="Stilte overslaan (spraakdetectie)", 
+                       variable=self.use_vad).grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Al verwerkte bestanden overslaan (volgens het job manifest)
+        ttk.Checkbutton(model_frame, text="Al verwerkte bestanden overslaan", 
+                       variable=self.skip_done).grid(row=2, column=2, padx=15, sticky=tk.W)
+        
         # Huidige voortgang
         current_frame = ttk.LabelFrame(main_frame, text="Huidige verwerking", padding="10")
         current_frame.pack(fill=tk.X, pady=10)
@@ -133,14 +154,19 @@ class WhisperSubtitleGenerator:
         ttk.Label(current_frame, text="Bestand:").grid(row=0, column=0, sticky=tk.W, pady=5)
         ttk.Label(current_frame, textvariable=self.current_file).grid(row=0, column=1, sticky=tk.W, pady=5)
         
-        # Voortgangsbalk
+        # Voortgangsbalk (hele batch, op basis van de audioduur)
         self.progress_var = tk.DoubleVar()
-        self.progress = ttk.Progressbar(current_frame, variable=self.progress_var, length=100, mode='indeterminate')
+        self.progress = ttk.Progressbar(current_frame, variable=self.progress_var, length=100, mode='determinate',
+                                        maximum=100)
         self.progress.grid(row=1, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
+        current_frame.columnconfigure(2, weight=1)
+        
+        ttk.Label(current_frame, textvariable=self.progress_text).grid(row=2, column=0, columnspan=3, sticky=tk.W,
+                                                                       padx=5)
         
         # Informatie over GPU
         gpu_info_frame = ttk.Frame(current_frame)
-        gpu_info_frame.grid(row=2, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
+        gpu_info_frame.grid(row=3, column=0, columnspan=3, sticky="ew", pady=5, padx=5)
         
         gpu_tip = ttk.Label(gpu_info_frame, text="Tip: GPU verwerking is meestal 5-10x sneller dan CPU. Gebruik GPU indien beschikbaar.", font=("Arial", 9, "italic"))
         gpu_tip.pack(anchor=tk.W)
@@ -162,31 +188,62 @@ class WhisperSubtitleGenerator:
         self.stop_button = ttk.Button(button_frame, text="Stop", command=self.stop_processing, state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT, padx=5)
         
-        ttk.Button(button_frame, text="Afsluiten", command=self.root.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Afsluiten", command=self.close).pack(side=tk.RIGHT, padx=5)
         
         # Check GPU beschikbaarheid
         self.check_gpu_availability()
     
     def check_gpu_availability(self):
-        try:
-            import torch
-            has_cuda = torch.cuda.is_available()
-            
-            if has_cuda:
-                gpu_name = torch.cuda.get_device_name(0)
-                self.log(f"NVIDIA GPU gedetecteerd: {gpu_name}")
-                self.log("GPU verwerking is ingeschakeld (veel sneller)")
-            else:
-                self.log("Geen CUDA-compatibele GPU gedetecteerd. Terugvallen op CPU.")
-                self.log("Waarschuwing: CPU verwerking is aanzienlijk langzamer")
-                # Zet standaard naar CPU modus
-                self.use_gpu.set(False)
-                
-        except Exception as e:
-            self.log("Kon GPU beschikbaarheid niet bepalen. Fout: " + str(e))
+        """
+        Bepaalt op de achtergrond of er een GPU is (uit de capaciteitencache,
+        of in een apart proces), zodat het venster niet op de import van
+        torch en de CUDA-initialisatie hoeft te wachten.
+        """
+        probe_in_background(lambda capabilities: self.post("capabilities", capabilities))
+    
+    def show_gpu_availability(self, capabilities):
+        if capabilities["cuda"]:
+            self.log(f"NVIDIA GPU gedetecteerd: {capabilities['gpus'][0]}")
+            self.log("GPU verwerking is ingeschakeld (veel sneller)")
+        elif capabilities["torch"]:
+            self.log("Geen CUDA-compatibele GPU gedetecteerd. Terugvallen op CPU.")
+            self.log("Waarschuwing: CPU verwerking is aanzienlijk langzamer")
+            # Zet standaard naar CPU modus
+            self.use_gpu.set(False)
+        else:
+            error = capabilities.get("errors", {}).get("torch", "PyTorch niet beschikbaar")
+            self.log("Kon GPU beschikbaarheid niet bepalen. Fout: " + error)
             self.log("Terugvallen op CPU verwerking")
             self.use_gpu.set(False)
     
+    def preload_default_model(self, capabilities):
+        """
+        Laadt het standaardmodel alvast op de achtergrond, zodat de eerste Start
+        niet op het laden van het model hoeft te wachten. Gebeurt pas na de
+        capaciteitencheck, zodat een machine zonder GPU niet om "cuda" vraagt.
+        """
+        if not self.preload_default or self.closing or self.is_processing:
+            return
+        if not (capabilities["torch"] and capabilities["whisper"]):
+            return
+        get_model_manager().preload(self.model_size.get(), "cuda" if self.use_gpu.get() else "cpu", log=self.log)
+    
+    def close(self):
+        """
+        Sluit het venster. Wordt het model nog op de achtergrond geladen, dan
+        blijft het venster open met een melding tot dat klaar is, in plaats
+        van dat het proces zonder venster doorloopt (zie wait_preloads).
+        """
+        if get_model_manager().preloading():
+            if not self.closing:
+                self.closing = True
+                self.start_button.config(state=tk.DISABLED)
+                self.current_file.set("Model laden… het programma sluit zodra dat klaar is")
+                self.log("Afsluiten: wachten tot het model geladen is...")
+            self.root.after(200, self.close)
+            return
+        self.root.destroy()
+    
     def browse_videos(self):
         filetypes = (
             ("Video bestanden", "*.mp4 *.avi *.mov *.mkv *.webm"),
@@ -234,44 +291,132 @@ class WhisperSubtitleGenerator:
             self.log(f"Uitvoer map geselecteerd: {directory}")
     
     def log(self, message):
+        """
+        Zet een logregel in de wachtrij; veilig vanuit elke thread. De regel
+        verschijnt zodra de mainloop de wachtrij leegt.
+        """
         timestamp = time.strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self.events.put(("log", f"[{timestamp}] {message}\n"))
     
-    def check_dependencies(self):
+    def post(self, event, *args):
+        """
+        Vraagt de mainloop een UI-wijziging uit te voeren (zie drain_events).
+        """
+        self.events.put((event, *args))
+    
+    def drain_events(self):
+        """
+        Verwerkt de gebeurtenissen uit de wachtrij in de Tk mainloop.
+        Opeenvolgende logregels worden in één keer ingevoegd.
+        """
+        lines = []
         try:
-            import whisper
-            self.log("OpenAI Whisper succesvol geladen.")
-            
-            # Controleer torch en CUDA
-            import torch
-            self.log(f"PyTorch versie: {torch.__version__}")
-            if torch.cuda.is_available() and self.use_gpu.get():
-                self.log(f"CUDA is beschikbaar: {torch.cuda.get_device_name(0)}")
-            else:
-                if self.use_gpu.get():
-                    self.log("CUDA is niet beschikbaar, maar GPU is geselecteerd. Controleer NVIDIA drivers.")
-                else:
-                    self.log("GPU modus is uitgeschakeld, gebruikt CPU (langzamer).")
-                
-        except ImportError as e:
-            self.log(f"FOUT: Ontbrekende dependency: {str(e)}")
-            messagebox.showerror("Ontbrekende afhankelijkheid", 
-                              f"Ontbrekende dependency: {str(e)}\n\nInstalleer deze met pip install.")
+            for _ in range(EVENT_BATCH):
+                event, *args = self.events.get_nowait()
+                if event == "log":
+                    lines.append(args[0])
+                    continue
+                if lines:
+                    self.append_log("".join(lines))
+                    lines = []
+                self.handle_event(event, *args)
+        except queue.Empty:
+            pass
+        if lines:
+            self.append_log("".join(lines))
+        self.root.after(EVENT_INTERVAL_MS, self.drain_events)
+    
+    def handle_event(self, event, *args):
+        if event == "current_file":
+            self.current_file.set(args[0])
+        elif event == "progress":
+            self.show_progress(args[0])
+        elif event == "capabilities":
+            self.show_gpu_availability(args[0])
+            self.preload_default_model(args[0])
+        elif event == "info":
+            messagebox.showinfo(*args)
+        elif event == "error":
+            messagebox.showerror(*args)
+        elif event == "done":
+            self.is_processing = False
+            self.engine = None
+            self.start_button.config(state=tk.DISABLED if self.closing else tk.NORMAL)
+            self.stop_button.config(state=tk.DISABLED)
+            self.current_file.set("")
+            self.progress_text.set("")
+    
+    def show_progress(self, snapshot):
+        """
+        Toont een voortgangsstand uit de engine (zie subtitle_progress).
+        """
+        if snapshot["percent"] is not None:
+            self.progress_var.set(snapshot["percent"])
+        
+        parts = []
+        if snapshot["file_percent"] is not None:
+            parts.append(f"Bestand: {snapshot['file_percent']:.0f}%")
+        if snapshot["percent"] is not None:
+            parts.append(f"totaal: {snapshot['percent']:.0f}%")
+        if snapshot["eta_seconds"] is not None and snapshot["files_done"] < snapshot["total_files"]:
+            parts.append(f"nog ongeveer {format_eta(snapshot['eta_seconds'])}")
+        self.progress_text.set(" · ".join(parts))
+    
+    def append_log(self, text):
+        """
+        Voegt tekst toe aan het logvenster en houdt het begrensd op
+        LOG_MAX_REGELS regels; er wordt alleen gescrold als de gebruiker
+        al onderaan stond.
+        """
+        at_end = self.log_text.yview()[1] >= 0.999
+        self.log_text.insert(tk.END, text)
+        
+        # In stappen inkorten, niet na elke regel
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        if line_count > LOG_MAX_REGELS + LOG_MAX_REGELS // 10:
+            self.log_text.delete("1.0", f"{line_count - LOG_MAX_REGELS}.0")
+        
+        if at_end:
+            self.log_text.see(tk.END)
+    
+    def check_dependencies(self, use_gpu):
+        """
+        Controleert whisper, torch en FFmpeg met de capaciteitencache (zie
+        subtitle_capabilities) in plaats van ze bij elke Start opnieuw te
+        importeren en ffmpeg te starten. Ontbreekt er iets, dan wordt eerst
+        opnieuw geprobeerd: misschien is het inmiddels geïnstalleerd.
+        Draait in de verwerkingsthread (een koude cache start een proces dat
+        torch importeert); meldingen gaan via post().
+        """
+        capabilities = get_capabilities()
+        if not (capabilities["whisper"] and capabilities["torch"] and capabilities["ffmpeg"]):
+            capabilities = get_capabilities(refresh=True)
+        
+        missing = [name for name, key in (("openai-whisper", "whisper"), ("torch", "torch")) if not capabilities[key]]
+        if missing:
+            self.log(f"FOUT: Ontbrekende dependency: {', '.join(missing)}")
+            self.post("error", "Ontbrekende afhankelijkheid",
+                      f"Ontbrekende dependency: {', '.join(missing)}\n\nInstalleer deze met pip install.")
             return False
+        self.log(f"OpenAI Whisper gevonden (versie {capabilities['whisper']}).")
         
-        try:
-            # Controleer of ffmpeg beschikbaar is
-            result = subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if result.returncode != 0:
-                raise Exception("FFmpeg niet gevonden")
+        # Controleer torch en CUDA
+        self.log(f"PyTorch versie: {capabilities['torch']}")
+        if capabilities["cuda"] and use_gpu:
+            self.log(f"CUDA is beschikbaar: {capabilities['gpus'][0]}")
+        else:
+            if use_gpu:
+                self.log("CUDA is niet beschikbaar, maar GPU is geselecteerd. Controleer NVIDIA drivers.")
+            else:
+                self.log("GPU modus is uitgeschakeld, gebruikt CPU (langzamer).")
+        
+        if capabilities["ffmpeg"]:
             self.log("FFmpeg succesvol gevonden.")
-        except:
+        else:
             self.log("FOUT: FFmpeg is niet geïnstalleerd of niet beschikbaar in PATH!")
-            messagebox.showerror("Ontbrekende afhankelijkheid", 
-                              "FFmpeg is niet geïnstalleerd of niet beschikbaar in PATH.\n"
-                              "Installeer FFmpeg en zorg dat het in je systeem PATH staat.")
+            self.post("error", "Ontbrekende afhankelijkheid",
+                      "FFmpeg is niet geïnstalleerd of niet beschikbaar in PATH.\n"
+                      "Installeer FFmpeg en zorg dat het in je systeem PATH staat.")
             return False
             
         return True
@@ -283,16 +428,12 @@ class WhisperSubtitleGenerator:
         if not self.video_paths:
             messagebox.showerror("Fout", "Selecteer eerst één of meer videobestanden.")
             return
-        
-        # Controleer dependencies voordat we beginnen
-        if not self.check_dependencies():
-            return
             
-        # Start verwerking in een aparte thread
+        # Start verwerking in een aparte thread; die controleert eerst de dependencies
         self.is_processing = True
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
-        self.progress.start(10)
+        self.progress_var.set(0)
         
         # Reset de verwerkingswachtrij
         while not self.task_queue.empty():
@@ -315,8 +456,18 @@ class WhisperSubtitleGenerator:
         if self.clean_subtitles.get():
             self.log("Reiniging van tekst voor slechthorenden is ingeschakeld")
         
+        # De worker thread leest geen Tk-variabelen; de instellingen gaan mee
+        settings = {
+            "model_size": self.model_size.get(),
+            "taal": self.taal.get(),
+            "device": "cuda" if self.use_gpu.get() else "cpu",
+            "clean_subtitles": self.clean_subtitles.get(),
+            "force": not self.skip_done.get(),
+            "vad": self.use_vad.get(),
+        }
+        
         # Start verwerking in een aparte thread
-        processing_thread = threading.Thread(target=self.process_files, daemon=True)
+        processing_thread = threading.Thread(target=self.process_files, args=(settings,), daemon=True)
         processing_thread.start()
     
     def stop_processing(self):
@@ -324,256 +475,77 @@ class WhisperSubtitleGenerator:
             return
             
         self.is_processing = False
+        if self.engine is not None:
+            self.engine.stop()
         self.log("Verwerking wordt gestopt...")
         self.stop_button.config(state=tk.DISABLED)
         self.current_file.set("Gestopt")
     
     def clean_srt_file(self, srt_path):
         """
-        Verwijdert tekst voor slechthorenden uit SRT-bestanden:
-        - Tekst tussen haakjes [tekst], (tekst), {tekst}
-        - Tekst in hoofdletters (als het een heel woord is)
-        - Tekst voor dubbele punt als het in hoofdletters is (PERSOON: tekst)
-        - Geluidseffecten zoals *lacht*, #muziek#, etc.
+        Verwijdert tekst voor slechthorenden uit een SRT-bestand (zie subtitle_engine.clean_srt_file)
         """
-        try:
-            self.log(f"Opschonen van ondertitelbestand: {os.path.basename(srt_path)}")
-            
-            # Lees het SRT-bestand
-            with open(srt_path, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-            
-            cleaned_lines = []
-            i = 0
-            
-            # SRT-bestanden bestaan uit blokken met 4 regels:
-            # 1: Volgnummer
-            # 2: Tijdcodes
-            # 3: Ondertiteltekst (soms meerdere regels)
-            # 4: Lege regel
-            
-            while i < len(lines):
-                # Bewaar volgnummer en tijdcodes ongewijzigd
-                if i < len(lines) and lines[i].strip().isdigit():
-                    # Volgnummer
-                    cleaned_lines.append(lines[i])
-                    i += 1
-                    
-                    # Tijdcodes (als we nog niet aan het einde zijn)
-                    if i < len(lines) and '-->' in lines[i]:
-                        cleaned_lines.append(lines[i])
-                        i += 1
-                        
-                        # Ondertiteltekst (kan meerdere regels zijn)
-                        subtitle_lines = []
-                        while i < len(lines) and lines[i].strip() != '':
-                            subtitle_lines.append(lines[i])
-                            i += 1
-                        
-                        # Reinig deze ondertiteltekst
-                        cleaned_subtitle = self.clean_subtitle_text('\n'.join(subtitle_lines))
-                        
-                        # Voeg alleen toe als er tekst overblijft na het reinigen
-                        if cleaned_subtitle.strip():
-                            cleaned_lines.append(cleaned_subtitle + '\n')
-                        else:
-                            # Als alle tekst is verwijderd, verwijder volgnummer en tijdcodes ook
-                            cleaned_lines.pop()  # Verwijder tijdcodes
-                            cleaned_lines.pop()  # Verwijder volgnummer
-                        
-                        # Lege regel
-                        if i < len(lines):
-                            cleaned_lines.append(lines[i])
-                            i += 1
-                else:
-                    # Onverwacht formaat, behoud de regel
-                    cleaned_lines.append(lines[i])
-                    i += 1
-            
-            # Schrijf de opgeschoonde tekst terug naar het bestand
-            with open(srt_path, 'w', encoding='utf-8') as file:
-                file.writelines(cleaned_lines)
-                
-            self.log(f"Ondertitelbestand succesvol opgeschoond")
-            return True
-            
-        except Exception as e:
-            self.log(f"Fout bij opschonen van ondertitelbestand: {str(e)}")
-            return False
+        return clean_srt_file(srt_path, self.log)
 
     def clean_subtitle_text(self, text):
         """
         Reinigt een stuk ondertiteltekst door tekst voor slechthorenden te verwijderen
         """
-        import re
-        
-        # Verwijder tekst tussen verschillende soorten haakjes
-        # [tekst], (tekst), {tekst}
-        text = re.sub(r'\[.*?\]', '', text)
-        text = re.sub(r'\(.*?\)', '', text)
-        text = re.sub(r'\{.*?\}', '', text)
-        
-        # Verwijder geluidseffecten met * of #
-        text = re.sub(r'\*.*?\*', '', text)
-        text = re.sub(r'#.*?#', '', text)
-        
-        # Verwijder tekst in hoofdletters voor een dubbele punt
-        # Bijv. "JOHN: Hallo" wordt "Hallo"
-        text = re.sub(r'[A-Z]{2,}[A-Z\s]*:', '', text)
-        
-        # Verwijder hele regels die volledig in hoofdletters staan
-        # (vaak geluidseffecten of sprekerinformatie)
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # Als de regel niet volledig in hoofdletters is of alleen maar leestekens/getallen bevat
-            if not (line.strip() and line.strip().upper() == line.strip() and any(c.isalpha() for c in line)):
-                cleaned_lines.append(line)
-        
-        # Voeg de regels weer samen
-        text = '\n'.join(cleaned_lines)
-        
-        # Verwijder dubbele witruimte en witruimte aan begin/eind
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        
-        return text
+        return clean_subtitle_text(text, self.taal.get())
     
-    def process_files(self, output_dir):
+    def process_files(self, settings):
         """
         Verwerkt alle bestanden in de task_queue en genereert ondertitels.
-        Deze functie wordt uitgevoerd in een aparte thread.
+        Deze functie wordt uitgevoerd in een aparte thread; het eigenlijke
+        werk gebeurt in de headless SubtitleEngine. Alle UI-wijzigingen
+        gaan via post().
         """
-        model_size = self.model_size.get()
-        taal = self.taal.get()
-        taal_naam = self.iso_naar_taal.get(taal, taal.upper())
-        use_gpu = self.use_gpu.get()
+        video_paths = []
+        while not self.task_queue.empty():
+            video_paths.append(self.task_queue.get())
         
-        self.log(f"Geselecteerde taal: {taal_naam} ({taal})")
-        self.log(f"Model grootte: {model_size}")
+        # Controleer dependencies voordat we beginnen
+        if not self.check_dependencies(settings["device"] == "cuda") or not self.is_processing:
+            self.post("done")
+            return
         
-        total_files = self.task_queue.qsize()
+        total_files = len(video_paths)
         processed_files = 0
         
+        self.engine = SubtitleEngine(
+            cache_dir=default_cache_dir(),
+            cache_max_bytes=parse_size("20G"),
+            manifest_path=default_manifest_path(),
+            dedup_path=default_dedup_path(),
+            pcm_dir=default_pcm_dir(),
+            pcm_max_bytes=parse_size("10G"),
+            progress=lambda snapshot: self.post("progress", snapshot),
+            progress_interval=0.5,
+            log=self.log,
+            **settings
+        )
+        
+        if video_paths:
+            self.post("current_file", f"(1/{total_files}) {os.path.basename(video_paths[0])}")
+        
         try:
-            # Laad Whisper modules
-            import whisper
-            from whisper.utils import get_writer
-            import torch
-            
-            # Set device
-            device = "cuda" if torch.cuda.is_available() and use_gpu else "cpu"
-            if device == "cuda":
-                self.log("Gebruik NVIDIA GPU voor verwerking")
-            else:
-                if use_gpu:
-                    self.log("GPU niet beschikbaar, terugvallen op CPU")
-                else:
-                    self.log("CPU geselecteerd voor verwerking")
-            
-            # Laad het model eenmalig voor alle bestanden
-            self.log(f"Model '{model_size}' laden op {device}... (dit kan even duren)")
-            start_time = time.time()
-            model = whisper.load_model(model_size, device=device)
-            load_time = time.time() - start_time
-            self.log(f"Model geladen in {load_time:.2f} seconden")
-            
-            while not self.task_queue.empty() and self.is_processing:
-                video_path = self.task_queue.get()
+            for file_result in self.engine.process(video_paths):
                 processed_files += 1
                 
                 # Update huidige bestand info
-                video_name = os.path.basename(video_path)
-                self.current_file.set(f"({processed_files}/{total_files}) {video_name}")
-                
-                try:
-                    # Bepaal de bestandsnamen
-                    video_full_name = os.path.basename(video_path)
-                    video_name_without_ext = os.path.splitext(video_full_name)[0]  # Verbeterd: gebruik os.path.splitext
-                    output_path = os.path.join(output_dir, f"{video_name_without_ext}.{taal}.srt")
-                    
-                    # Bewaar de originele bestandsnaam voor logging doeleinden
-                    original_filename_base = video_name_without_ext
-                    
-                    # Log informatie over de bestandsnamen
-                    self.log(f"Oorspronkelijke video bestandsnaam: {video_name}")
-                    self.log(f"Verwachte ondertitel bestandsnaam: {video_name_without_ext}.{taal}.srt")
-                    
-                    self.log(f"Verwerking van: {video_name} ({processed_files}/{total_files})")
-                    
-                    # Voer transcriptie uit met de geselecteerde taal
-                    self.log(f"Transcriptie uitvoeren op {video_name}...")
-                    transcribe_start = time.time()
-                    result = model.transcribe(
-                        video_path,
-                        language=taal,  # Gebruik de geselecteerde taal
-                        task="transcribe",
-                        verbose=False,
-                        fp16=(device == "cuda")  # Gebruik FP16 alleen op GPU
-                    )
-                    transcribe_time = time.time() - transcribe_start
-                    self.log(f"Transcriptie voltooid in {transcribe_time:.2f} seconden")
-                    
-                    # Maak SRT writer
-                    srt_writer = get_writer("srt", output_dir)
-                    
-                    # Schrijf ondertitels direct naar een tijdelijk bestand
-                    import tempfile
-                    
-                    # Maak een tijdelijke directory
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        # Gebruik een eenvoudige bestandsnaam voor het tijdelijke bestand
-                        temp_filename = "temp_subtitle"
-                        
-                        # Maak SRT writer voor de tijdelijke map
-                        self.log(f"SRT-bestand genereren voor {video_name}...")
-                        temp_srt_writer = get_writer("srt", temp_dir)
-                        temp_srt_writer(result, temp_filename, {"max_line_width": 42, "max_line_count": 2})
-                        
-                        # Pad naar het gegenereerde tijdelijke SRT-bestand
-                        temp_srt_path = os.path.join(temp_dir, f"{temp_filename}.srt")
-                        
-                        if os.path.exists(temp_srt_path):
-                            # Lees de inhoud van het tijdelijke SRT-bestand
-                            with open(temp_srt_path, 'r', encoding='utf-8') as src_file:
-                                srt_content = src_file.read()
-                            
-                            # Schrijf naar het definitieve SRT-bestand met de juiste naam
-                            if os.path.exists(output_path):
-                                self.log(f"Bestaand bestand overschrijven: {output_path}")
-                                os.remove(output_path)
-                                
-                            with open(output_path, 'w', encoding='utf-8') as dest_file:
-                                dest_file.write(srt_content)
-                                
-                            self.log(f"Ondertitels opgeslagen met correcte bestandsnaam: {os.path.basename(output_path)}")
-                        else:
-                            self.log(f"FOUT: Tijdelijk SRT-bestand werd niet aangemaakt: {temp_srt_path}")
-                            raise Exception("Kon geen ondertitels genereren met Whisper")
-                        
-                    self.log(f"Ondertitels opgeslagen in: {output_path}")
-                    
-                    # Als opschonen is ingeschakeld, reinig het bestand
-                    if self.clean_subtitles.get() and os.path.exists(output_path):
-                        self.clean_srt_file(output_path)
-                    
-                except Exception as e:
-                    self.log(f"FOUT bij verwerking van {video_name}: {str(e)}")
+                if processed_files < total_files:
+                    next_name = os.path.basename(video_paths[processed_files])
+                    self.post("current_file", f"({processed_files + 1}/{total_files}) {next_name}")
             
             if self.is_processing:  # Als we niet handmatig zijn gestopt
                 self.log(f"Alle {processed_files} bestanden zijn verwerkt")
-                messagebox.showinfo("Voltooid", f"Alle {processed_files} bestanden zijn succesvol verwerkt.")
+                self.post("info", "Voltooid", f"Alle {processed_files} bestanden zijn succesvol verwerkt.")
             
         except Exception as e:
             self.log(f"FOUT tijdens verwerking: {str(e)}")
-            messagebox.showerror("Fout", f"Er is een fout opgetreden: {str(e)}")
+            self.post("error", "Fout", f"Er is een fout opgetreden: {str(e)}")
         finally:
-            self.is_processing = False
-            self.progress.stop()
-            self.start_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
-            self.current_file.set("")
+            self.post("done")
 
 
 # Applicatie starten
@@ -581,3 +553,6 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = WhisperSubtitleGenerator(root)
     root.mainloop()
+    # Niet afsluiten terwijl het model nog op de achtergrond laadt (zie wait_preloads);
+    # close() wacht daar al op, dit vangt alleen een venster af dat op een andere manier dichtging
+    get_model_manager().wait_preloads(timeout=AFSLUIT_TIMEOUT)